@@ -0,0 +1,344 @@
+from datetime import date, datetime, timedelta
+from typing import Dict, List, Optional, Set, Tuple
+
+from sqlalchemy import Date, Integer, bindparam, cast, delete, func, insert, or_, update
+from sqlmodel import Session, select
+
+from database import dialect_insert
+from models import JobState, User, UserDailyActivity, Session as SessionModel
+from retention import compacted_before
+
+# Reglas de puntos de /sessions/complete (tambien se usan para reconstruir el resumen)
+POINTS_PER_MINUTE = 10
+FIRST_SESSION_OF_DAY_BONUS = 50
+
+# Fila de job_state con la ultima vez que se cambiaron rachas en bloque (scheduler.refresh_streaks)
+STREAKS_JOB = "streaks"
+
+
+def apply_streak(user: User, day: date, when: datetime) -> bool:
+    """
+    Regla de racha de /sessions/complete para una sesión hecha el dia `day`.
+    Devuelve True si es la primera sesión de un dia nuevo (se movio la racha).
+    Una sesión de un dia anterior a la ultima racha (llega tarde, sin conexion) no la cambia.
+    """
+    last_date = user.last_streak_date.date() if user.last_streak_date else None
+
+    if last_date is not None and day <= last_date:
+        # ya habia hecho una sesion ese dia (o el dia es anterior)
+        return False
+
+    if last_date == day - timedelta(days=1):
+        # En caso de que haya estudiado ayer se continua racha
+        user.current_streak_days += 1
+    else:
+        # Nunca había estudiado o se saltó días, empieza de nuevo
+        user.current_streak_days = 1
+
+    # Se actualiza la fecha de última racha al dia de la sesión
+    user.last_streak_date = when
+    return True
+
+
+def apply_streak_days(session: Session, user: User, days: Dict[date, datetime], today: date) -> Set[date]:
+    """
+    Regla de racha para un lote de sesiones sin conexion (days: dia -> hora de su ultima sesión).
+    Al contrario que apply_streak, un dia anterior a la ultima racha si cuenta: puede rellenar un hueco.
+    La racha se cuenta hacia atras desde el ultimo dia sobre la union de los dias del lote y los
+    que ya estan en user_daily_activity, con una sola consulta que se lee hasta el primer hueco.
+    Si ese ultimo dia es anterior a ayer la racha queda a 0, como en reset_broken_streaks.
+    Devuelve los dias desde el primero del lote que ya tenian actividad (para el bonus del dia).
+    """
+    if not days:
+        return set()
+    last_date = user.last_streak_date.date() if user.last_streak_date else None
+    end = max(days)
+    if last_date is not None and last_date >= end:
+        end, when = last_date, user.last_streak_date
+    else:
+        when = days[end]
+
+    result = session.exec(
+        select(UserDailyActivity.day)
+        .where(UserDailyActivity.user_id == user.id)
+        .where(UserDailyActivity.day <= end)
+        .order_by(UserDailyActivity.day.desc())
+        .execution_options(yield_per=64)
+    )
+    first = min(days)
+    found = set()
+    streak, expected, counting = 0, end, True
+    for known in result:
+        if known >= first:
+            found.add(known)
+        # dias del lote entre el anterior guardado y este
+        while counting and expected > known:
+            if expected not in days:
+                counting = False
+                break
+            streak += 1
+            expected -= timedelta(days=1)
+        if counting and expected == known:
+            streak += 1
+            expected -= timedelta(days=1)
+        if not counting and known < first:
+            break
+    result.close()
+    # lo que quede por debajo del ultimo dia guardado solo puede ser del lote
+    while counting and expected in days:
+        streak += 1
+        expected -= timedelta(days=1)
+
+    user.current_streak_days = streak if end >= today - timedelta(days=1) else 0
+    user.last_streak_date = when
+    return found
+
+
+def record_activity(session: Session, user_id: int, day: date, minutes: int, points: int, sessions: int = 1):
+    """
+    Suma una sesión al resumen del dia con un solo INSERT ... ON CONFLICT DO UPDATE.
+    No hace commit, va dentro de la transaccion de quien lo llama.
+    """
+    stmt = dialect_insert(session, UserDailyActivity).values(
+        user_id=user_id,
+        day=day,
+        session_count=sessions,
+        minutes=minutes,
+        points=points,
+    )
+    stmt = stmt.on_conflict_do_update(
+        index_elements=["user_id", "day"],
+        set_={
+            "session_count": UserDailyActivity.session_count + stmt.excluded.session_count,
+            "minutes": UserDailyActivity.minutes + stmt.excluded.minutes,
+            "points": UserDailyActivity.points + stmt.excluded.points,
+        },
+    )
+    session.exec(stmt)
+
+
+def active_days(session: Session, user_id: int, start: date, end: date) -> Set[date]:
+    """Dias entre start y end (incluidos) con al menos una sesión completada"""
+    rows = session.exec(
+        select(UserDailyActivity.day)
+        .where(UserDailyActivity.user_id == user_id)
+        .where(UserDailyActivity.day >= start)
+        .where(UserDailyActivity.day <= end)
+        .where(UserDailyActivity.session_count > 0)
+    ).all()
+    return set(rows)
+
+
+def weekly_stats(session: Session, user_id: int) -> dict:
+    """Respuesta de /sessions/weekly-stats (tambien la usa /users/bootstrap)"""
+    today = datetime.utcnow().date()
+    
+    #se calcula el lunes de la semana en curso
+    days_since_monday = today.weekday()
+    monday = today - timedelta(days=days_since_monday)
+    
+    #aca se leen como mucho 7 filas del resumen diario (user_daily_activity)
+    week_days = active_days(session, user_id, monday, monday + timedelta(days=6))
+    
+    #set de dias con sesiones, se convierte a 0-6 (Lunes=0, Domingo=6)
+    days_with_sessions_set = {(day - monday).days for day in week_days}
+    
+    # diariamente se crea un breakdown
+    daily_breakdown = []
+    for i in range(7):
+        daily_breakdown.append({
+            "day_index": i,
+            "completed": i in days_with_sessions_set
+        })
+    
+    return {
+        "days_with_sessions": len(days_with_sessions_set),
+        "daily_breakdown": daily_breakdown,
+        "current_day_index": today.weekday() 
+    }
+
+
+def session_day_expr(session: Session):
+    # SQLite guarda las fechas como texto, date() devuelve 'YYYY-MM-DD' igual que la columna Date
+    if session.get_bind().dialect.name == "sqlite":
+        return func.date(SessionModel.started_at)
+    return cast(SessionModel.started_at, Date)
+
+
+def backfill_daily_activity(session: Session, batch_users: int = 5000) -> int:
+    """
+    Reconstruye user_daily_activity desde la tabla de sesiones.
+    Se procesa por rangos de user_id con un INSERT ... SELECT por rango,
+    asi cada transaccion es corta aunque haya millones de sesiones.
+    Los puntos se recalculan con las reglas actuales (minutos * 10 + bonus del dia).
+    Los dias anteriores a la retencion (retention.py) ya no tienen sesiones y se dejan como estan.
+    Devuelve el numero de filas de resumen escritas.
+    """
+    max_user_id = session.exec(select(func.max(User.id))).one() or 0
+    day = session_day_expr(session)
+    since = compacted_before(session)
+    total = 0
+
+    for low in range(0, max_user_id + 1, batch_users):
+        high = low + batch_users
+        old_rows = (
+            delete(UserDailyActivity)
+            .where(UserDailyActivity.user_id >= low)
+            .where(UserDailyActivity.user_id < high)
+        )
+        rows = (
+            select(
+                SessionModel.user_id,
+                day,
+                func.count(),
+                func.sum(SessionModel.intended_minutes),
+                func.sum(SessionModel.intended_minutes) * POINTS_PER_MINUTE + FIRST_SESSION_OF_DAY_BONUS,
+            )
+            .where(SessionModel.user_id >= low)
+            .where(SessionModel.user_id < high)
+            .where(SessionModel.completed == True)
+            .group_by(SessionModel.user_id, day)
+        )
+        if since is not None:
+            old_rows = old_rows.where(UserDailyActivity.day >= since.date())
+            rows = rows.where(SessionModel.started_at >= since)
+        session.exec(old_rows)
+        result = session.exec(
+            insert(UserDailyActivity).from_select(
+                ["user_id", "day", "session_count", "minutes", "points"], rows
+            )
+        )
+        total += max(result.rowcount, 0)
+        session.commit()
+
+    return total
+
+
+# MANTENIMIENTO DE RACHAS
+# La racha solo se toca al completar una sesión, asi que quien deja de estudiar se queda
+# con la racha vieja hasta que vuelve. Estos trabajos la ponen al dia para todos.
+
+def reset_broken_streaks(session: Session, today: date = None) -> List[Tuple[int, str]]:
+    """
+    Pone a 0 la racha de quien no estudio ni hoy ni ayer, con un solo UPDATE.
+    Devuelve (id, email) de los usuarios tocados para invalidar caches y clasificaciones.
+    Es seguro con la app funcionando: si el usuario completa una sesión a la vez,
+    apply_streak tambien empieza de 1 porque su ultima racha es de antes de ayer.
+    """
+    today = today or datetime.utcnow().date()
+    yesterday_start = datetime.combine(today - timedelta(days=1), datetime.min.time())
+    rows = session.exec(
+        update(User)
+        .where(User.current_streak_days > 0)
+        .where(or_(User.last_streak_date.is_(None), User.last_streak_date < yesterday_start))
+        .values(current_streak_days=0)
+        .returning(User.id, User.email)
+        .execution_options(synchronize_session=False)
+    ).all()
+    session.commit()
+    return [tuple(row) for row in rows]
+
+
+def mark_streaks_changed(session: Session):
+    """Apunta que las rachas cambiaron en bloque; cada worker lo ve y rehace lo que tiene en memoria"""
+    session.exec(
+        dialect_insert(session, JobState)
+        .values(name=STREAKS_JOB, finished_at=datetime.utcnow())
+        .on_conflict_do_update(index_elements=["name"], set_={"finished_at": datetime.utcnow()})
+    )
+    session.commit()
+
+
+def streaks_changed_at(session: Session) -> Optional[datetime]:
+    state = session.get(JobState, STREAKS_JOB)
+    return state.finished_at if state else None
+
+
+def _last_streaks_query(session: Session, low: int, high: int):
+    """
+    Ultima racha de cada usuario del rango con funciones de ventana (gaps and islands):
+    en dias consecutivos, dia - row_number() es constante, asi cada isla es una racha.
+    Devuelve una fila por usuario: (user_id, dias de la racha, ultimo dia).
+    """
+    day = session_day_expr(session)
+    days = (
+        select(SessionModel.user_id.label("user_id"), day.label("day"))
+        .where(SessionModel.user_id >= low)
+        .where(SessionModel.user_id < high)
+        .where(SessionModel.completed == True)
+        .distinct()
+        .subquery()
+    )
+    position = func.row_number().over(partition_by=days.c.user_id, order_by=days.c.day)
+    if session.get_bind().dialect.name == "sqlite":
+        island = func.julianday(days.c.day) - position
+    else:
+        island = days.c.day - cast(position, Integer)
+    numbered = select(days.c.user_id, days.c.day, island.label("island")).subquery()
+
+    islands = (
+        select(
+            numbered.c.user_id,
+            func.count().label("length"),
+            func.max(numbered.c.day).label("last_day"),
+        )
+        .group_by(numbered.c.user_id, numbered.c.island)
+        .subquery()
+    )
+    latest = select(
+        islands.c.user_id,
+        islands.c.length,
+        islands.c.last_day,
+        func.row_number().over(partition_by=islands.c.user_id, order_by=islands.c.last_day.desc()).label("pos"),
+    ).subquery()
+    return select(latest.c.user_id, latest.c.length, latest.c.last_day).where(latest.c.pos == 1)
+
+
+def rebuild_streaks(session: Session, batch_users: int = 5000, today: date = None) -> int:
+    """
+    Recalcula current_streak_days y last_streak_date desde todo el historial de sesiones.
+    Va por rangos de user_id (memoria acotada: una fila por usuario del rango) y cada rango
+    es una transaccion. Pisa la racha de quien complete una sesión justo a la vez,
+    conviene lanzarlo con poco trafico. Devuelve cuantos usuarios quedan con racha activa.
+    Las sesiones ya compactadas (retention.py) no cuentan: una racha de mas de RETENTION_DAYS se queda corta.
+    """
+    today = today or datetime.utcnow().date()
+    max_user_id = session.exec(select(func.max(User.id))).one() or 0
+    users = User.__table__
+    set_streak = (
+        update(users)
+        .where(users.c.id == bindparam("b_id"))
+        .values(current_streak_days=bindparam("b_streak"), last_streak_date=bindparam("b_last"))
+    )
+    active = 0
+
+    for low in range(0, max_user_id + 1, batch_users):
+        high = low + batch_users
+        updates = []
+        for user_id, length, last_day in session.exec(_last_streaks_query(session, low, high)):
+            if isinstance(last_day, str):
+                # SQLite devuelve date() como texto
+                last_day = date.fromisoformat(last_day)
+            # la racha sigue viva si el ultimo dia de estudio fue hoy o ayer
+            streak = length if last_day >= today - timedelta(days=1) else 0
+            active += streak > 0
+            updates.append({
+                "b_id": user_id,
+                "b_streak": streak,
+                "b_last": datetime.combine(last_day, datetime.min.time()),
+            })
+
+        # quien no tiene sesiones en el rango se queda a 0, el resto con lo calculado
+        session.exec(
+            update(User)
+            .where(User.id >= low)
+            .where(User.id < high)
+            .where(User.current_streak_days != 0)
+            .values(current_streak_days=0)
+            .execution_options(synchronize_session=False)
+        )
+        if updates:
+            session.connection().execute(set_streak, updates)
+        session.commit()
+
+    return active
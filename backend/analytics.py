@@ -0,0 +1,92 @@
+from datetime import datetime, timedelta
+
+from sqlalchemy import func
+from sqlmodel import Session, select
+
+from cache import TTLCache
+from config import settings
+from models import UserDailyActivity, Session as SessionModel
+import events
+
+# Rangos disponibles y cuantos dias hacia atras cubren (incluido hoy)
+RANGES = {
+    "week": 7,
+    "month": 30,
+    "year": 365,
+}
+
+# Resultado ya calculado por (user_id, rango), se invalida al completar una sesión
+# (en todos los workers, por el bus de eventos como auth_cache)
+analytics_cache = TTLCache(
+    maxsize=settings.ANALYTICS_CACHE_SIZE,
+    ttl=settings.ANALYTICS_CACHE_TTL_SECONDS,
+)
+
+
+def _forget(user_id: int):
+    for range_name in RANGES:
+        analytics_cache.pop((user_id, range_name))
+
+
+def invalidate(user_id: int):
+    """Despues del commit: after_commit(session, analytics.invalidate, user_id)"""
+    _forget(user_id)
+    events.bus.broadcast("analytics", str(user_id))
+
+
+events.bus.on_internal("analytics", lambda key, data: _forget(int(key)))
+
+
+def get_cached(user_id: int, range_name: str):
+    return analytics_cache.get((user_id, range_name))
+
+
+def compute(session: Session, user_id: int, range_name: str) -> dict:
+    """Calcula las estadisticas del rango con agregados en la DB y las guarda en cache"""
+    today = datetime.utcnow().date()
+    start = today - timedelta(days=RANGES[range_name] - 1)
+
+    # Minutos y sesiones por dia desde el resumen diario (maximo 365 filas por PK)
+    days = session.exec(
+        select(UserDailyActivity.day, UserDailyActivity.session_count, UserDailyActivity.minutes)
+        .where(UserDailyActivity.user_id == user_id)
+        .where(UserDailyActivity.day >= start)
+        .where(UserDailyActivity.day <= today)
+        .order_by(UserDailyActivity.day)
+    ).all()
+
+    heatmap = [
+        {"day": day, "sessions": count, "minutes": minutes}
+        for day, count, minutes in days
+        if count > 0
+    ]
+    completed = sum(d["sessions"] for d in heatmap)
+    total_minutes = sum(d["minutes"] for d in heatmap)
+
+    # Abandonos agrupados por motivo, usa el indice (user_id, completed, started_at)
+    abandon_rows = session.exec(
+        select(SessionModel.abandon_reason, func.count())
+        .where(SessionModel.user_id == user_id)
+        .where(SessionModel.completed == False)
+        .where(SessionModel.started_at >= datetime.combine(start, datetime.min.time()))
+        .group_by(SessionModel.abandon_reason)
+    ).all()
+    abandon_reasons = {reason or "sin motivo": count for reason, count in abandon_rows}
+    abandoned = sum(abandon_reasons.values())
+
+    attempts = completed + abandoned
+    result = {
+        "range": range_name,
+        "start": start,
+        "end": today,
+        "heatmap": heatmap,
+        "active_days": len(heatmap),
+        "total_minutes": total_minutes,
+        "completed_sessions": completed,
+        "abandoned_sessions": abandoned,
+        "completion_ratio": round(completed / attempts, 4) if attempts else 0.0,
+        "abandon_reasons": abandon_reasons,
+        "average_session_minutes": round(total_minutes / completed, 1) if completed else 0.0,
+    }
+    analytics_cache.set((user_id, range_name), result)
+    return result
@@ -0,0 +1,97 @@
+import hashlib
+import uuid
+from typing import Optional
+
+from sqlalchemy.orm import make_transient_to_detached
+
+from cache import TTLCache, VersionMap
+from config import settings
+from models import User
+import events
+
+# Tokens ya verificados: digest del token -> email (caduca con el claim exp)
+token_cache = TTLCache(
+    maxsize=settings.AUTH_TOKEN_CACHE_SIZE,
+    ttl=settings.ACCESS_TOKEN_EXPIRE_MINUTES * 60,
+)
+
+# Filas de User recientes: email -> columnas del usuario (TTL corto)
+user_cache = TTLCache(
+    maxsize=settings.AUTH_USER_CACHE_SIZE,
+    ttl=settings.AUTH_USER_CACHE_TTL_SECONDS,
+)
+
+
+# Version de los datos de cada usuario, sube en cada invalidate_user (ETag de /users/bootstrap).
+# Es por proceso: BOOT_ID cambia al reiniciar para que no se reutilicen ETags viejos.
+# Con varios workers las invalidaciones se reparten por el bus de eventos (EVENTS_BACKEND=postgres);
+# con el backend memory cada worker solo ve las suyas y no se puede responder 304
+BOOT_ID = uuid.uuid4().hex[:8]
+_user_versions = VersionMap(settings.AUTH_VERSION_CACHE_SIZE)
+ETAGS_SHARED = settings.WEB_CONCURRENCY <= 1 or events.bus.backend.shared
+
+
+def _token_key(token: str) -> str:
+    # No se guarda el token en claro, solo su digest
+    return hashlib.sha256(token.encode()).hexdigest()
+
+
+def get_token_subject(token: str) -> Optional[str]:
+    """Devuelve el email de un token ya verificado o None si no está en cache"""
+    return token_cache.get(_token_key(token))
+
+
+def remember_token(token: str, email: str, exp: Optional[float]):
+    token_cache.set(_token_key(token), email, expires_at=exp)
+
+
+def get_cached_user(email: str, session) -> Optional[User]:
+    """
+    Reconstruye el usuario desde la cache y lo asocia a la sesion de la peticion
+    sin hacer ningun SELECT. Cada peticion recibe su propia instancia.
+    """
+    data = user_cache.get(email)
+    if data is None:
+        return None
+
+    user = User(**data)
+    # se marca como fila ya persistida para que session.add no haga INSERT
+    make_transient_to_detached(user)
+    session.add(user)
+    return user
+
+
+def remember_user(user: User):
+    user_cache.set(user.email, user.model_dump())
+
+
+def _forget_user(email: str):
+    user_cache.pop(email)
+    _user_versions.bump(email)
+
+
+def invalidate_user(email: str):
+    """Se llama despues de cada commit que cambia puntos, racha, perfil o revisión"""
+    _forget_user(email)
+    # y en los demas workers
+    events.bus.broadcast("invalidate", email)
+
+
+events.bus.on_internal("invalidate", lambda email, data: _forget_user(email))
+
+
+def forget_all():
+    """Tras un cambio masivo (rachas): ningun usuario en cache ni ETag anterior vale"""
+    user_cache.clear()
+    _user_versions.clear()
+
+
+def user_version(email: str) -> int:
+    return _user_versions.get(email)
+
+
+def stats() -> dict:
+    return {
+        "tokens": token_cache.stats(),
+        "users": user_cache.stats(),
+    }
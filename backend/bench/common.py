@@ -0,0 +1,110 @@
+"""
+Utilidades compartidas por los scripts de bench/.
+Se importa antes que cualquier modulo del backend: fija la base de datos de pruebas
+en el entorno porque config.py lee las variables al importarse.
+"""
+import json
+import os
+import platform
+import subprocess
+import sys
+import time
+from datetime import datetime
+from pathlib import Path
+
+BENCH_DIR = Path(__file__).resolve().parent
+BACKEND_DIR = BENCH_DIR.parent
+RESULTS_DIR = BENCH_DIR / "results"
+
+# Nunca se mide contra la base de datos de desarrollo
+os.environ["DATABASE_URL"] = os.getenv("BENCH_DATABASE_URL", f"sqlite:///{BENCH_DIR / 'bench.db'}")
+os.environ.setdefault("SECRET_KEY", "bench-secret-key-not-for-production")
+# el log de peticiones lentas ensuciaria la salida
+os.environ.setdefault("SLOW_REQUEST_MS", "1000000")
+os.environ.setdefault("QUERY_BUDGET_PER_REQUEST", "1000000")
+# todas las peticiones salen de la misma "IP", el limitador de /auth cortaria el login
+os.environ.setdefault("RATE_LIMIT_ENABLED", "false")
+
+if str(BACKEND_DIR) not in sys.path:
+    sys.path.insert(0, str(BACKEND_DIR))
+
+# Todos los usuarios sembrados comparten contraseña (un solo bcrypt al sembrar)
+BENCH_PASSWORD = "bench-password"
+
+
+def bench_email(user_index: int) -> str:
+    return f"bench{user_index}@focus.test"
+
+
+def percentile(sorted_samples, p: float) -> float:
+    if not sorted_samples:
+        return 0.0
+    return sorted_samples[min(len(sorted_samples) - 1, int(p * len(sorted_samples)))]
+
+
+def summarize(latencies, elapsed: float, errors: int = 0, response_bytes: int = None) -> dict:
+    """Resumen de una tanda: rendimiento y percentiles en milisegundos"""
+    samples = sorted(latencies)
+    count = len(samples)
+    extra = {}
+    if response_bytes is not None:
+        # tamaño medio del cuerpo de la respuesta
+        extra["mean_bytes"] = round(response_bytes / count, 1) if count else 0.0
+    return {
+        "requests": count,
+        "errors": errors,
+        "throughput_rps": round(count / elapsed, 2) if elapsed else 0.0,
+        "mean_ms": round(sum(samples) / count * 1000, 3) if count else 0.0,
+        "p50_ms": round(percentile(samples, 0.50) * 1000, 3),
+        "p95_ms": round(percentile(samples, 0.95) * 1000, 3),
+        "p99_ms": round(percentile(samples, 0.99) * 1000, 3),
+        "max_ms": round(samples[-1] * 1000, 3) if count else 0.0,
+        **extra,
+    }
+
+
+def _git_commit() -> str:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            cwd=BACKEND_DIR, capture_output=True, text=True, check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+
+def run_metadata(kind: str, **extra) -> dict:
+    from config import settings
+
+    return {
+        "kind": kind,
+        "timestamp": datetime.utcnow().isoformat(timespec="seconds"),
+        "commit": _git_commit(),
+        "python": platform.python_version(),
+        "machine": platform.machine(),
+        "cpus": os.cpu_count(),
+        "database": settings.DATABASE_URL.split("@")[-1],
+        "db_async": settings.DB_ASYNC,
+        "bcrypt_rounds": settings.BCRYPT_ROUNDS,
+        **extra,
+    }
+
+
+def save_results(kind: str, meta: dict, results: dict, output: str = None) -> Path:
+    """Guarda la ejecucion en JSON para poder compararla luego con bench.compare"""
+    if output:
+        path = Path(output)
+    else:
+        RESULTS_DIR.mkdir(exist_ok=True)
+        path = RESULTS_DIR / f"{kind}-{time.strftime('%Y%m%d-%H%M%S')}-{meta['commit']}.json"
+    path.write_text(json.dumps({"meta": meta, "results": results}, indent=2, ensure_ascii=False))
+    return path
+
+
+def print_table(results: dict):
+    print(f"{'escenario':<28}{'req':>8}{'err':>6}{'rps':>10}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}")
+    for name, row in results.items():
+        print(
+            f"{name:<28}{row['requests']:>8}{row['errors']:>6}{row['throughput_rps']:>10.1f}"
+            f"{row['p50_ms']:>10.2f}{row['p95_ms']:>10.2f}{row['p99_ms']:>10.2f}"
+        )
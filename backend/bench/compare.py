@@ -0,0 +1,72 @@
+"""
+Compara dos ejecuciones guardadas por bench.load o bench.micro.
+Uso (desde la carpeta backend):
+    python -m bench.compare bench/results/base.json bench/results/nuevo.json --threshold 10
+Marca como regresion cualquier escenario cuyo p50/p95/p99 o tamaño de respuesta suba o cuyo rendimiento baje
+mas del umbral (en %). Sale con codigo 1 si hay regresiones, para usarlo en CI.
+"""
+import argparse
+import json
+import sys
+
+# metrica -> True si mas alto es mejor
+METRICS = {
+    "throughput_rps": True,
+    "p50_ms": False,
+    "p95_ms": False,
+    "p99_ms": False,
+    "mean_bytes": False,
+}
+
+
+def _load(path: str) -> dict:
+    with open(path, encoding="utf-8") as f:
+        return json.load(f)
+
+
+def compare(base: dict, new: dict, threshold: float):
+    """Devuelve (filas de la tabla, regresiones)"""
+    rows, regressions = [], []
+    for name, new_row in new["results"].items():
+        base_row = base["results"].get(name)
+        if base_row is None:
+            continue
+        for metric, higher_is_better in METRICS.items():
+            # resultados guardados antes de que existiera la metrica
+            if metric not in base_row or metric not in new_row:
+                continue
+            old, current = base_row[metric], new_row[metric]
+            change = (current - old) / old * 100 if old else 0.0
+            worse = -change if higher_is_better else change
+            flagged = worse > threshold
+            rows.append((name, metric, old, current, change, flagged))
+            if flagged:
+                regressions.append((name, metric, change))
+    return rows, regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compara dos resultados de benchmarks")
+    parser.add_argument("base")
+    parser.add_argument("new")
+    parser.add_argument("--threshold", type=float, default=10.0, help="empeoramiento maximo en %%")
+    args = parser.parse_args()
+
+    base, new = _load(args.base), _load(args.new)
+    print(f"base {base['meta'].get('commit')} ({base['meta'].get('timestamp')})  ->  "
+          f"nuevo {new['meta'].get('commit')} ({new['meta'].get('timestamp')})")
+
+    rows, regressions = compare(base, new, args.threshold)
+    print(f"{'escenario':<28}{'metrica':<16}{'base':>12}{'nuevo':>12}{'cambio':>10}")
+    for name, metric, old, current, change, flagged in rows:
+        mark = "  ⚠️" if flagged else ""
+        print(f"{name:<28}{metric:<16}{old:>12.2f}{current:>12.2f}{change:>9.1f}%{mark}")
+
+    if regressions:
+        print(f"\n❌ {len(regressions)} regresiones por encima del {args.threshold}%")
+        sys.exit(1)
+    print("\n✅ Sin regresiones")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,197 @@
+"""
+Prueba de carga de los endpoints contra la app en el mismo proceso (ASGI, sin red).
+Uso (desde la carpeta backend, con la base sembrada por bench.seed y requirements-dev.txt instalado):
+    python -m bench.load --concurrency 32 --requests 2000
+    python -m bench.load --only sessions --output base.json
+Cada escenario lanza --requests peticiones con --concurrency clientes a la vez
+y guarda rendimiento y p50/p95/p99 en bench/results/ (o --output).
+"""
+import argparse
+import asyncio
+import itertools
+import random
+import time
+import uuid
+from datetime import datetime, timedelta
+
+from bench import common
+
+import httpx
+from sqlalchemy import func
+from sqlmodel import Session, select
+
+from database import read_engine
+from models import User
+from security import create_access_token
+
+
+class Scenario:
+    """Una peticion a medir. build(user, rng) devuelve los argumentos de httpx"""
+
+    def __init__(self, name: str, method: str, path: str, build=None, expected=(200,)):
+        self.name = name
+        self.method = method
+        self.path = path
+        self.build = build or (lambda user, rng: {})
+        self.expected = expected
+
+
+def _form_login(user, rng):
+    return {"data": {"username": user["email"], "password": common.BENCH_PASSWORD}}
+
+
+def _register(user, rng):
+    return {"json": {
+        "email": f"new-{uuid.uuid4().hex}@focus.test",
+        "password": common.BENCH_PASSWORD,
+        "full_name": "Bench nuevo",
+        "career": "Informatica",
+    }}
+
+
+def _offline_batch(user, rng):
+    now = datetime.utcnow()
+    return {"json": {"sessions": [
+        {
+            "idempotency_key": uuid.uuid4().hex,
+            "duration_minutes": rng.choice((15, 25, 40)),
+            "started_at": (now - timedelta(hours=rng.randint(1, 72))).isoformat(),
+        }
+        for _ in range(5)
+    ]}}
+
+
+SCENARIOS = {
+    "auth": [
+        Scenario("auth.login", "POST", "/auth/login", _form_login),
+        Scenario("auth.register", "POST", "/auth/register", _register, expected=(201,)),
+        Scenario("auth.me", "GET", "/auth/me"),
+    ],
+    "users": [
+        Scenario("users.bootstrap", "GET", "/users/bootstrap"),
+        Scenario("users.my_profile", "GET", "/users/my-profile"),
+        Scenario("users.check_weekly_review", "GET", "/users/check-weekly-review"),
+        Scenario("users.onboarding", "POST", "/users/onboarding",
+                 lambda user, rng: {"json": {"score": 10, "archetype": rng.choice("ABC"), "preferred_minutes": 25}}),
+        Scenario("users.update_plan", "POST", "/users/update-plan",
+                 lambda user, rng: {"json": {"new_archetype": rng.choice("ABC"), "new_minutes": 25}}),
+    ],
+    "sessions": [
+        Scenario("sessions.weekly_stats", "GET", "/sessions/weekly-stats"),
+        Scenario("sessions.analytics_month", "GET", "/sessions/analytics",
+                 lambda user, rng: {"params": {"range": "month"}}),
+        Scenario("sessions.analytics_year", "GET", "/sessions/analytics",
+                 lambda user, rng: {"params": {"range": "year"}}),
+        Scenario("sessions.history", "GET", "/sessions/history", lambda user, rng: {"params": {"limit": 50}}),
+        Scenario("sessions.export", "GET", "/sessions/export", lambda user, rng: {"params": {"format": "ndjson"}}),
+        Scenario("sessions.complete", "POST", "/sessions/complete",
+                 lambda user, rng: {"json": {"duration_minutes": rng.choice((15, 25, 40))}}),
+        Scenario("sessions.complete_batch", "POST", "/sessions/complete-batch", _offline_batch),
+    ],
+    "gamification": [
+        Scenario("gamification.spin", "POST", "/gamification/spin"),
+        Scenario("gamification.buy", "POST", "/gamification/buy",
+                 lambda user, rng: {"json": {"item_id": rng.choice(("rest", "sound", "theme"))}}),
+        Scenario("gamification.inventory", "GET", "/gamification/inventory"),
+        Scenario("gamification.catalog", "GET", "/gamification/catalog"),
+    ],
+    "goals": [
+        Scenario("goals.list", "GET", "/goals/"),
+        Scenario("goals.progress", "GET", "/goals/progress"),
+    ],
+    "leaderboard": [
+        Scenario("leaderboard.top", "GET", "/leaderboard/top", lambda user, rng: {"params": {"board": "points"}}),
+        Scenario("leaderboard.me", "GET", "/leaderboard/me"),
+    ],
+}
+
+
+def load_users(sample: int, rng: random.Random) -> list:
+    """Muestra de usuarios sembrados con un token ya firmado (sin pasar por bcrypt)"""
+    with Session(read_engine) as session:
+        max_id = session.exec(select(func.max(User.id))).one() or 0
+        if not max_id:
+            raise SystemExit("La base de benchmarks esta vacia, ejecuta antes: python -m bench.seed")
+        ids = rng.sample(range(1, max_id + 1), min(sample, max_id))
+        rows = session.exec(select(User.id, User.email).where(User.id.in_(ids))).all()
+    return [
+        {"id": user_id, "email": email, "headers": {"Authorization": f"Bearer {create_access_token({'sub': email})}"}}
+        for user_id, email in rows
+    ]
+
+
+async def run_scenario(client, scenario: Scenario, users: list, requests: int, concurrency: int, seed: int) -> dict:
+    rng = random.Random(seed)
+    counter = itertools.count()
+    latencies, errors, response_bytes = [], 0, 0
+
+    async def worker():
+        nonlocal errors, response_bytes
+        while next(counter) < requests:
+            user = rng.choice(users)
+            kwargs = scenario.build(user, rng)
+            start = time.perf_counter()
+            response = await client.request(scenario.method, scenario.path, headers=user["headers"], **kwargs)
+            latencies.append(time.perf_counter() - start)
+            response_bytes += len(response.content)
+            if response.status_code not in scenario.expected:
+                errors += 1
+
+    start = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    return common.summarize(latencies, time.perf_counter() - start, errors, response_bytes)
+
+
+async def run(args) -> dict:
+    from main import app
+
+    rng = random.Random(args.seed)
+    users = load_users(args.users_sample, rng)
+    groups = args.only or list(SCENARIOS)
+    results = {}
+
+    transport = httpx.ASGITransport(app=app)
+    async with app.router.lifespan_context(app):
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+            for group in groups:
+                for scenario in SCENARIOS[group]:
+                    if args.scenario and scenario.name not in args.scenario:
+                        continue
+                    # bcrypt domina login y registro, se lanzan menos peticiones
+                    requests = args.requests if scenario.name not in ("auth.login", "auth.register") else args.auth_requests
+                    for _ in range(args.warmup):
+                        user = rng.choice(users)
+                        await client.request(scenario.method, scenario.path, headers=user["headers"], **scenario.build(user, rng))
+                    results[scenario.name] = await run_scenario(
+                        client, scenario, users, requests, args.concurrency, args.seed
+                    )
+                    row = results[scenario.name]
+                    print(f"  {scenario.name:<28} {row['throughput_rps']:>9.1f} rps  p99 {row['p99_ms']:.2f} ms")
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Prueba de carga de los routers")
+    parser.add_argument("--concurrency", type=int, default=32)
+    parser.add_argument("--requests", type=int, default=2000, help="peticiones por escenario")
+    parser.add_argument("--auth-requests", type=int, default=200, help="peticiones para login y registro")
+    parser.add_argument("--warmup", type=int, default=20, help="peticiones sin medir antes de cada escenario")
+    parser.add_argument("--users-sample", type=int, default=1000, help="usuarios distintos que hacen peticiones")
+    parser.add_argument("--only", nargs="*", choices=list(SCENARIOS), help="grupos de escenarios")
+    parser.add_argument("--scenario", nargs="*", help="nombres concretos, ej. sessions.history")
+    parser.add_argument("--seed", type=int, default=1234)
+    parser.add_argument("--output", help="ruta del JSON (por defecto bench/results/)")
+    args = parser.parse_args()
+
+    print(f"🚀 carga con concurrencia {args.concurrency}")
+    results = asyncio.run(run(args))
+    common.print_table(results)
+    meta = common.run_metadata(
+        "load", concurrency=args.concurrency, requests=args.requests, users_sample=args.users_sample, seed=args.seed
+    )
+    path = common.save_results("load", meta, results, args.output)
+    print(f"📄 {path}")
+
+
+if __name__ == "__main__":
+    main()
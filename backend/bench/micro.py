@@ -0,0 +1,134 @@
+"""
+Micro-benchmarks de los caminos calientes, medidos por separado de HTTP.
+Uso (desde la carpeta backend):
+    python -m bench.micro
+    python -m bench.micro --only verify_password create_access_token --iterations 200
+weekly_stats y bootstrap_* necesitan la base sembrada por bench.seed, el resto no toca la DB.
+"""
+import argparse
+import random
+import time
+
+from bench import common
+
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse, ORJSONResponse
+from jose import jwt
+from pydantic import TypeAdapter
+from sqlalchemy import func
+from sqlmodel import Session, select
+
+import auth_cache
+from activity import weekly_stats
+from config import settings
+from database import engine
+from models import User
+from schemas import BootstrapOut
+from security import create_access_token, get_password_hash, verify_password
+
+
+def bench_verify_password(iterations: int, rng: random.Random):
+    password_hash = get_password_hash(common.BENCH_PASSWORD)
+    return lambda: verify_password(common.BENCH_PASSWORD, password_hash)
+
+
+def bench_create_access_token(iterations: int, rng: random.Random):
+    return lambda: create_access_token({"sub": common.bench_email(rng.randrange(1_000_000))})
+
+
+def bench_jwt_decode(iterations: int, rng: random.Random):
+    tokens = [create_access_token({"sub": common.bench_email(i)}) for i in range(256)]
+    return lambda: jwt.decode(rng.choice(tokens), settings.SECRET_KEY, algorithms=[settings.ALGORITHM])
+
+
+def bench_token_cache_hit(iterations: int, rng: random.Random):
+    tokens = [create_access_token({"sub": common.bench_email(i)}) for i in range(256)]
+    for i, token in enumerate(tokens):
+        auth_cache.remember_token(token, common.bench_email(i), None)
+    return lambda: auth_cache.get_token_subject(rng.choice(tokens))
+
+
+def bench_weekly_stats(iterations: int, rng: random.Random):
+    session = Session(engine)
+    max_id = session.exec(select(func.max(User.id))).one()
+    if not max_id:
+        raise SystemExit("weekly_stats necesita datos, ejecuta antes: python -m bench.seed")
+    return lambda: weekly_stats(session, rng.randint(1, max_id))
+
+
+def _bootstrap_payload(rng: random.Random) -> dict:
+    from routers.users import _load_bootstrap
+
+    with Session(engine) as session:
+        email = session.exec(select(User.email).order_by(func.random()).limit(1)).first()
+        if email is None:
+            raise SystemExit("bootstrap_* necesita datos, ejecuta antes: python -m bench.seed")
+        data = _load_bootstrap(session, email)
+    data.pop("valid_until")
+    return data
+
+
+def bench_bootstrap_response(iterations: int, rng: random.Random):
+    # lo que hace FastAPI con la respuesta de /users/bootstrap: validar con BootstrapOut y escribir con orjson
+    data = _bootstrap_payload(rng)
+    adapter = TypeAdapter(BootstrapOut)
+    return lambda: ORJSONResponse(adapter.dump_python(adapter.validate_python(data), mode="json"))
+
+
+def bench_bootstrap_jsonable(iterations: int, rng: random.Random):
+    # la misma respuesta por el camino generico (sin response_model): dicts + jsonable_encoder + json.dumps
+    data = _bootstrap_payload(rng)
+    data["user"] = data["user"].model_dump(exclude={"password_hash"})
+    data["inventory"] = [row._asdict() for row in data["inventory"]]
+    return lambda: JSONResponse(jsonable_encoder(data))
+
+
+# nombre -> (preparacion, iteraciones por defecto); bcrypt es lento a proposito
+BENCHMARKS = {
+    "verify_password": (bench_verify_password, 50),
+    "create_access_token": (bench_create_access_token, 20_000),
+    "jwt_decode": (bench_jwt_decode, 20_000),
+    "token_cache_hit": (bench_token_cache_hit, 100_000),
+    "weekly_stats": (bench_weekly_stats, 5_000),
+    "bootstrap_response": (bench_bootstrap_response, 20_000),
+    "bootstrap_jsonable": (bench_bootstrap_jsonable, 20_000),
+}
+
+
+def measure(fn, iterations: int, warmup: int) -> dict:
+    for _ in range(warmup):
+        fn()
+    latencies = []
+    start = time.perf_counter()
+    for _ in range(iterations):
+        t0 = time.perf_counter()
+        fn()
+        latencies.append(time.perf_counter() - t0)
+    return common.summarize(latencies, time.perf_counter() - start)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Micro-benchmarks de funciones calientes")
+    parser.add_argument("--only", nargs="*", choices=list(BENCHMARKS))
+    parser.add_argument("--iterations", type=int, help="sobrescribe las iteraciones por defecto")
+    parser.add_argument("--warmup", type=int, default=5)
+    parser.add_argument("--seed", type=int, default=1234)
+    parser.add_argument("--output", help="ruta del JSON (por defecto bench/results/)")
+    args = parser.parse_args()
+
+    results = {}
+    for name in args.only or list(BENCHMARKS):
+        setup, default_iterations = BENCHMARKS[name]
+        iterations = args.iterations or default_iterations
+        fn = setup(iterations, random.Random(args.seed))
+        results[name] = measure(fn, iterations, args.warmup)
+        row = results[name]
+        print(f"  {name:<22} {row['throughput_rps']:>12.1f} ops/s  p50 {row['p50_ms']:.4f} ms  p99 {row['p99_ms']:.4f} ms")
+
+    common.print_table(results)
+    path = common.save_results("micro", common.run_metadata("micro", seed=args.seed), results, args.output)
+    print(f"📄 {path}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,125 @@
+"""
+Comprueba el plan de ejecucion de todas las consultas que lanzan los routers.
+Uso (desde la carpeta backend, con la base sembrada por bench.seed):
+    python -m bench.plans
+    python -m bench.plans --verbose
+Ejecuta una vez cada escenario de bench.load, captura el SQL real con sus parametros
+y le pasa EXPLAIN QUERY PLAN (SQLite) o EXPLAIN (Postgres). Sale con codigo 1 si alguna
+consulta recorre una tabla entera en vez de usar un indice.
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import re
+import sys
+
+from bench import common
+
+# el plan se saca con el motor sync aunque la app este en modo async
+os.environ["DB_ASYNC"] = "false"
+
+import httpx
+from sqlalchemy import event
+
+from bench.load import SCENARIOS, load_users
+from database import engine, read_engine
+
+# Solo se explican lecturas y escrituras con WHERE, un INSERT ... VALUES no tiene plan que mirar
+EXPLAINABLE = ("SELECT", "UPDATE", "DELETE", "WITH")
+# SCAN sin USING INDEX = recorrido completo; CONSTANT ROW y subconsultas no son tablas
+SQLITE_FULL_SCAN = re.compile(r"^SCAN (?!CONSTANT ROW)(?!\()(\S+)(?!.*USING)")
+
+
+def capture_statements(args) -> dict:
+    """Lanza cada escenario una vez y devuelve {sql: (escenario, parametros)}"""
+    from main import app
+
+    captured = {}
+    current = {"scenario": None}
+
+    def _capture(conn, cursor, statement, parameters, context, executemany):
+        if current["scenario"] and not executemany and statement.lstrip().upper().startswith(EXPLAINABLE):
+            captured.setdefault(statement, (current["scenario"], parameters))
+
+    async def run():
+        users = load_users(50, random.Random(args.seed))
+        rng = random.Random(args.seed)
+        transport = httpx.ASGITransport(app=app)
+        async with app.router.lifespan_context(app):
+            async with httpx.AsyncClient(transport=transport, base_url="http://plans") as client:
+                for scenarios in SCENARIOS.values():
+                    for scenario in scenarios:
+                        current["scenario"] = scenario.name
+                        user = rng.choice(users)
+                        response = await client.request(
+                            scenario.method, scenario.path, headers=user["headers"], **scenario.build(user, rng)
+                        )
+                        if response.status_code not in scenario.expected:
+                            print(f"⚠️ {scenario.name} devolvio {response.status_code}")
+                        current["scenario"] = None
+
+    # lecturas y escrituras van por motores distintos (database.py), se escuchan los dos
+    engines = {engine, read_engine}
+    for target in engines:
+        event.listen(target, "before_cursor_execute", _capture)
+    try:
+        asyncio.run(run())
+    finally:
+        for target in engines:
+            event.remove(target, "before_cursor_execute", _capture)
+    return captured
+
+
+def explain_sqlite(connection, statement: str, parameters):
+    rows = connection.exec_driver_sql("EXPLAIN QUERY PLAN " + statement, parameters).all()
+    details = [row[-1] for row in rows]
+    full_scans = [match.group(1) for match in map(SQLITE_FULL_SCAN.match, details) if match]
+    return details, full_scans
+
+
+def _postgres_nodes(plan: dict):
+    yield plan
+    for child in plan.get("Plans", []):
+        yield from _postgres_nodes(child)
+
+
+def explain_postgres(connection, statement: str, parameters):
+    raw = connection.exec_driver_sql("EXPLAIN (FORMAT JSON) " + statement, parameters).scalar()
+    plan = (raw if isinstance(raw, list) else json.loads(raw))[0]["Plan"]
+    nodes = list(_postgres_nodes(plan))
+    details = [f"{node['Node Type']} {node.get('Relation Name', '')} {node.get('Index Name', '')}".strip() for node in nodes]
+    full_scans = [node["Relation Name"] for node in nodes if node["Node Type"] == "Seq Scan"]
+    return details, full_scans
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Falla si alguna consulta de los routers hace un full scan")
+    parser.add_argument("--allow", nargs="*", default=[], help="tablas en las que se tolera un full scan")
+    parser.add_argument("--verbose", action="store_true", help="muestra el plan de todas las consultas")
+    parser.add_argument("--seed", type=int, default=1234)
+    args = parser.parse_args()
+
+    captured = capture_statements(args)
+    explain = explain_postgres if engine.dialect.name == "postgresql" else explain_sqlite
+
+    failures = 0
+    with engine.connect() as connection:
+        for statement, (scenario, parameters) in captured.items():
+            details, full_scans = explain(connection, statement, parameters)
+            full_scans = [table for table in full_scans if table not in args.allow]
+            if full_scans:
+                failures += 1
+            if full_scans or args.verbose:
+                print(f"{'❌' if full_scans else '✅'} [{scenario}] {' '.join(statement.split())[:160]}")
+                for line in details:
+                    print(f"      {line}")
+        connection.rollback()
+
+    print(f"\n{len(captured)} consultas revisadas, {failures} con full scan")
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,172 @@
+"""
+Siembra una base de datos sintetica para los benchmarks.
+Uso (desde la carpeta backend):
+    python -m bench.seed --users 100000 --sessions-per-user 100
+La base se elige con BENCH_DATABASE_URL (por defecto bench/bench.db) y se borra antes de sembrar.
+Con la misma --seed se obtiene siempre el mismo dataset.
+"""
+import argparse
+import random
+import time
+from datetime import datetime, timedelta
+
+from bench import common
+
+from sqlalchemy import text
+from sqlmodel import SQLModel, Session
+
+from activity import backfill_daily_activity
+from goals import backfill_current_week
+from catalog import catalog
+import migrations
+from database import engine, create_db_and_tables
+from models import User, Profile, Goal, UserItem, Session as SessionModel
+from security import get_password_hash
+
+ARCHETYPES = ("A", "B", "C")
+CAREERS = ("Informatica", "Derecho", "Medicina", "Psicologia", "Historia", "Economia")
+ABANDON_REASONS = (None, "distraccion", "cansancio", "interrupcion")
+MINUTES = (15, 25, 40, 50)
+
+
+def _chunks(total: int, size: int):
+    for start in range(0, total, size):
+        yield start, min(start + size, total)
+
+
+def _insert(connection, table, rows):
+    if rows:
+        connection.execute(table.insert(), rows)
+
+
+def seed_users(rng: random.Random, users: int, chunk: int):
+    password_hash = get_password_hash(common.BENCH_PASSWORD)
+    now = datetime.utcnow()
+    for low, high in _chunks(users, chunk):
+        user_rows, profile_rows = [], []
+        for index in range(low, high):
+            streak = rng.choice((0, 0, 1, 2, 3, 5, 8, 13, 30))
+            user_rows.append({
+                "id": index + 1,
+                "email": common.bench_email(index),
+                "password_hash": password_hash,
+                "full_name": f"Bench {index}",
+                "career": rng.choice(CAREERS),
+                "created_at": now - timedelta(days=rng.randint(10, 400)),
+                # saldo alto para que la ruleta y la tienda no fallen por falta de puntos
+                "current_points": 1_000_000 + rng.randint(0, 50_000),
+                "current_streak_days": streak,
+                "last_streak_date": now - timedelta(days=1) if streak else None,
+                "last_weekly_review": now - timedelta(days=rng.randint(0, 14)),
+            })
+            profile_rows.append({"user_id": index + 1, "archetype": rng.choice(ARCHETYPES)})
+        with engine.begin() as connection:
+            _insert(connection, User.__table__, user_rows)
+            _insert(connection, Profile.__table__, profile_rows)
+
+
+def seed_sessions(rng: random.Random, users: int, per_user: int, days: int, chunk: int):
+    """Sesiones repartidas en los ultimos `days` dias, ~80% completadas"""
+    now = datetime.utcnow()
+    total = users * per_user
+    for low, high in _chunks(total, chunk):
+        rows = []
+        for index in range(low, high):
+            minutes = rng.choice(MINUTES)
+            started_at = now - timedelta(seconds=rng.randint(0, days * 86400))
+            completed = rng.random() < 0.8
+            rows.append({
+                "user_id": index // per_user + 1,
+                "intended_minutes": minutes,
+                "started_at": started_at,
+                "ended_at": started_at + timedelta(minutes=minutes if completed else rng.randint(1, minutes)),
+                "completed": completed,
+                "abandon_reason": None if completed else rng.choice(ABANDON_REASONS),
+            })
+        with engine.begin() as connection:
+            _insert(connection, SessionModel.__table__, rows)
+        print(f"  sesiones {high}/{total}", end="\r", flush=True)
+    print()
+
+
+def seed_inventory(rng: random.Random, users: int, max_items: int, chunk: int):
+    items = list(catalog.items.values())
+    now = datetime.utcnow()
+    for low, high in _chunks(users, chunk):
+        rows = []
+        for index in range(low, high):
+            for item in rng.sample(items, rng.randint(0, min(max_items, len(items)))):
+                rows.append({
+                    "user_id": index + 1,
+                    "item_id": item["id"],
+                    "item_name": item["name"],
+                    "quantity": rng.randint(1, 5),
+                    "acquired_at": now - timedelta(days=rng.randint(0, 90)),
+                })
+        with engine.begin() as connection:
+            _insert(connection, UserItem.__table__, rows)
+
+
+def seed_goals(rng: random.Random, users: int, max_goals: int, chunk: int):
+    now = datetime.utcnow()
+    for low, high in _chunks(users, chunk):
+        rows = []
+        for index in range(low, high):
+            for number in range(rng.randint(0, max_goals)):
+                rows.append({
+                    "user_id": index + 1,
+                    "title": f"Meta {number + 1}",
+                    "target_minutes_week": rng.choice((60, 120, 300, 600)),
+                    "is_active": rng.random() < 0.9,
+                    "created_at": now - timedelta(days=rng.randint(0, 90)),
+                })
+        with engine.begin() as connection:
+            _insert(connection, Goal.__table__, rows)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Siembra la base de datos de benchmarks")
+    parser.add_argument("--users", type=int, default=10_000)
+    parser.add_argument("--sessions-per-user", type=int, default=100)
+    parser.add_argument("--days", type=int, default=365, help="ventana de fechas de las sesiones")
+    parser.add_argument("--max-items", type=int, default=4, help="items distintos por usuario como maximo")
+    parser.add_argument("--max-goals", type=int, default=3, help="metas por usuario como maximo")
+    parser.add_argument("--chunk", type=int, default=50_000, help="filas por transaccion")
+    parser.add_argument("--seed", type=int, default=1234)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    start = time.perf_counter()
+
+    SQLModel.metadata.drop_all(engine)
+    migrations.schema_version.drop(engine, checkfirst=True)
+    create_db_and_tables()
+    # los indices de session se crean al final: insertar sin ellos es mucho mas rapido
+    session_indexes = list(SessionModel.__table__.indexes)
+    for index in session_indexes:
+        index.drop(engine)
+
+    print(f"🌱 {args.users} usuarios")
+    seed_users(rng, args.users, args.chunk)
+    print(f"🌱 {args.users * args.sessions_per_user} sesiones")
+    seed_sessions(rng, args.users, args.sessions_per_user, args.days, args.chunk)
+    print("🌱 inventarios")
+    seed_inventory(rng, args.users, args.max_items, args.chunk)
+    print("🌱 metas")
+    seed_goals(rng, args.users, args.max_goals, args.chunk)
+
+    print("🔧 indices y resumen diario")
+    for index in session_indexes:
+        index.create(engine)
+    with Session(engine) as session:
+        backfill_daily_activity(session)
+        backfill_current_week(session, datetime.utcnow().date())
+    if engine.dialect.name == "sqlite":
+        with engine.begin() as connection:
+            connection.execute(text("ANALYZE"))
+
+    print(f"✅ Dataset listo en {time.perf_counter() - start:.1f}s ({engine.url.render_as_string(hide_password=True)})")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,93 @@
+"""
+Arranque en frio: cuanto tarda un proceso nuevo de uvicorn en responder /health.
+Cada ronda lanza el servidor desde cero (como al escalar desde cero) y mide desde el spawn
+hasta la primera respuesta; startup_ms es lo que el propio proceso dice en /health
+(importaciones de la app + lifespan, sin el interprete ni uvicorn).
+Uso (desde la carpeta backend):
+    python -m bench.startup
+    python -m bench.startup --runs 20 --only cold
+La base debe existir (bench.seed o un arranque previo), si no se mide tambien el create_all.
+El suelo lo marcan las importaciones de fastapi, pydantic, sqlalchemy y sqlmodel; para ver cuanto
+es de la app y cuanto de las librerias (STARTUP_PROFILE=true da el reparto por grupos):
+    python -X importtime -c "import main" 2> imports.txt
+    python -c "import fastapi, sqlmodel"     # solo las librerias, sin nada de la app
+"""
+import argparse
+import os
+import socket
+import subprocess
+import sys
+import time
+
+import httpx
+
+from bench import common
+
+# escenario -> variables de entorno extra del servidor
+SCENARIOS = {
+    "cold": {},
+    "warmup": {"WARMUP_ON_STARTUP": "true"},
+}
+
+
+def _free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def start_once(extra_env: dict, timeout: float) -> tuple:
+    """Lanza uvicorn, espera al primer 200 de /health y lo para. Devuelve (segundos, startup_ms)"""
+    port = _free_port()
+    env = {**os.environ, "STARTUP_PROFILE": "false", **extra_env}
+    start = time.perf_counter()
+    server = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "main:app", "--port", str(port), "--log-level", "warning"],
+        cwd=common.BACKEND_DIR, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE,
+    )
+    try:
+        with httpx.Client(base_url=f"http://127.0.0.1:{port}") as client:
+            while time.perf_counter() - start < timeout:
+                if server.poll() is not None:
+                    raise RuntimeError(f"el servidor termino al arrancar:\n{server.stderr.read().decode()}")
+                try:
+                    response = client.get("/health")
+                except httpx.TransportError:
+                    time.sleep(0.005)
+                    continue
+                if response.status_code == 200:
+                    return time.perf_counter() - start, response.json()["startup_ms"]
+        raise RuntimeError(f"sin respuesta de /health en {timeout}s")
+    finally:
+        server.terminate()
+        server.wait()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Tiempo hasta la primera respuesta de un proceso nuevo")
+    parser.add_argument("--only", nargs="*", choices=list(SCENARIOS))
+    parser.add_argument("--runs", type=int, default=10)
+    parser.add_argument("--timeout", type=float, default=30)
+    parser.add_argument("--output", help="ruta del JSON (por defecto bench/results/)")
+    args = parser.parse_args()
+
+    results = {}
+    for name in args.only or list(SCENARIOS):
+        latencies, reported = [], []
+        started = time.perf_counter()
+        for _ in range(args.runs):
+            seconds, startup_ms = start_once(SCENARIOS[name], args.timeout)
+            latencies.append(seconds)
+            reported.append(startup_ms)
+        results[name] = common.summarize(latencies, time.perf_counter() - started)
+        results[name]["app_startup_ms"] = round(sorted(reported)[len(reported) // 2], 1)
+        row = results[name]
+        print(f"  {name:<10} primera respuesta p50 {row['p50_ms']:.0f} ms  (la app dice {row['app_startup_ms']:.0f} ms)")
+
+    common.print_table(results)
+    path = common.save_results("startup", common.run_metadata("startup", runs=args.runs), results, args.output)
+    print(f"📄 {path}")
+
+
+if __name__ == "__main__":
+    main()
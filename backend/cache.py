@@ -0,0 +1,110 @@
+import threading
+import time
+from collections import OrderedDict
+
+
+class TTLCache:
+    """
+    Cache LRU acotada en memoria con expiración por entrada.
+    Es segura entre hilos porque los endpoints sync corren en el threadpool.
+    """
+
+    def __init__(self, maxsize: int, ttl: float):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._data = OrderedDict()  # clave -> (expira_en, valor)
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key, default=None):
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                self.misses += 1
+                return default
+
+            expires_at, value = entry
+            if expires_at <= time.time():
+                # caducada, se descarta como si no existiera
+                del self._data[key]
+                self.misses += 1
+                return default
+
+            self._data.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def set(self, key, value, expires_at: float = None):
+        """Guarda un valor. Si no se pasa expires_at se usa el TTL por defecto"""
+        if expires_at is None:
+            expires_at = time.time() + self.ttl
+
+        with self._lock:
+            self._data[key] = (expires_at, value)
+            self._data.move_to_end(key)
+            # se expulsa lo menos usado si se pasa del tamaño maximo
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def pop(self, key):
+        with self._lock:
+            self._data.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def stats(self) -> dict:
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_ratio": round(self.hits / total, 4) if total else 0.0,
+                "size": len(self._data),
+                "maxsize": self.maxsize,
+            }
+
+
+class VersionMap:
+    """
+    Version por clave (ETags) acotada a las maxsize claves usadas mas recientemente.
+    Una clave expulsada no vuelve a 0: devuelve la mayor version expulsada hasta ahora,
+    asi ningun ETag emitido antes de la expulsion vuelve a coincidir.
+    """
+
+    def __init__(self, maxsize: int):
+        self.maxsize = maxsize
+        self._data = OrderedDict()  # clave -> version
+        self._floor = 0
+        self._clock = 0
+        self._lock = threading.Lock()
+
+    def bump(self, key) -> int:
+        with self._lock:
+            self._clock += 1
+            self._data[key] = self._clock
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                _, version = self._data.popitem(last=False)
+                self._floor = max(self._floor, version)
+            return self._clock
+
+    def clear(self):
+        """Todas las claves pasan a una version nueva (ningun ETag anterior vale)"""
+        with self._lock:
+            self._clock += 1
+            self._floor = self._clock
+            self._data.clear()
+
+    def get(self, key) -> int:
+        with self._lock:
+            version = self._data.get(key)
+            if version is None:
+                return self._floor
+            self._data.move_to_end(key)
+            return version
+
+    def __len__(self):
+        return len(self._data)
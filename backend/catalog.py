@@ -0,0 +1,46 @@
+import json
+from typing import Dict, Optional
+
+import orjson
+
+from config import settings
+
+# Catalogo de la tienda. Los precios salen siempre de aqui, nunca de la peticion.
+# Subir CATALOG_VERSION cada vez que cambie un precio o se añada un item.
+CATALOG_VERSION = 1
+ITEMS = [
+    {"id": "theme", "name": "Cambiar tema de la app", "price": 20},
+    {"id": "rest", "name": "+5 min descanso", "price": 10},
+    {"id": "streak", "name": "Comodín Salvar racha", "price": 50},
+    {"id": "sound", "name": "Sonido ambiente premium", "price": 5},
+    {"id": "guilt", "name": "10 min de móvil sin culpa", "price": 20},
+    {"id": "reminder", "name": "10 min de redes sociales", "price": 10},
+]
+
+
+class Catalog:
+    """Catalogo en memoria, se carga una vez y se consulta por id en O(1)"""
+
+    def __init__(self, version: int, items: list):
+        self.version = version
+        self.items: Dict[str, dict] = {item["id"]: item for item in items}
+        # respuesta de /gamification/catalog ya serializada, el catalogo no cambia en marcha
+        self.json: bytes = orjson.dumps(self.as_dict())
+
+    @classmethod
+    def load(cls, path: Optional[str] = None) -> "Catalog":
+        # CATALOG_FILE permite cambiar el catalogo sin tocar el codigo: {"version": 2, "items": [...]}
+        if path:
+            with open(path, encoding="utf-8") as f:
+                data = json.load(f)
+            return cls(data["version"], data["items"])
+        return cls(CATALOG_VERSION, ITEMS)
+
+    def get(self, item_id: str) -> Optional[dict]:
+        return self.items.get(item_id)
+
+    def as_dict(self) -> dict:
+        return {"version": self.version, "items": list(self.items.values())}
+
+
+catalog = Catalog.load(settings.CATALOG_FILE)
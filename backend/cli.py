@@ -0,0 +1,116 @@
+"""
+Comandos de mantenimiento del backend.
+Uso: python cli.py <comando>   (desde la carpeta backend)
+"""
+import argparse
+
+from sqlalchemy import inspect
+from sqlmodel import Session
+
+from config import settings
+from database import engine, create_db_and_tables
+
+
+def cmd_migrate(args):
+    """Aplica las migraciones pendientes del esquema (o muestra la version con --status)"""
+    import migrations
+
+    version = migrations.current_version(engine)
+    if args.status:
+        print(f"Version del esquema: {version if version is not None else 'sin migraciones'} "
+              f"(ultima: {migrations.LATEST_VERSION})")
+        return
+
+    if version is None and not inspect(engine).has_table("user"):
+        # base vacia: se crea directamente en la ultima version
+        create_db_and_tables()
+        print(f"✅ Base de datos creada en la version {migrations.LATEST_VERSION}")
+        return
+
+    final = migrations.migrate(engine, target=args.target, log=lambda msg: print(f"🔧 {msg}"))
+    print(f"✅ Esquema en la version {final}")
+
+
+def cmd_backfill_activity(args):
+    """Reconstruye user_daily_activity desde las sesiones existentes"""
+    from activity import backfill_daily_activity
+
+    create_db_and_tables()
+    with Session(engine) as session:
+        rows = backfill_daily_activity(session, batch_users=args.batch_users)
+    print(f"✅ Resumen diario reconstruido: {rows} filas")
+
+
+def cmd_reset_streaks(args):
+    """Pone a 0 las rachas de quien no estudio ni hoy ni ayer (un solo UPDATE)"""
+    from activity import mark_streaks_changed, reset_broken_streaks
+
+    create_db_and_tables()
+    with Session(engine) as session:
+        touched = reset_broken_streaks(session)
+        if touched:
+            mark_streaks_changed(session)
+    print(f"✅ Rachas reiniciadas: {len(touched)} (la app lo recoge en {settings.STREAK_REFRESH_POLL_SECONDS:g} s)")
+
+
+def cmd_rebuild_streaks(args):
+    """Recalcula todas las rachas desde el historial de sesiones"""
+    from activity import mark_streaks_changed, rebuild_streaks
+
+    create_db_and_tables()
+    with Session(engine) as session:
+        active = rebuild_streaks(session, batch_users=args.batch_users)
+        mark_streaks_changed(session)
+    print(f"✅ Rachas recalculadas, {active} usuarios con racha activa "
+          f"(la app lo recoge en {settings.STREAK_REFRESH_POLL_SECONDS:g} s)")
+
+
+def cmd_compact_sessions(args):
+    """Compacta las sesiones de mas de RETENTION_DAYS en resumenes mensuales (retomable)"""
+    from retention import compact_sessions
+
+    create_db_and_tables()
+    if args.full_vacuum and engine.dialect.name == "sqlite":
+        # una sola vez en bases creadas antes de auto_vacuum=INCREMENTAL; reescribe el archivo entero
+        with engine.connect().execution_options(isolation_level="AUTOCOMMIT") as connection:
+            connection.exec_driver_sql("PRAGMA auto_vacuum=INCREMENTAL")
+            connection.exec_driver_sql("VACUUM")
+        print("✅ Base convertida a auto_vacuum=INCREMENTAL")
+    result = compact_sessions(
+        engine, batch_size=args.batch_size, batch_users=args.batch_users, log=lambda msg: print(f"🔧 {msg}")
+    )
+    print(f"✅ Sesiones compactadas: {result['compacted']}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Comandos de mantenimiento de Focus")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    migrate = subparsers.add_parser("migrate", help=cmd_migrate.__doc__)
+    migrate.add_argument("--target", type=int, help="version hasta la que migrar (por defecto la ultima)")
+    migrate.add_argument("--status", action="store_true")
+    migrate.set_defaults(func=cmd_migrate)
+
+    backfill = subparsers.add_parser("backfill-activity", help=cmd_backfill_activity.__doc__)
+    backfill.add_argument("--batch-users", type=int, default=5000)
+    backfill.set_defaults(func=cmd_backfill_activity)
+
+    reset = subparsers.add_parser("reset-streaks", help=cmd_reset_streaks.__doc__)
+    reset.set_defaults(func=cmd_reset_streaks)
+
+    rebuild = subparsers.add_parser("rebuild-streaks", help=cmd_rebuild_streaks.__doc__)
+    rebuild.add_argument("--batch-users", type=int, default=5000)
+    rebuild.set_defaults(func=cmd_rebuild_streaks)
+
+    compact = subparsers.add_parser("compact-sessions", help=cmd_compact_sessions.__doc__)
+    compact.add_argument("--batch-size", type=int, help="sesiones por transaccion (por defecto RETENTION_BATCH_SIZE)")
+    compact.add_argument("--batch-users", type=int, default=5000)
+    compact.add_argument("--full-vacuum", action="store_true", help="SQLite: VACUUM completo para activar auto_vacuum")
+    compact.set_defaults(func=cmd_compact_sessions)
+
+    args = parser.parse_args()
+    args.func(args)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,13 +1,152 @@
 import os
-from dotenv import load_dotenv
+
+
+def _find_env_file():
+    # donde lo buscaba load_dotenv(): la carpeta de este archivo o alguna superior
+    directory = os.path.dirname(os.path.abspath(__file__))
+    while True:
+        candidate = os.path.join(directory, ".env")
+        if os.path.isfile(candidate):
+            return candidate
+        parent = os.path.dirname(directory)
+        if parent == directory:
+            return None
+        directory = parent
+
 
 #carga las variables del archivo .env al sistema
-load_dotenv()
+# en produccion no hay .env (las variables vienen del entorno) y ni se importa dotenv
+_env_file = _find_env_file()
+if _env_file:
+    from dotenv import load_dotenv
+
+    load_dotenv(_env_file)
 
 class Settings:
     SECRET_KEY = os.getenv("SECRET_KEY")
     ALGORITHM = os.getenv("ALGORITHM", "HS256")
     ACCESS_TOKEN_EXPIRE_MINUTES = int(os.getenv("ACCESS_TOKEN_EXPIRE_MINUTES", 30))
 
+    # Cache de autenticación (tokens verificados y usuarios recientes)
+    AUTH_TOKEN_CACHE_SIZE = int(os.getenv("AUTH_TOKEN_CACHE_SIZE", 10000))
+    AUTH_USER_CACHE_SIZE = int(os.getenv("AUTH_USER_CACHE_SIZE", 10000))
+    AUTH_USER_CACHE_TTL_SECONDS = float(os.getenv("AUTH_USER_CACHE_TTL_SECONDS", 30))
+    AUTH_VERSION_CACHE_SIZE = int(os.getenv("AUTH_VERSION_CACHE_SIZE", 100000))  # versiones del ETag de /users/bootstrap
+    # Workers de uvicorn (lo lee tambien uvicorn como valor por defecto de --workers)
+    WEB_CONCURRENCY = int(os.getenv("WEB_CONCURRENCY", 1))
+
+    # Cache de estadisticas largas (/sessions/analytics)
+    ANALYTICS_CACHE_SIZE = int(os.getenv("ANALYTICS_CACHE_SIZE", 5000))
+    ANALYTICS_CACHE_TTL_SECONDS = float(os.getenv("ANALYTICS_CACHE_TTL_SECONDS", 300))
+
+    # Historial y exportacion de sesiones
+    HISTORY_MAX_PAGE_SIZE = int(os.getenv("HISTORY_MAX_PAGE_SIZE", 100))
+    EXPORT_BATCH_SIZE = int(os.getenv("EXPORT_BATCH_SIZE", 500))
+    BATCH_MAX_SESSIONS = int(os.getenv("BATCH_MAX_SESSIONS", 200))
+
+    # Ruleta: maximo de tiradas por peticion
+    SPIN_MAX_COUNT = int(os.getenv("SPIN_MAX_COUNT", 20))
+
+    # Metas: maximo de metas activas por usuario (acota el coste de cada sesion completada)
+    GOALS_MAX_ACTIVE = int(os.getenv("GOALS_MAX_ACTIVE", 20))
+
+    # Catalogo de la tienda (por defecto el de catalog.py)
+    CATALOG_FILE = os.getenv("CATALOG_FILE")
+
+    # Hashing de contraseñas (bcrypt) en un pool dedicado
+    BCRYPT_ROUNDS = int(os.getenv("BCRYPT_ROUNDS", 12))
+    PASSWORD_HASH_BACKEND = os.getenv("PASSWORD_HASH_BACKEND", "thread")  # thread o process
+    PASSWORD_HASH_WORKERS = int(os.getenv("PASSWORD_HASH_WORKERS", 0))  # 0 = numero de CPUs
+    PASSWORD_HASH_QUEUE_SIZE = int(os.getenv("PASSWORD_HASH_QUEUE_SIZE", 16))
+
+    # Limite de intentos en /auth (token buckets por minuto y rafaga), se corta antes de bcrypt
+    # memory = por proceso, sqlite = archivo compartido por todos los workers de la maquina
+    RATE_LIMIT_ENABLED = os.getenv("RATE_LIMIT_ENABLED", "true").lower() == "true"
+    RATE_LIMIT_BACKEND = os.getenv("RATE_LIMIT_BACKEND", "memory")
+    RATE_LIMIT_SQLITE_PATH = os.getenv("RATE_LIMIT_SQLITE_PATH", "ratelimit.db")
+    RATE_LIMIT_MAX_KEYS = int(os.getenv("RATE_LIMIT_MAX_KEYS", 100_000))
+    LOGIN_RATE_PER_IP_PER_MINUTE = float(os.getenv("LOGIN_RATE_PER_IP_PER_MINUTE", 20))
+    LOGIN_RATE_PER_IP_BURST = int(os.getenv("LOGIN_RATE_PER_IP_BURST", 30))
+    LOGIN_RATE_PER_ACCOUNT_PER_MINUTE = float(os.getenv("LOGIN_RATE_PER_ACCOUNT_PER_MINUTE", 5))
+    LOGIN_RATE_PER_ACCOUNT_BURST = int(os.getenv("LOGIN_RATE_PER_ACCOUNT_BURST", 10))
+    REGISTER_RATE_PER_IP_PER_MINUTE = float(os.getenv("REGISTER_RATE_PER_IP_PER_MINUTE", 5))
+    REGISTER_RATE_PER_IP_BURST = int(os.getenv("REGISTER_RATE_PER_IP_BURST", 10))
+
+    # Base de datos (SQLite por defecto, o Postgres con postgresql://...)
+    DATABASE_URL = os.getenv("DATABASE_URL", "sqlite:///database.db")
+    DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", 5))
+    DB_MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", 10))
+    DB_POOL_RECYCLE = int(os.getenv("DB_POOL_RECYCLE", 1800))  # segundos
+    DB_POOL_TIMEOUT = int(os.getenv("DB_POOL_TIMEOUT", 30))
+    DB_LOG_SQL = os.getenv("DB_LOG_SQL", "").lower() == "true"
+    # Lecturas y escrituras separadas (get_read_db / get_write_db)
+    # - SQLite: pool de conexiones de solo lectura + DB_WRITE_POOL_SIZE conexiones de escritura (1 = serializado)
+    # - Postgres: con DATABASE_REPLICA_URL las lecturas van a la replica
+    DB_SPLIT_READS = os.getenv("DB_SPLIT_READS", "true").lower() == "true"
+    DATABASE_REPLICA_URL = os.getenv("DATABASE_REPLICA_URL", "")
+    DB_WRITE_POOL_SIZE = int(os.getenv("DB_WRITE_POOL_SIZE", 1))
+    # Migraciones: con AUTO_MIGRATE=false el arranque no migra y hay que usar cli.py migrate
+    AUTO_MIGRATE = os.getenv("AUTO_MIGRATE", "true").lower() == "true"
+    MIGRATION_BATCH_SIZE = int(os.getenv("MIGRATION_BATCH_SIZE", 1000))
+    # Cuanto espera un worker a que otro termine de migrar (SQLite; en Postgres espera sin limite)
+    MIGRATION_LOCK_TIMEOUT_SECONDS = float(os.getenv("MIGRATION_LOCK_TIMEOUT_SECONDS", 600))
+    # Commit agrupado de /sessions/complete, /spin y /buy (un solo hilo escritor)
+    GROUP_COMMIT_ENABLED = os.getenv("GROUP_COMMIT_ENABLED", "").lower() == "true"
+    GROUP_COMMIT_MAX_DELAY_MS = float(os.getenv("GROUP_COMMIT_MAX_DELAY_MS", 5))  # espera maxima para juntar
+    GROUP_COMMIT_MAX_BATCH = int(os.getenv("GROUP_COMMIT_MAX_BATCH", 64))
+    GROUP_COMMIT_QUEUE_SIZE = int(os.getenv("GROUP_COMMIT_QUEUE_SIZE", 1000))
+    # full, relaxed o vacio (la de siempre). relaxed: SQLite synchronous=OFF, Postgres synchronous_commit=off
+    GROUP_COMMIT_DURABILITY = os.getenv("GROUP_COMMIT_DURABILITY", "")
+    # lo maximo que una escritura espera en cola antes de responder 503 (sin haberse aplicado)
+    GROUP_COMMIT_TIMEOUT_SECONDS = float(os.getenv("GROUP_COMMIT_TIMEOUT_SECONDS", 30))
+    # Trabajo diario que pone a 0 las rachas rotas (ademas de cli.py reset-streaks)
+    STREAK_JOB_ENABLED = os.getenv("STREAK_JOB_ENABLED", "").lower() == "true"
+    STREAK_JOB_TIME_UTC = os.getenv("STREAK_JOB_TIME_UTC", "00:05")  # HH:MM
+    # Cada cuanto mira cada worker si las rachas cambiaron fuera de el (trabajo de otro worker,
+    # cli.py reset-streaks / rebuild-streaks) para reconstruir clasificaciones y caches. 0 = nunca
+    STREAK_REFRESH_POLL_SECONDS = float(os.getenv("STREAK_REFRESH_POLL_SECONDS", 60))
+    # Retencion (retention.py): las sesiones de mas de RETENTION_DAYS se suman en resumenes
+    # mensuales y se borran. /analytics?range=year lee los abandonos de las sesiones, asi que
+    # nunca se compacta nada de los ultimos 366 dias aunque se pida menos
+    RETENTION_DAYS = int(os.getenv("RETENTION_DAYS", 400))
+    RETENTION_BATCH_SIZE = int(os.getenv("RETENTION_BATCH_SIZE", 1000))  # sesiones por transaccion
+    RETENTION_PAUSE_MS = float(os.getenv("RETENTION_PAUSE_MS", 50))  # respiro para el escritor entre tandas
+    RETENTION_VACUUM_PAGES = int(os.getenv("RETENTION_VACUUM_PAGES", 2000))  # SQLite: paginas libres por tanda
+    RETENTION_JOB_ENABLED = os.getenv("RETENTION_JOB_ENABLED", "").lower() == "true"
+    RETENTION_JOB_TIME_UTC = os.getenv("RETENTION_JOB_TIME_UTC", "03:30")  # HH:MM
+    # Modo async: AsyncSession con aiosqlite / asyncpg en vez del threadpool
+    DB_ASYNC = os.getenv("DB_ASYNC", "").lower() == "true"
+
+    # Pragmas que se aplican a cada conexion SQLite
+    SQLITE_JOURNAL_MODE = os.getenv("SQLITE_JOURNAL_MODE", "WAL")
+    SQLITE_SYNCHRONOUS = os.getenv("SQLITE_SYNCHRONOUS", "NORMAL")
+    SQLITE_BUSY_TIMEOUT_MS = int(os.getenv("SQLITE_BUSY_TIMEOUT_MS", 5000))
+    SQLITE_CACHE_SIZE_KB = int(os.getenv("SQLITE_CACHE_SIZE_KB", 20000))
+    SQLITE_MMAP_SIZE = int(os.getenv("SQLITE_MMAP_SIZE", 256 * 1024 * 1024))
+
+    # Metricas (/metrics): peticiones lentas y presupuesto de consultas por peticion (N+1).
+    # Apagado por defecto: /metrics enseña rutas, volumen y estado interno.
+    # Con METRICS_TOKEN hay que mandar "Authorization: Bearer <token>" (bearer_token_file en Prometheus);
+    # sin token, encenderlo solo si el puerto no es publico
+    METRICS_ENABLED = os.getenv("METRICS_ENABLED", "false").lower() == "true"
+    METRICS_TOKEN = os.getenv("METRICS_TOKEN", "")
+    SLOW_REQUEST_MS = float(os.getenv("SLOW_REQUEST_MS", 500))
+    QUERY_BUDGET_PER_REQUEST = int(os.getenv("QUERY_BUDGET_PER_REQUEST", 15))
+
+    # Eventos en vivo (/events/stream por SSE y /events/ws): memory = un solo proceso,
+    # postgres = LISTEN/NOTIFY para que varios workers compartan los eventos
+    EVENTS_BACKEND = os.getenv("EVENTS_BACKEND", "memory")
+    EVENTS_BUFFER_SIZE = int(os.getenv("EVENTS_BUFFER_SIZE", 16))  # eventos pendientes por conexion
+    EVENTS_MAX_STREAMS_PER_USER = int(os.getenv("EVENTS_MAX_STREAMS_PER_USER", 5))
+    EVENTS_HEARTBEAT_SECONDS = float(os.getenv("EVENTS_HEARTBEAT_SECONDS", 25))
+
+    # Arranque en frio (hosting que escala a cero)
+    # - STARTUP_PROFILE: imprime lo que tardan las importaciones y cada paso del lifespan
+    # - WARMUP_ON_STARTUP: antes de aceptar peticiones abre WARMUP_DB_CONNECTIONS conexiones
+    #   por motor y prepara el login (jose, passlib y el hash de relleno de bcrypt)
+    STARTUP_PROFILE = os.getenv("STARTUP_PROFILE", "").lower() == "true"
+    WARMUP_ON_STARTUP = os.getenv("WARMUP_ON_STARTUP", "").lower() == "true"
+    WARMUP_DB_CONNECTIONS = int(os.getenv("WARMUP_DB_CONNECTIONS", 2))
+
 # Instanciamos la clase para usarla donde se necesite
 settings = Settings()
\ No newline at end of file
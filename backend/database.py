@@ -1,27 +1,315 @@
 import os
-from sqlmodel import SQLModel, create_engine, Session
+import logging
+import time
+from typing import Optional, Union
+from sqlalchemy import event
+from sqlalchemy.dialects import sqlite
+from sqlalchemy.pool import AsyncAdaptedQueuePool, QueuePool
+from sqlmodel import create_engine, Session
+from starlette.concurrency import run_in_threadpool
+from config import settings
+import metrics
 
-# Nombre del archivo para los datos SQLite
-sqlite_file_name = "database.db"
-sqlite_url = f"sqlite:///{sqlite_file_name}"
+# sqlalchemy.ext.asyncio tarda ~100ms en importarse: solo se carga con DB_ASYNC=true
+# (arranque en frio); sin el, AsyncSession es None y run_db va siempre por el threadpool
+if settings.DB_ASYNC:
+    from sqlalchemy.ext.asyncio import create_async_engine
+    from sqlmodel.ext.asyncio.session import AsyncSession
+else:
+    AsyncSession = None
 
-# El motor que conecta Python con el archivo
-engine = create_engine(sqlite_url, echo=True)
+sql_logger = logging.getLogger("focus.sql")
+
+
+def normalize_database_url(url: str) -> str:
+    # Render y Heroku entregan postgres://, SQLAlchemy solo acepta postgresql://
+    if url.startswith("postgres://"):
+        return "postgresql://" + url[len("postgres://"):]
+    return url
+
+
+def _apply_sqlite_pragmas(dbapi_connection, connection_record):
+    """Se ejecuta al abrir cada conexion SQLite nueva del pool"""
+    cursor = dbapi_connection.cursor()
+    # solo cuenta en un archivo nuevo (antes de WAL y de la primera tabla), en uno existente
+    # lo aplica el siguiente VACUUM: retention.py devuelve al disco las paginas que libera
+    cursor.execute("PRAGMA auto_vacuum=INCREMENTAL")
+    cursor.execute(f"PRAGMA journal_mode={settings.SQLITE_JOURNAL_MODE}")
+    cursor.execute(f"PRAGMA synchronous={settings.SQLITE_SYNCHRONOUS}")
+    cursor.execute(f"PRAGMA busy_timeout={settings.SQLITE_BUSY_TIMEOUT_MS}")
+    # cache_size negativo significa KiB en vez de numero de paginas
+    cursor.execute(f"PRAGMA cache_size=-{settings.SQLITE_CACHE_SIZE_KB}")
+    cursor.execute(f"PRAGMA mmap_size={settings.SQLITE_MMAP_SIZE}")
+    # SQLite no comprueba las claves ajenas si no se pide; Postgres siempre lo hace.
+    # Asi una escritura que Postgres rechazaria tampoco pasa en SQLite (las huerfanas
+    # de bases anteriores las pasa a la tabla orphan_row la migracion 8)
+    cursor.execute("PRAGMA foreign_keys=ON")
+    cursor.close()
+
+
+def _install_query_hooks(engine):
+    """
+    Mide cada consulta: la cuenta en la peticion en curso y en /metrics (metrics.py)
+    y, con DB_LOG_SQL=true, la loguea con su duracion
+    """
+
+    @event.listens_for(engine, "before_cursor_execute")
+    def _before(conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault("query_start", []).append(time.perf_counter())
+
+    @event.listens_for(engine, "after_cursor_execute")
+    def _after(conn, cursor, statement, parameters, context, executemany):
+        elapsed = time.perf_counter() - conn.info["query_start"].pop()
+        metrics.record_query(statement, elapsed)
+        if settings.DB_LOG_SQL:
+            sql_logger.info(
+                "sql duration_ms=%.2f rows=%s statement=%s",
+                elapsed * 1000,
+                cursor.rowcount,
+                " ".join(statement.split()),
+            )
+
+
+def _timed_pool(pool_class):
+    """Subclase del pool que mide cuanto se espera para obtener una conexion"""
+
+    class TimedPool(pool_class):
+        def _do_get(self):
+            start = time.perf_counter()
+            try:
+                return super()._do_get()
+            finally:
+                metrics.db_pool_wait.observe(value=time.perf_counter() - start)
+
+    TimedPool.__name__ = f"Timed{pool_class.__name__}"
+    return TimedPool
+
+
+_TimedQueuePool = _timed_pool(QueuePool)
+_TimedAsyncQueuePool = _timed_pool(AsyncAdaptedQueuePool)
+
+
+def async_database_url(url: str) -> str:
+    """Cambia el driver por su equivalente async (aiosqlite / asyncpg)"""
+    url = normalize_database_url(url)
+    if url.startswith("sqlite:"):
+        return "sqlite+aiosqlite:" + url[len("sqlite:"):]
+    if url.startswith("postgresql:"):
+        return "postgresql+asyncpg:" + url[len("postgresql:"):]
+    return url
+
+
+def _is_memory_sqlite(url: str) -> bool:
+    return ":memory:" in url or url in ("sqlite://", "sqlite+aiosqlite://")
+
+
+def _engine_kwargs(url: str, is_async: bool = False, role: str = "write") -> dict:
+    kwargs = {"echo": False, "pool_pre_ping": not url.startswith("sqlite")}
+
+    # SQLite en memoria usa su propio pool de una conexion, no admite estos parametros
+    if not _is_memory_sqlite(url):
+        pool_size, max_overflow = settings.DB_POOL_SIZE, settings.DB_MAX_OVERFLOW
+        if role == "write" and url.startswith("sqlite") and settings.DB_SPLIT_READS:
+            # SQLite solo admite un escritor a la vez: las escrituras hacen cola en el pool
+            # en vez de pelearse por el bloqueo y acabar en "database is locked"
+            pool_size, max_overflow = settings.DB_WRITE_POOL_SIZE, 0
+        kwargs.update(
+            poolclass=_TimedAsyncQueuePool if is_async else _TimedQueuePool,
+            pool_size=pool_size,
+            max_overflow=max_overflow,
+            pool_recycle=settings.DB_POOL_RECYCLE,
+            pool_timeout=settings.DB_POOL_TIMEOUT,
+        )
+    return kwargs
+
+
+def _apply_sqlite_query_only(dbapi_connection, connection_record):
+    """Conexiones de lectura: si una escritura llega por error falla en vez de bloquear"""
+    cursor = dbapi_connection.cursor()
+    cursor.execute("PRAGMA query_only=ON")
+    cursor.close()
+
+
+def _sqlite_transactions(engine, default_begin: str):
+    """
+    El driver de SQLite no abre transaccion antes de un SELECT y hace commit al liberar un SAVEPOINT.
+    Se le quita ese control y el BEGIN lo emite SQLAlchemy al empezar cada transaccion:
+    - lectura: BEGIN DEFERRED, todas las consultas de un run_db leen la misma foto (WAL)
+    - escritura: BEGIN IMMEDIATE, el bloqueo se pide al empezar y no a mitad de transaccion
+    Una conexion puede pedir otro modo con execution_options(sqlite_begin="IMMEDIATE").
+    """
+
+    @event.listens_for(engine, "connect")
+    def _driver_autocommit(dbapi_connection, connection_record):
+        dbapi_connection.isolation_level = None
+
+    @event.listens_for(engine, "begin")
+    def _begin(conn):
+        options = conn.get_execution_options()
+        if options.get("isolation_level") != "AUTOCOMMIT":
+            conn.exec_driver_sql(f"BEGIN {options.get('sqlite_begin', default_begin)}")
+
+
+def _configure_engine(engine, role: str = "write"):
+    """Pragmas y logging, comunes al motor sync y al async (via sync_engine)"""
+    if engine.dialect.name == "sqlite":
+        event.listen(engine, "connect", _apply_sqlite_pragmas)
+        if role == "read":
+            event.listen(engine, "connect", _apply_sqlite_query_only)
+        split = settings.DB_SPLIT_READS and not _is_memory_sqlite(str(engine.url))
+        _sqlite_transactions(engine, "IMMEDIATE" if role == "write" and split else "DEFERRED")
+
+    _install_query_hooks(engine)
+
+
+def create_db_engine(url: str = None, role: str = "write"):
+    """
+    Crea el motor a partir de la configuracion.
+    - SQLite: pool por archivo y pragmas (WAL, synchronous, busy_timeout...) al conectar
+    - Postgres: pool con tamaño, overflow y reciclado configurables
+    role="read" es el motor de solo lectura (ver read_database_url)
+    """
+    url = normalize_database_url(url or settings.DATABASE_URL)
+    engine = create_engine(url, **_engine_kwargs(url, role=role))
+    _configure_engine(engine, role)
+    return engine
+
+
+def create_async_db_engine(url: str = None, role: str = "write"):
+    """Igual que create_db_engine pero con driver async, para DB_ASYNC=true"""
+    url = async_database_url(url or settings.DATABASE_URL)
+    engine = create_async_engine(url, **_engine_kwargs(url, is_async=True, role=role))
+    _configure_engine(engine.sync_engine, role)
+    return engine
+
+
+def read_database_url() -> Optional[str]:
+    """
+    A donde van las lecturas, None si comparten motor con las escrituras.
+    - DATABASE_REPLICA_URL (replica de Postgres)
+    - SQLite en archivo: el mismo archivo con su propio pool de conexiones de solo lectura
+    """
+    if settings.DATABASE_REPLICA_URL:
+        return settings.DATABASE_REPLICA_URL
+    url = normalize_database_url(settings.DATABASE_URL)
+    if settings.DB_SPLIT_READS and url.startswith("sqlite") and not _is_memory_sqlite(url):
+        return url
+    return None
+
+
+# El motor que conecta Python con la base de datos
+# (el sync se usa siempre para crear tablas y scripts, el async solo con DB_ASYNC=true)
+# engine es el de escritura; read_engine el de lectura (el mismo objeto si no hay separacion)
+_read_url = read_database_url()
+engine = create_db_engine()
+read_engine = create_db_engine(_read_url, role="read") if _read_url else engine
+async_engine = create_async_db_engine() if settings.DB_ASYNC else None
+async_read_engine = (
+    create_async_db_engine(_read_url, role="read") if settings.DB_ASYNC and _read_url else async_engine
+)
+
+# Nombre del archivo para los datos SQLite (None si es Postgres)
+sqlite_file_name = engine.url.database if engine.dialect.name == "sqlite" else None
 
 def create_db_and_tables():
-    """Crea las tablas si no existen"""
-    # Se importa aquí para que SQLModel registre los modelos antes de crear la DB
-    import models
-    
+    """
+    Deja el esquema al dia: crea las tablas en una base vacia o aplica las migraciones
+    pendientes (migrations.py). Si ya esta al dia solo cuesta un SELECT de la version.
+    Devuelve la version del esquema.
+    """
+    import migrations
+
     # Si existe la variable RESET_DB=true, eliminar la base de datos
     if os.getenv("RESET_DB", "").lower() == "true":
-        if os.path.exists(sqlite_file_name):
-            os.remove(sqlite_file_name)
+        if sqlite_file_name and os.path.exists(sqlite_file_name):
+            engine.dispose()
+            read_engine.dispose()
+            # con WAL tambien quedan los archivos -wal y -shm al lado
+            for path in (sqlite_file_name, f"{sqlite_file_name}-wal", f"{sqlite_file_name}-shm"):
+                if os.path.exists(path):
+                    os.remove(path)
             print("🗑️ Base de datos eliminada por RESET_DB=true")
-    
-    SQLModel.metadata.create_all(engine)
 
-def get_session():
-    """Dependencia para obtener conexión a la DB en cada peticion"""
-    with Session(engine) as session:
-        yield session
\ No newline at end of file
+    return migrations.ensure_schema(engine)
+
+# Dependencias de sesion. Cada endpoint pide la que necesita:
+# - get_read_db: GETs, va al motor de lectura (pool de solo lectura o replica)
+# - get_write_db: lo que hace commit, va al motor de escritura
+# - get_fresh_read_db: lecturas que no pueden llegar con retraso (ver abajo)
+# expire_on_commit=False: run_db cierra la transaccion al terminar y los objetos se siguen leyendo sin IO
+
+def get_read_session():
+    with Session(read_engine, expire_on_commit=False) as session:
+        yield session
+
+def get_write_session():
+    with Session(engine, expire_on_commit=False) as session:
+        yield session
+
+async def get_async_read_session():
+    """Versiones async, no ocupan un hilo durante la peticion"""
+    async with AsyncSession(async_read_engine, expire_on_commit=False) as session:
+        yield session
+
+async def get_async_write_session():
+    async with AsyncSession(async_engine, expire_on_commit=False) as session:
+        yield session
+
+def get_primary_read_session():
+    """Lectura en el primario con su propia sesion (no comparte identity map con la de escritura)"""
+    with Session(engine, expire_on_commit=False) as session:
+        yield session
+
+async def get_async_primary_read_session():
+    async with AsyncSession(async_engine, expire_on_commit=False) as session:
+        yield session
+
+# Las que usan los routers, el modo se elige al arrancar con DB_ASYNC
+get_read_db = get_async_read_session if settings.DB_ASYNC else get_read_session
+get_write_db = get_async_write_session if settings.DB_ASYNC else get_write_session
+
+# Lo que llena la cache de usuarios y el ETag de /users/bootstrap: leido de una replica con retraso,
+# un dato de antes del ultimo commit quedaria guardado con la version nueva (304 hasta medianoche).
+# Con replica va al primario; sin ella es get_read_db (SQLite: el mismo archivo, ve el ultimo commit)
+if settings.DATABASE_REPLICA_URL:
+    get_fresh_read_db = get_async_primary_read_session if settings.DB_ASYNC else get_primary_read_session
+else:
+    get_fresh_read_db = get_read_db
+
+AnySession = Union[Session, AsyncSession] if AsyncSession is not None else Session
+
+def dialect_insert(session: Session, model):
+    """insert() del dialecto actual, para poder usar ON CONFLICT DO UPDATE"""
+    if session.get_bind().dialect.name == "postgresql":
+        # el de Postgres se importa aqui, con SQLite no hace falta cargarlo al arrancar
+        from sqlalchemy.dialects import postgresql
+
+        return postgresql.insert(model)
+    return sqlite.insert(model)
+
+def _run_and_release(session: Session, fn, *args, **kwargs):
+    try:
+        result = fn(session, *args, **kwargs)
+    except Exception:
+        session.rollback()
+        raise
+    session.commit()
+    return result
+
+async def run_db(session: AnySession, fn, *args, **kwargs):
+    """
+    Ejecuta fn(session_sync, *args) con el codigo de acceso a datos de siempre.
+    - Modo async: AsyncSession.run_sync, el IO se espera en el event loop sin hilos
+    - Modo sync: se manda al threadpool como hacia FastAPI con los endpoints def
+    Al terminar cierra la transaccion (commit, o rollback si fallo) y la conexion vuelve al pool:
+    una peticion solo ocupa conexion mientras corre fn, no mientras espera hilos, bcrypt o la red.
+    """
+    if AsyncSession is not None and isinstance(session, AsyncSession):
+        try:
+            result = await session.run_sync(fn, *args, **kwargs)
+        except Exception:
+            await session.rollback()
+            raise
+        await session.commit()
+        return result
+    return await run_in_threadpool(_run_and_release, session, fn, *args, **kwargs)
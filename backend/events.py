@@ -0,0 +1,241 @@
+import asyncio
+import json
+import logging
+import time
+import uuid
+from collections import deque
+from typing import Callable, Dict, List, Optional, Set
+
+from config import settings
+from database import normalize_database_url
+
+# Eventos en vivo por usuario (saldo, racha, semana, inventario) para que el frontend no re-consulte.
+# Se publican con after_commit (writer.py), asi solo salen si el commit fue bien.
+# La clave del canal es el email del token: abrir un stream no toca la base de datos.
+
+logger = logging.getLogger("focus.events")
+
+# Lo que devuelve Subscription.get cuando pasa el intervalo sin eventos
+HEARTBEAT = object()
+
+# Identifica a este proceso en los mensajes internos, para no aplicarse los suyos dos veces
+PROCESS_ID = uuid.uuid4().hex[:8]
+
+
+class TooManyStreams(Exception):
+    """El usuario ya tiene EVENTS_MAX_STREAMS_PER_USER conexiones abiertas"""
+
+
+class Subscription:
+    """
+    Una conexion abierta. Lo minimo por conexion: un deque acotado y un future mientras espera.
+    Si el cliente va lento se pierden los eventos mas viejos (los valores son absolutos,
+    el siguiente evento ya trae el saldo bueno).
+    """
+    __slots__ = ("key", "_events", "_waiter", "closed")
+
+    def __init__(self, key: str, size: int):
+        self.key = key
+        self._events = deque(maxlen=size)
+        self._waiter: Optional[asyncio.Future] = None
+        self.closed = False
+
+    def push(self, event: dict):
+        self._events.append(event)
+        self._wake()
+
+    def close(self):
+        self.closed = True
+        self._wake()
+
+    def _wake(self):
+        if self._waiter is not None and not self._waiter.done():
+            self._waiter.set_result(None)
+
+    async def get(self, timeout: float):
+        """Siguiente evento, HEARTBEAT si no llego nada en timeout segundos, None si se cerro"""
+        if not self._events and not self.closed:
+            loop = asyncio.get_running_loop()
+            self._waiter = loop.create_future()
+            timer = loop.call_later(timeout, self._wake)
+            try:
+                await self._waiter
+            finally:
+                timer.cancel()
+                self._waiter = None
+        if self._events:
+            return self._events.popleft()
+        return None if self.closed else HEARTBEAT
+
+
+class MemoryBackend:
+    """Un solo proceso: publicar es entregar directamente"""
+    shared = False
+
+    async def start(self, deliver: Callable):
+        self._deliver = deliver
+
+    async def stop(self):
+        pass
+
+    def publish(self, key: str, event: dict):
+        self._deliver(key, event)
+
+
+class PostgresBackend:
+    """
+    Varios workers: cada evento va por NOTIFY a un canal y cada worker tiene una conexion
+    con LISTEN que lo reparte a sus propias conexiones. Dos conexiones por worker, no por usuario.
+    """
+    channel = "focus_events"
+    shared = True
+
+    def __init__(self, url: str):
+        # asyncpg quiere postgresql://, sin el +driver de SQLAlchemy (psycopg2, psycopg, asyncpg...)
+        scheme, rest = normalize_database_url(url).split("://", 1)
+        self.url = scheme.split("+", 1)[0] + "://" + rest
+        self._listener = None
+        self._publisher = None
+        self._lock = asyncio.Lock()
+        self._pending: Set[asyncio.Task] = set()
+
+    async def start(self, deliver: Callable):
+        import asyncpg
+
+        self._deliver = deliver
+        self._listener = await asyncpg.connect(self.url)
+        self._publisher = await asyncpg.connect(self.url)
+        await self._listener.add_listener(self.channel, self._on_notify)
+
+    async def stop(self):
+        for connection in (self._listener, self._publisher):
+            if connection is not None:
+                await connection.close()
+
+    def _on_notify(self, connection, pid, channel, payload):
+        message = json.loads(payload)
+        self._deliver(message["key"], message["event"])
+
+    def publish(self, key: str, event: dict):
+        task = asyncio.get_running_loop().create_task(self._notify(json.dumps({"key": key, "event": event}, default=str)))
+        self._pending.add(task)
+        task.add_done_callback(self._pending.discard)
+
+    async def _notify(self, payload: str):
+        try:
+            async with self._lock:
+                await self._publisher.execute("SELECT pg_notify($1, $2)", self.channel, payload)
+        except Exception:
+            logger.exception("no se pudo publicar el evento")
+
+
+def create_backend(name: str):
+    if name == "postgres":
+        return PostgresBackend(settings.DATABASE_URL)
+    if name == "memory":
+        return MemoryBackend()
+    raise ValueError(f"EVENTS_BACKEND desconocido: {name}")
+
+
+class EventBus:
+    """Suscripciones de este proceso por usuario y publicacion a traves del backend"""
+
+    def __init__(self, backend, buffer_size: int, max_per_user: int):
+        self.backend = backend
+        self.buffer_size = buffer_size
+        self.max_per_user = max_per_user
+        self._subscribers: Dict[str, Set[Subscription]] = {}
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._internal_handlers: Dict[str, List[Callable]] = {}
+        self.published = 0
+        self.delivered = 0
+
+    @property
+    def running(self) -> bool:
+        return self._loop is not None
+
+    @property
+    def connections(self) -> int:
+        return sum(len(subs) for subs in self._subscribers.values())
+
+    async def start(self):
+        await self.backend.start(self._deliver)
+        self._loop = asyncio.get_running_loop()
+
+    async def stop(self):
+        """Cierra todos los streams abiertos y el backend"""
+        self._loop = None
+        for subs in list(self._subscribers.values()):
+            for sub in list(subs):
+                sub.close()
+        self._subscribers.clear()
+        await self.backend.stop()
+
+    def has_room(self, key: str) -> bool:
+        return len(self._subscribers.get(key, ())) < self.max_per_user
+
+    def subscribe(self, key: str) -> Subscription:
+        subs = self._subscribers.setdefault(key, set())
+        if len(subs) >= self.max_per_user:
+            raise TooManyStreams()
+        sub = Subscription(key, self.buffer_size)
+        subs.add(sub)
+        return sub
+
+    def unsubscribe(self, sub: Subscription):
+        subs = self._subscribers.get(sub.key)
+        if subs is not None:
+            subs.discard(sub)
+            if not subs:
+                del self._subscribers[sub.key]
+
+    def publish(self, key: str, event_type: str, data: dict):
+        """
+        Se llama desde cualquier hilo (threadpool, escritor agrupado) despues del commit.
+        Si el bus no esta arrancado (scripts, cli.py) no hace nada.
+        """
+        loop = self._loop
+        if loop is None:
+            return
+        self.published += 1
+        event = {"type": event_type, "at": time.time(), **data}
+        loop.call_soon_threadsafe(self.backend.publish, key, event)
+
+    def on_internal(self, kind: str, handler: Callable):
+        """handler(key, data) se llama en este proceso con los mensajes `kind` de los demas workers"""
+        self._internal_handlers.setdefault(kind, []).append(handler)
+
+    def broadcast(self, kind: str, key: str, data: Optional[dict] = None):
+        """
+        Mensaje interno para los demas workers (caches, clasificaciones), no llega a los clientes.
+        Quien lo manda ya lo aplico en su proceso; con el backend memory no hay otros.
+        Se llama desde cualquier hilo, como publish.
+        """
+        loop = self._loop
+        if loop is None or not self.backend.shared:
+            return
+        loop.call_soon_threadsafe(self.backend.publish, key, {"internal": kind, "origin": PROCESS_ID, **(data or {})})
+
+    def _deliver(self, key: str, event: dict):
+        kind = event.get("internal")
+        if kind is not None:
+            if event["origin"] != PROCESS_ID:
+                for handler in self._internal_handlers.get(kind, ()):
+                    handler(key, event)
+            return
+        for sub in self._subscribers.get(key, ()):
+            sub.push(event)
+            self.delivered += 1
+
+
+# Instancia unica, se arranca en el lifespan
+bus = EventBus(
+    create_backend(settings.EVENTS_BACKEND),
+    buffer_size=settings.EVENTS_BUFFER_SIZE,
+    max_per_user=settings.EVENTS_MAX_STREAMS_PER_USER,
+)
+
+
+def publish(key: str, event_type: str, data: dict):
+    """Atajo para after_commit(session, events.publish, email, "tipo", {...})"""
+    bus.publish(key, event_type, data)
@@ -0,0 +1,102 @@
+from datetime import date, timedelta
+from typing import List, Optional
+
+from sqlalchemy import and_, func, insert, literal
+from sqlmodel import Session, select
+
+from database import dialect_insert
+from models import Goal, GoalWeeklyProgress, UserDailyActivity
+
+# Progreso semanal de las metas con acumuladores: cada sesión suma sus minutos a la fila
+# (meta, semana) y leer el progreso es leer esas filas, asi el coste no crece con el historial.
+
+
+def week_start(day: date) -> date:
+    """Lunes de la semana de day"""
+    return day - timedelta(days=day.weekday())
+
+
+def record_goal_minutes(
+    session: Session, user_id: int, day: date, minutes: int, sessions: int = 1, goal_id: Optional[int] = None
+) -> int:
+    """
+    Suma minutos a la semana de day con un solo INSERT ... SELECT ... ON CONFLICT DO UPDATE.
+    Con goal_id solo a esa meta (si es del usuario y esta activa), sin goal_id a todas sus metas activas.
+    No hace commit. Devuelve cuantas metas se actualizaron.
+    """
+    goals = (
+        select(Goal.id, literal(week_start(day)), literal(minutes), literal(sessions))
+        .where(Goal.user_id == user_id)
+        .where(Goal.is_active == True)
+    )
+    if goal_id is not None:
+        goals = goals.where(Goal.id == goal_id)
+
+    stmt = dialect_insert(session, GoalWeeklyProgress).from_select(
+        ["goal_id", "week_start", "minutes", "session_count"], goals
+    )
+    stmt = stmt.on_conflict_do_update(
+        index_elements=["goal_id", "week_start"],
+        set_={
+            "minutes": GoalWeeklyProgress.minutes + stmt.excluded.minutes,
+            "session_count": GoalWeeklyProgress.session_count + stmt.excluded.session_count,
+        },
+    )
+    return max(session.exec(stmt).rowcount, 0)
+
+
+def backfill_current_week(session: Session, today: date) -> int:
+    """
+    Rellena la semana en curso desde el resumen diario (solo al crear la tabla, migracion 6).
+    Las sesiones anteriores no tienen goal_id, asi que cuentan para todas las metas activas.
+    """
+    week = week_start(today)
+    totals = (
+        select(
+            Goal.id, literal(week),
+            func.sum(UserDailyActivity.minutes), func.sum(UserDailyActivity.session_count),
+        )
+        .join(UserDailyActivity, UserDailyActivity.user_id == Goal.user_id)
+        .where(Goal.is_active == True)
+        .where(UserDailyActivity.day >= week)
+        .group_by(Goal.id)
+    )
+    result = session.exec(
+        insert(GoalWeeklyProgress).from_select(["goal_id", "week_start", "minutes", "session_count"], totals)
+    )
+    session.commit()
+    return max(result.rowcount, 0)
+
+
+def goals_progress(session: Session, user_id: int, day: date, include_inactive: bool = False) -> List[dict]:
+    """Progreso de la semana de day para todas las metas del usuario en una sola consulta"""
+    week = week_start(day)
+    statement = (
+        select(
+            Goal.id, Goal.title, Goal.is_active, Goal.target_minutes_week,
+            GoalWeeklyProgress.minutes, GoalWeeklyProgress.session_count,
+        )
+        .outerjoin(
+            GoalWeeklyProgress,
+            and_(GoalWeeklyProgress.goal_id == Goal.id, GoalWeeklyProgress.week_start == week),
+        )
+        .where(Goal.user_id == user_id)
+        .order_by(Goal.created_at, Goal.id)
+    )
+    if not include_inactive:
+        statement = statement.where(Goal.is_active == True)
+
+    return [
+        {
+            "goal_id": goal_id,
+            "title": title,
+            "is_active": is_active,
+            "week_start": week,
+            "target_minutes": target,
+            "minutes": minutes or 0,
+            "sessions": sessions or 0,
+            "percent": round(min((minutes or 0) / target, 1.0) * 100, 1) if target else 100.0,
+            "completed": (minutes or 0) >= target,
+        }
+        for goal_id, title, is_active, target, minutes, sessions in session.exec(statement)
+    ]
@@ -0,0 +1,113 @@
+import base64
+import csv
+import io
+from datetime import datetime
+from typing import Optional, Tuple
+
+import orjson
+from sqlalchemy import tuple_
+from sqlmodel import Session, select
+
+from config import settings
+from database import AsyncSession, read_engine, async_read_engine
+from models import Session as SessionModel
+
+# Solo las columnas que se devuelven, sin construir objetos ORM
+HISTORY_COLUMNS = (
+    SessionModel.id,
+    SessionModel.started_at,
+    SessionModel.ended_at,
+    SessionModel.intended_minutes,
+    SessionModel.completed,
+    SessionModel.abandon_reason,
+)
+FIELD_NAMES = ["id", "started_at", "ended_at", "intended_minutes", "completed", "abandon_reason"]
+
+
+def encode_cursor(started_at: datetime, session_id: int) -> str:
+    raw = f"{started_at.isoformat()}|{session_id}"
+    return base64.urlsafe_b64encode(raw.encode()).decode()
+
+
+def decode_cursor(cursor: str) -> Tuple[datetime, int]:
+    """Lanza ValueError si el cursor no es valido"""
+    started_at, session_id = base64.urlsafe_b64decode(cursor.encode()).decode().split("|")
+    return datetime.fromisoformat(started_at), int(session_id)
+
+
+def _history_query(user_id: int):
+    # mas recientes primero, id desempata sesiones con la misma hora
+    return (
+        select(*HISTORY_COLUMNS)
+        .where(SessionModel.user_id == user_id)
+        .order_by(SessionModel.started_at.desc(), SessionModel.id.desc())
+    )
+
+
+def _row_to_dict(row) -> dict:
+    item = dict(zip(FIELD_NAMES, row))
+    item["started_at"] = item["started_at"].isoformat()
+    item["ended_at"] = item["ended_at"].isoformat() if item["ended_at"] else None
+    return item
+
+
+def get_history_page(session: Session, user_id: int, limit: int, cursor: Optional[str]) -> dict:
+    """
+    Una pagina del historial con paginacion por keyset (started_at, id).
+    El coste no depende de la pagina, no hay OFFSET.
+    """
+    statement = _history_query(user_id)
+    if cursor:
+        started_at, session_id = decode_cursor(cursor)
+        statement = statement.where(
+            tuple_(SessionModel.started_at, SessionModel.id) < tuple_(started_at, session_id)
+        )
+
+    # se pide una fila de mas para saber si hay pagina siguiente
+    rows = session.exec(statement.limit(limit + 1)).all()
+    has_more = len(rows) > limit
+    rows = rows[:limit]
+
+    # las filas van tal cual, HistoryPageOut (schemas.py) lee sus columnas
+    return {
+        "items": rows,
+        "next_cursor": encode_cursor(rows[-1][1], rows[-1][0]) if has_more else None,
+    }
+
+
+# EXPORTACION
+
+def _format_batch(rows, fmt: str) -> bytes:
+    if fmt == "csv":
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        for row in rows:
+            writer.writerow(_row_to_dict(row).values())
+        return buffer.getvalue().encode()
+    # orjson ya escribe las fechas en ISO 8601, igual que isoformat()
+    return b"".join(orjson.dumps(dict(zip(FIELD_NAMES, row)), option=orjson.OPT_APPEND_NEWLINE) for row in rows)
+
+
+def _header(fmt: str) -> str:
+    return ",".join(FIELD_NAMES) + "\r\n" if fmt == "csv" else ""
+
+
+def export_rows(user_id: int, fmt: str):
+    """
+    Generador sync para StreamingResponse. Abre su propia conexion y lee con
+    yield_per (cursor de servidor en Postgres), asi la memoria no crece con el historial.
+    """
+    yield _header(fmt)
+    with Session(read_engine) as session:
+        statement = _history_query(user_id).execution_options(yield_per=settings.EXPORT_BATCH_SIZE)
+        for batch in session.exec(statement).partitions():
+            yield _format_batch(batch, fmt)
+
+
+async def export_rows_async(user_id: int, fmt: str):
+    """Igual que export_rows pero con el motor async (DB_ASYNC=true)"""
+    yield _header(fmt)
+    async with AsyncSession(async_read_engine) as session:
+        result = await session.stream(_history_query(user_id))
+        async for batch in result.partitions(settings.EXPORT_BATCH_SIZE):
+            yield _format_batch(batch, fmt)
@@ -0,0 +1,313 @@
+import random
+import threading
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional, Tuple
+
+from sqlalchemy import func
+from sqlmodel import Session, select
+
+from models import User, UserDailyActivity
+import events
+
+# Tablas disponibles: puntos actuales, dias de racha y puntos ganados estudiando esta semana
+METRICS = ("points", "streak", "weekly")
+
+
+class _Node:
+    __slots__ = ("key", "priority", "size", "left", "right")
+
+    def __init__(self, key):
+        self.key = key
+        self.priority = random.random()
+        self.size = 1
+        self.left = None
+        self.right = None
+
+
+def _size(node) -> int:
+    return node.size if node else 0
+
+
+def _update(node):
+    node.size = 1 + _size(node.left) + _size(node.right)
+
+
+def _split(node, key, inclusive: bool):
+    """Parte el arbol en (claves < key, resto); con inclusive, (claves <= key, resto)"""
+    if node is None:
+        return None, None
+    goes_left = node.key <= key if inclusive else node.key < key
+    if goes_left:
+        left, right = _split(node.right, key, inclusive)
+        node.right = left
+        _update(node)
+        return node, right
+    left, right = _split(node.left, key, inclusive)
+    node.left = right
+    _update(node)
+    return left, node
+
+
+def _merge(a, b):
+    """Une dos arboles donde todas las claves de a son menores que las de b"""
+    if a is None or b is None:
+        return a or b
+    if a.priority > b.priority:
+        a.right = _merge(a.right, b)
+        _update(a)
+        return a
+    b.left = _merge(a, b.left)
+    _update(b)
+    return b
+
+
+class RankTree:
+    """
+    Treap con tamaño de subarbol (arbol de estadistico de orden).
+    Insertar, borrar, posicion de una clave y k-esimo elemento en O(log n) esperado.
+    """
+
+    def __init__(self):
+        self.root = None
+
+    def __len__(self):
+        return _size(self.root)
+
+    @classmethod
+    def from_sorted(cls, keys: list) -> "RankTree":
+        """Construye el arbol en O(n) a partir de claves ya ordenadas (para la carga inicial)"""
+        # prioridades descendentes en preorden: cada padre queda por encima de sus hijos
+        priorities = iter(sorted((random.random() for _ in keys), reverse=True))
+
+        def build(low, high):
+            if low >= high:
+                return None
+            middle = (low + high) // 2
+            node = _Node(keys[middle])
+            node.priority = next(priorities)
+            node.left = build(low, middle)
+            node.right = build(middle + 1, high)
+            _update(node)
+            return node
+
+        tree = cls()
+        tree.root = build(0, len(keys))
+        return tree
+
+    def insert(self, key):
+        left, right = _split(self.root, key, inclusive=False)
+        self.root = _merge(_merge(left, _Node(key)), right)
+
+    def remove(self, key):
+        left, right = _split(self.root, key, inclusive=False)
+        _, right = _split(right, key, inclusive=True)
+        self.root = _merge(left, right)
+
+    def rank(self, key) -> int:
+        """Cuantas claves hay por delante de key (posicion empezando en 0)"""
+        node, count = self.root, 0
+        while node is not None:
+            if key <= node.key:
+                node = node.left
+            else:
+                count += _size(node.left) + 1
+                node = node.right
+        return count
+
+    def kth(self, k: int):
+        node = self.root
+        while node is not None:
+            left = _size(node.left)
+            if k < left:
+                node = node.left
+            elif k == left:
+                return node.key
+            else:
+                k -= left + 1
+                node = node.right
+        raise IndexError(k)
+
+
+class Board:
+    """Una tabla de clasificacion: puntuacion por usuario + RankTree ordenado de mayor a menor"""
+
+    def __init__(self):
+        self.scores: Dict[int, int] = {}
+        self.tree = RankTree()
+
+    def set(self, user_id: int, score: int):
+        old = self.scores.get(user_id)
+        if old == score:
+            return
+        if old is not None:
+            self.tree.remove((-old, user_id))
+        self.scores[user_id] = score
+        self.tree.insert((-score, user_id))
+
+    @classmethod
+    def from_scores(cls, scores: Dict[int, int]) -> "Board":
+        board = cls()
+        board.scores = scores
+        board.tree = RankTree.from_sorted(sorted((-score, user_id) for user_id, score in scores.items()))
+        return board
+
+    def discard(self, user_id: int):
+        old = self.scores.pop(user_id, None)
+        if old is not None:
+            self.tree.remove((-old, user_id))
+
+    def rank(self, user_id: int) -> Optional[int]:
+        score = self.scores.get(user_id)
+        if score is None:
+            return None
+        return self.tree.rank((-score, user_id))
+
+    def slice(self, start: int, count: int) -> List[Tuple[int, int, int]]:
+        """Filas (posicion, user_id, puntuacion) desde start"""
+        end = min(start + count, len(self.tree))
+        rows = []
+        for position in range(max(start, 0), end):
+            neg_score, user_id = self.tree.kth(position)
+            rows.append((position, user_id, -neg_score))
+        return rows
+
+
+class Leaderboards:
+    """
+    Todas las tablas en memoria: global y por carrera para cada metrica.
+    Se reconstruye desde la DB al arrancar y luego se actualiza en cada commit que cambia
+    puntos o racha, asi consultar la posicion nunca recorre la tabla de usuarios.
+    Cada worker tiene las suyas: las actualizaciones se reparten por el bus de eventos
+    (EVENTS_BACKEND=postgres), con el backend memory solo hay un proceso.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._boards: Dict[Tuple[str, Optional[str]], Board] = {}
+        self._users: Dict[int, Tuple[str, str]] = {}  # user_id -> (nombre, carrera)
+        self._week_start = self._current_week_start()
+
+    @staticmethod
+    def _current_week_start():
+        today = datetime.utcnow().date()
+        return today - timedelta(days=today.weekday())
+
+    def _board(self, metric: str, career: Optional[str]) -> Board:
+        return self._boards.setdefault((metric, career), Board())
+
+    def _set(self, metric: str, user_id: int, score: int):
+        career = self._users[user_id][1]
+        self._board(metric, None).set(user_id, score)
+        self._board(metric, career).set(user_id, score)
+
+    def _roll_week(self):
+        # al cambiar de semana la tabla semanal empieza vacia
+        week_start = self._current_week_start()
+        if week_start != self._week_start:
+            self._week_start = week_start
+            for (metric, career) in list(self._boards):
+                if metric == "weekly":
+                    self._boards[(metric, career)] = Board()
+
+    def _register(self, user_id: int, full_name: str, career: str):
+        previous = self._users.get(user_id)
+        if previous is not None and previous[1] != career:
+            # cambio de carrera: se saca de las tablas de la carrera anterior
+            for metric in METRICS:
+                self._board(metric, previous[1]).discard(user_id)
+        self._users[user_id] = (full_name, career)
+
+    def rebuild(self, session: Session):
+        """Carga todas las tablas desde la DB (al arrancar)"""
+        week_start = self._current_week_start()
+        weekly = dict(session.exec(
+            select(UserDailyActivity.user_id, func.sum(UserDailyActivity.points))
+            .where(UserDailyActivity.day >= week_start)
+            .group_by(UserDailyActivity.user_id)
+        ).all())
+
+        rows = session.exec(
+            select(User.id, User.full_name, User.career, User.current_points, User.current_streak_days)
+            .execution_options(yield_per=5000)
+        )
+
+        # primero se juntan las puntuaciones de cada tabla y luego se construyen ordenadas
+        users = {}
+        scores: Dict[Tuple[str, Optional[str]], Dict[int, int]] = {}
+        for user_id, full_name, career, points, streak in rows:
+            users[user_id] = (full_name, career)
+            values = {"points": points, "streak": streak, "weekly": weekly.get(user_id)}
+            for metric, value in values.items():
+                if value is None:
+                    continue
+                scores.setdefault((metric, None), {})[user_id] = value
+                scores.setdefault((metric, career), {})[user_id] = value
+
+        boards = {key: Board.from_scores(board_scores) for key, board_scores in scores.items()}
+
+        with self._lock:
+            self._boards = boards
+            self._users = users
+            self._week_start = week_start
+
+    def update_user(self, user: User, weekly_points: int = 0):
+        """Se llama despues del commit con el usuario ya refrescado"""
+        self.update(
+            user.id, user.full_name, user.career, user.current_points, user.current_streak_days, weekly_points
+        )
+
+    def update(self, user_id: int, full_name: str, career: str, points: int, streak: int, weekly_points: int = 0):
+        """Igual que update_user con los valores sueltos (los que se leyeron antes del commit)"""
+        self._apply(user_id, full_name, career, points, streak, weekly_points)
+        events.bus.broadcast("leaderboard", "update", {
+            "user_id": user_id, "full_name": full_name, "career": career,
+            "points": points, "streak": streak, "weekly_points": weekly_points,
+        })
+
+    def _on_broadcast(self, key: str, data: dict):
+        """Actualizacion hecha en otro worker"""
+        self._apply(
+            data["user_id"], data["full_name"], data["career"], data["points"], data["streak"], data["weekly_points"]
+        )
+
+    def _apply(self, user_id: int, full_name: str, career: str, points: int, streak: int, weekly_points: int):
+        with self._lock:
+            self._roll_week()
+            self._register(user_id, full_name, career)
+            self._set("points", user_id, points)
+            self._set("streak", user_id, streak)
+            if weekly_points:
+                current = self._board("weekly", None).scores.get(user_id, 0)
+                self._set("weekly", user_id, current + weekly_points)
+
+    def _entries(self, rows):
+        return [
+            {"rank": position + 1, "user_id": user_id, "full_name": self._users[user_id][0], "score": score}
+            for position, user_id, score in rows
+        ]
+
+    def top(self, metric: str, career: Optional[str] = None, limit: int = 10) -> List[dict]:
+        with self._lock:
+            self._roll_week()
+            return self._entries(self._board(metric, career).slice(0, limit))
+
+    def around(self, metric: str, user_id: int, career: Optional[str] = None, radius: int = 2) -> dict:
+        """Posicion del usuario y sus vecinos por arriba y por abajo"""
+        with self._lock:
+            self._roll_week()
+            board = self._board(metric, career)
+            position = board.rank(user_id)
+            if position is None:
+                return {"rank": None, "score": 0, "total": len(board.tree), "neighbours": []}
+            start = max(position - radius, 0)
+            return {
+                "rank": position + 1,
+                "score": board.scores[user_id],
+                "total": len(board.tree),
+                "neighbours": self._entries(board.slice(start, position + radius + 1 - start)),
+            }
+
+
+# Instancia unica del proceso
+leaderboards = Leaderboards()
+events.bus.on_internal("leaderboard", leaderboards._on_broadcast)
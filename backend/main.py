@@ -1,18 +1,63 @@
+# lo primero, para medir el resto de importaciones (STARTUP_PROFILE=true)
+from startup import profile as startup_profile, warm_up
+import asyncio
 from fastapi import FastAPI
+from fastapi.responses import ORJSONResponse
 from contextlib import asynccontextmanager
-from database import create_db_and_tables
+startup_profile.mark("fastapi")
+from database import create_db_and_tables, async_engine, async_read_engine, read_engine
+from sqlmodel import Session
+from leaderboard import leaderboards
+from password_pool import pool as password_pool
+from writer import writer
+from events import bus as event_bus
+import scheduler
+from config import settings
+from metrics import MetricsMiddleware
 import os
+startup_profile.mark("database y servicios")
 
 #Router
-from routers import auth, users, sessions, gamification 
+from routers import auth, users, sessions, gamification, leaderboard, metrics, goals, events
+startup_profile.mark("routers")
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
-    create_db_and_tables()
+    with startup_profile.step("esquema"):
+        schema_version = create_db_and_tables()
     print("✅ Base de datos lista.")
+    # clasificaciones en memoria a partir de la DB
+    with startup_profile.step("clasificaciones"), Session(read_engine) as session:
+        leaderboards.rebuild(session)
+    if settings.GROUP_COMMIT_ENABLED:
+        writer.start()
+    await event_bus.start()
+    jobs = []
+    if settings.STREAK_JOB_ENABLED:
+        jobs.append(asyncio.create_task(
+            scheduler.run_daily("rachas", settings.STREAK_JOB_TIME_UTC, scheduler.streak_reset_job)
+        ))
+    if settings.STREAK_REFRESH_POLL_SECONDS > 0:
+        jobs.append(asyncio.create_task(scheduler.watch_streaks()))
+    if settings.RETENTION_JOB_ENABLED:
+        jobs.append(asyncio.create_task(
+            scheduler.run_daily("retencion", settings.RETENTION_JOB_TIME_UTC, scheduler.retention_job)
+        ))
+    if settings.WARMUP_ON_STARTUP:
+        with startup_profile.step("calentamiento"):
+            jobs.append(await warm_up())
+    startup_profile.ready(schema_version)
     yield
+    for job in jobs:
+        job.cancel()
+    await event_bus.stop()
+    writer.shutdown()
+    password_pool.shutdown()
+    for current in {async_engine, async_read_engine} - {None}:
+        await current.dispose()
 
-app = FastAPI(lifespan=lifespan)
+# orjson escribe las respuestas; los esquemas de cada ruta estan en schemas.py
+app = FastAPI(lifespan=lifespan, default_response_class=ORJSONResponse)
 
 from fastapi.middleware.cors import CORSMiddleware
 
@@ -34,12 +79,27 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# latencia por ruta, consultas por peticion y log de peticiones lentas (ver /metrics)
+if settings.METRICS_ENABLED:
+    app.add_middleware(MetricsMiddleware)
+
 
 # router se conecta a la app
 app.include_router(auth.router)
 app.include_router(users.router)
 app.include_router(sessions.router)
 app.include_router(gamification.router)
+app.include_router(leaderboard.router)
+app.include_router(goals.router)
+app.include_router(events.router)
+if settings.METRICS_ENABLED:
+    app.include_router(metrics.router)
+startup_profile.mark("app")
+
+@app.get("/health", include_in_schema=False)
+async def health():
+    """Para el balanceador o la plataforma: sin DB, el esquema ya se comprobo al arrancar"""
+    return startup_profile.status()
 
 @app.get("/")
 def read_root():
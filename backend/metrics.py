@@ -0,0 +1,281 @@
+import bisect
+import contextvars
+import logging
+import threading
+import time
+from collections import defaultdict
+from typing import Callable, Dict, List, Optional, Tuple
+
+from config import settings
+
+request_logger = logging.getLogger("focus.requests")
+
+# Limites de los histogramas en segundos
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+QUERY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 1.0)
+
+
+def _format_labels(labelnames: Tuple[str, ...], values: Tuple, extra: str = "") -> str:
+    parts = []
+    for name, value in zip(labelnames, values):
+        escaped = str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+        parts.append(f'{name}="{escaped}"')
+    if extra:
+        parts.append(extra)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class _Metric:
+    """Base de Counter/Gauge/Histogram: un valor por combinacion de etiquetas"""
+
+    kind = ""
+
+    def __init__(self, name: str, documentation: str, labelnames: Tuple[str, ...] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+        registry.register(self.render)
+
+    def _header(self) -> List[str]:
+        return [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._values: Dict[Tuple, float] = defaultdict(float)
+
+    def inc(self, *labels, amount: float = 1):
+        with self._lock:
+            self._values[labels] += amount
+
+    def render(self) -> List[str]:
+        with self._lock:
+            items = sorted(self._values.items())
+        return self._header() + [
+            f"{self.name}{_format_labels(self.labelnames, labels)} {_format_value(value)}"
+            for labels, value in items
+        ]
+
+
+class Gauge(Counter):
+    kind = "gauge"
+
+    def dec(self, *labels, amount: float = 1):
+        self.inc(*labels, amount=-amount)
+
+    def set(self, *labels, value: float):
+        with self._lock:
+            self._values[labels] = value
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name: str, documentation: str, labelnames: Tuple[str, ...] = (), buckets=LATENCY_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(buckets)
+        # etiquetas -> (cuenta por bucket, suma, total)
+        self._values: Dict[Tuple, list] = {}
+
+    def observe(self, *labels, value: float):
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            entry = self._values.get(labels)
+            if entry is None:
+                entry = self._values[labels] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            entry[0][index] += 1
+            entry[1] += value
+            entry[2] += 1
+
+    def render(self) -> List[str]:
+        with self._lock:
+            items = sorted((labels, (list(b), s, c)) for labels, (b, s, c) in self._values.items())
+        lines = self._header()
+        for labels, (bucket_counts, total, count) in items:
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets + (float("inf"),), bucket_counts):
+                cumulative += bucket_count
+                le = 'le="' + _format_value(bound) + '"'
+                lines.append(f"{self.name}_bucket{_format_labels(self.labelnames, labels, le)} {cumulative}")
+            lines.append(f"{self.name}_sum{_format_labels(self.labelnames, labels)} {_format_value(total)}")
+            lines.append(f"{self.name}_count{_format_labels(self.labelnames, labels)} {count}")
+        return lines
+
+
+class Registry:
+    """
+    Todo lo que sale en /metrics. Ademas de las metricas propias admite colectores:
+    funciones que leen el estado de otros modulos (caches, pool de bcrypt...) al hacer scrape.
+    """
+
+    def __init__(self):
+        self._renderers: List[Callable[[], List[str]]] = []
+
+    def register(self, renderer: Callable[[], List[str]]):
+        self._renderers.append(renderer)
+
+    def render(self) -> str:
+        lines = []
+        for renderer in self._renderers:
+            lines.extend(renderer())
+        return "\n".join(lines) + "\n"
+
+
+registry = Registry()
+
+
+def collector(name: str, kind: str, documentation: str, labelnames: Tuple[str, ...] = ()):
+    """Decorador para registrar una funcion que devuelve [(etiquetas, valor), ...] en cada scrape"""
+
+    def decorator(fn):
+        def render() -> List[str]:
+            lines = [f"# HELP {name} {documentation}", f"# TYPE {name} {kind}"]
+            for labels, value in fn():
+                lines.append(f"{name}{_format_labels(labelnames, labels)} {_format_value(value)}")
+            return lines
+
+        registry.register(render)
+        return fn
+
+    return decorator
+
+
+# METRICAS DE PETICIONES Y DE LA DB
+
+http_requests = Counter(
+    "focus_http_requests_total", "Peticiones HTTP terminadas", ("method", "route", "status")
+)
+http_latency = Histogram(
+    "focus_http_request_duration_seconds", "Latencia de las peticiones HTTP", ("method", "route")
+)
+http_in_flight = Gauge("focus_http_requests_in_flight", "Peticiones HTTP en curso")
+http_queries = Histogram(
+    "focus_http_request_queries", "Consultas SQL por peticion", ("route",),
+    buckets=(1, 2, 3, 5, 8, 13, 21, 34, 55, 89),
+)
+query_budget_exceeded = Counter(
+    "focus_http_query_budget_exceeded_total",
+    "Peticiones que pasaron QUERY_BUDGET_PER_REQUEST (posible N+1)", ("route",),
+)
+db_query_latency = Histogram(
+    "focus_db_query_duration_seconds", "Duracion de cada consulta SQL", buckets=QUERY_BUCKETS
+)
+db_pool_wait = Histogram(
+    "focus_db_pool_checkout_wait_seconds", "Espera para sacar una conexion del pool", buckets=QUERY_BUCKETS
+)
+
+
+class RequestStats:
+    """Consultas de la peticion en curso, agrupadas por sentencia"""
+
+    __slots__ = ("queries", "db_seconds", "statements")
+
+    def __init__(self):
+        self.queries = 0
+        self.db_seconds = 0.0
+        self.statements: Dict[str, list] = {}  # sentencia -> [veces, segundos]
+
+    def record(self, statement: str, seconds: float):
+        self.queries += 1
+        self.db_seconds += seconds
+        entry = self.statements.setdefault(statement, [0, 0.0])
+        entry[0] += 1
+        entry[1] += seconds
+
+    def breakdown(self, limit: int = 5) -> List[str]:
+        top = sorted(self.statements.items(), key=lambda item: item[1][1], reverse=True)[:limit]
+        return [f"{count}x {seconds * 1000:.1f}ms {statement}" for statement, (count, seconds) in top]
+
+
+# El objeto es mutable: run_in_threadpool y run_sync copian el contexto pero ven la misma instancia
+_current_request: contextvars.ContextVar[Optional[RequestStats]] = contextvars.ContextVar(
+    "focus_request_stats", default=None
+)
+
+
+def record_query(statement: str, seconds: float):
+    """Lo llaman los eventos del motor (database.py) al terminar cada consulta"""
+    db_query_latency.observe(value=seconds)
+    stats = _current_request.get()
+    if stats is not None:
+        stats.record(" ".join(statement.split())[:200], seconds)
+
+
+def _route_label(scope) -> str:
+    # plantilla de la ruta (/sessions/history), no la URL real, para no disparar la cardinalidad
+    route = scope.get("route")
+    return getattr(route, "path", None) or "unmatched"
+
+
+# Rutas que no son peticiones normales: ni latencia ni log de lentas
+LONG_LIVED_PREFIXES = ("/events/",)
+
+
+class MetricsMiddleware:
+    """
+    Middleware ASGI: latencia por ruta, peticiones en curso, codigos de estado
+    y consultas SQL por peticion. Loguea las peticiones lentas o con demasiadas consultas.
+    Mide hasta que se envia el ultimo trozo del cuerpo (incluye las exportaciones en streaming).
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        # los streams de /events duran horas, se miden aparte (focus_event_streams)
+        if scope["type"] != "http" or scope["path"].startswith(LONG_LIVED_PREFIXES):
+            await self.app(scope, receive, send)
+            return
+
+        stats = RequestStats()
+        token = _current_request.set(stats)
+        status_code = 500
+        start = time.perf_counter()
+        http_in_flight.inc()
+
+        async def send_wrapper(message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            elapsed = time.perf_counter() - start
+            http_in_flight.dec()
+            _current_request.reset(token)
+            self._record(scope, status_code, elapsed, stats)
+
+    def _record(self, scope, status_code: int, elapsed: float, stats: RequestStats):
+        method, route = scope["method"], _route_label(scope)
+        http_requests.inc(method, route, str(status_code))
+        http_latency.observe(method, route, value=elapsed)
+        http_queries.observe(route, value=stats.queries)
+
+        over_budget = stats.queries > settings.QUERY_BUDGET_PER_REQUEST
+        if over_budget:
+            query_budget_exceeded.inc(route)
+
+        if over_budget or elapsed * 1000 >= settings.SLOW_REQUEST_MS:
+            request_logger.warning(
+                "%s request %s %s status=%s duration_ms=%.1f queries=%d db_ms=%.1f\n  %s",
+                "query budget" if over_budget else "slow",
+                method,
+                route,
+                status_code,
+                elapsed * 1000,
+                stats.queries,
+                stats.db_seconds * 1000,
+                "\n  ".join(stats.breakdown()) or "(sin consultas)",
+            )
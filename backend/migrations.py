@@ -0,0 +1,358 @@
+"""
+Migraciones del esquema, sin Alembic.
+Cada migracion tiene un numero de version y es idempotente (se puede repetir si se corto a medias).
+La version aplicada se guarda en la tabla schema_version, asi el arranque solo hace un SELECT.
+Si hay que migrar, un solo proceso lo hace (migration_lock); el resto espera y vuelve a leer la version.
+    python cli.py migrate            aplica lo pendiente
+    python cli.py migrate --status   muestra la version actual
+
+Todo cambio a una tabla que ya existe (columna, indice, datos) va en una migracion nueva, en el
+mismo cambio que lo usa: create_all solo crea tablas que faltan y no sirve para bases ya desplegadas.
+El arranque (create_db_and_tables -> ensure_schema) aplica lo pendiente con AUTO_MIGRATE=true.
+"""
+import json
+import logging
+import sqlite3
+from contextlib import contextmanager
+from datetime import datetime
+from typing import Callable, List, NamedTuple, Optional
+
+from sqlalchemy import (
+    Column, DateTime, Integer, MetaData, String, Table, Text, func, insert, inspect, select, text,
+)
+from sqlalchemy.exc import OperationalError, ProgrammingError
+from sqlalchemy.schema import CreateIndex
+from sqlmodel import SQLModel, Session
+
+from config import settings
+
+logger = logging.getLogger("focus.migrations")
+
+# Tabla propia, fuera de SQLModel.metadata para que create_all no la toque
+schema_metadata = MetaData()
+schema_version = Table(
+    "schema_version",
+    schema_metadata,
+    Column("version", Integer, primary_key=True),
+    Column("description", String(200), nullable=False),
+    Column("applied_at", DateTime, nullable=False),
+)
+
+# Cuarentena de la migracion 8: copia de cada fila huerfana antes de tocarla, para revisarla
+# o restaurarla a mano. Tampoco es de SQLModel: la app no la lee.
+orphan_row = Table(
+    "orphan_row",
+    schema_metadata,
+    Column("id", Integer, primary_key=True),
+    Column("table_name", String(100), nullable=False),
+    Column("column_name", String(100), nullable=False),
+    Column("data", Text, nullable=False),  # la fila entera en JSON, tal como estaba
+    Column("found_at", DateTime, nullable=False),
+)
+
+
+class Migration(NamedTuple):
+    version: int
+    description: str
+    apply: Callable
+
+
+# HELPERS
+
+def _has_column(engine, table: str, column: str) -> bool:
+    return any(c["name"] == column for c in inspect(engine).get_columns(table))
+
+
+def create_index_online(engine, index):
+    """
+    Crea un indice sin bloquear la tabla mas de lo necesario.
+    - Postgres: CREATE INDEX CONCURRENTLY fuera de transaccion, la tabla sigue aceptando escrituras.
+      Si un intento anterior fallo queda un indice INVALID, se borra y se vuelve a crear.
+    - SQLite: no hay modo concurrente. Con WAL las lecturas siguen funcionando mientras se construye,
+      las escrituras esperan; en bases grandes conviene lanzar cli.py migrate fuera del arranque.
+    """
+    ddl = str(CreateIndex(index, if_not_exists=True).compile(dialect=engine.dialect))
+    if engine.dialect.name != "postgresql":
+        with engine.begin() as connection:
+            connection.exec_driver_sql(ddl)
+        return
+
+    ddl = ddl.replace("INDEX IF NOT EXISTS", "INDEX CONCURRENTLY IF NOT EXISTS", 1)
+    with engine.connect().execution_options(isolation_level="AUTOCOMMIT") as connection:
+        invalid = connection.execute(
+            text(
+                "SELECT 1 FROM pg_index i JOIN pg_class c ON c.oid = i.indexrelid "
+                "WHERE c.relname = :name AND NOT i.indisvalid"
+            ),
+            {"name": index.name},
+        ).first()
+        if invalid:
+            connection.exec_driver_sql(f'DROP INDEX CONCURRENTLY IF EXISTS "{index.name}"')
+        connection.exec_driver_sql(ddl)
+
+
+@contextmanager
+def migration_lock(engine):
+    """
+    Un solo proceso migra a la vez (varios workers arrancando con AUTO_MIGRATE=true).
+    - Postgres: pg_advisory_lock en una conexion propia, se suelta al salir o si el proceso muere
+    - SQLite: BEGIN IMMEDIATE en un archivo aparte (<base>-migrate.lock). No se bloquea la propia base
+      porque las migraciones escriben en ella con otras conexiones y SQLite solo tiene un escritor
+    - SQLite en memoria: un solo proceso, no hace falta
+    Quien entra debe volver a leer current_version: otro puede haber migrado mientras esperaba.
+    """
+    if engine.dialect.name == "postgresql":
+        with engine.connect().execution_options(isolation_level="AUTOCOMMIT") as connection:
+            connection.execute(text("SELECT pg_advisory_lock(:key)"), {"key": MIGRATION_LOCK_KEY})
+            try:
+                yield
+            finally:
+                connection.execute(text("SELECT pg_advisory_unlock(:key)"), {"key": MIGRATION_LOCK_KEY})
+        return
+
+    path = engine.url.database
+    if not path or path == ":memory:":
+        yield
+        return
+    lock = sqlite3.connect(f"{path}-migrate.lock", timeout=settings.MIGRATION_LOCK_TIMEOUT_SECONDS, isolation_level=None)
+    try:
+        lock.execute("BEGIN IMMEDIATE")
+        yield
+    finally:
+        # cerrar deshace la transaccion y suelta el bloqueo
+        lock.close()
+
+
+# MIGRACIONES
+
+def _create_missing_tables(engine):
+    """Tablas nuevas (user_daily_activity...) y rellena el resumen diario si se acaba de crear"""
+    import models
+    from activity import backfill_daily_activity
+
+    rollup_existed = inspect(engine).has_table(models.UserDailyActivity.__tablename__)
+    SQLModel.metadata.create_all(engine)
+    if not rollup_existed:
+        with Session(engine) as session:
+            backfill_daily_activity(session, batch_users=settings.MIGRATION_BATCH_SIZE)
+
+
+def _add_session_client_key(engine):
+    if not _has_column(engine, "session", "client_key"):
+        with engine.begin() as connection:
+            connection.exec_driver_sql("ALTER TABLE session ADD COLUMN client_key VARCHAR(64)")
+
+
+def _create_session_indexes(engine):
+    from models import Session as SessionModel
+
+    for index in SessionModel.__table__.indexes:
+        create_index_online(engine, index)
+
+
+def _merge_duplicate_user_items(engine):
+    """
+    Antes habia una fila por compra; se juntan en una por (usuario, item) sumando quantity
+    y luego se crea el indice unico. Se procesa por tandas de grupos para no bloquear la tabla.
+    """
+    from models import UserItem
+
+    batch = settings.MIGRATION_BATCH_SIZE
+    while True:
+        with engine.begin() as connection:
+            groups = connection.execute(
+                select(UserItem.user_id, UserItem.item_id, func.min(UserItem.id), func.sum(UserItem.quantity))
+                .group_by(UserItem.user_id, UserItem.item_id)
+                .having(func.count() > 1)
+                .limit(batch)
+            ).all()
+            for user_id, item_id, keep_id, quantity in groups:
+                connection.execute(
+                    UserItem.__table__.update().where(UserItem.id == keep_id).values(quantity=quantity)
+                )
+                connection.execute(
+                    UserItem.__table__.delete()
+                    .where(UserItem.user_id == user_id)
+                    .where(UserItem.item_id == item_id)
+                    .where(UserItem.id != keep_id)
+                )
+        if len(groups) < batch:
+            break
+
+    for index in UserItem.__table__.indexes:
+        create_index_online(engine, index)
+
+
+def _create_user_id_indexes(engine):
+    from models import Profile, Goal
+
+    for model in (Profile, Goal):
+        for index in model.__table__.indexes:
+            create_index_online(engine, index)
+
+
+def _add_goal_progress(engine):
+    """session.goal_id y la tabla de acumulados semanales por meta, con la semana en curso rellena"""
+    from models import GoalWeeklyProgress
+    from goals import backfill_current_week
+
+    if not _has_column(engine, "session", "goal_id"):
+        with engine.begin() as connection:
+            connection.exec_driver_sql("ALTER TABLE session ADD COLUMN goal_id INTEGER REFERENCES goal(id)")
+    # la migracion 1 (create_all) puede haberla creado ya, se rellena si sigue vacia
+    GoalWeeklyProgress.__table__.create(engine, checkfirst=True)
+    with Session(engine) as session:
+        if session.exec(select(GoalWeeklyProgress.goal_id).limit(1)).first() is None:
+            backfill_current_week(session, datetime.utcnow().date())
+
+
+def _add_retention_tables(engine):
+    """Resumenes mensuales de las sesiones compactadas y estado de los trabajos (retention.py)"""
+    from models import JobState, SessionMonthlyAbandon, SessionMonthlySummary
+
+    for model in (SessionMonthlySummary, SessionMonthlyAbandon, JobState):
+        model.__table__.create(engine, checkfirst=True)
+
+
+def _fix_orphan_foreign_keys(engine):
+    """
+    SQLite: filas que apuntan a una fila que ya no existe (se escribieron sin PRAGMA foreign_keys,
+    y con el PRAGMA activo ya no se podrian actualizar). No se pierde nada: cada fila se copia
+    entera a orphan_row y despues, si la columna admite NULL, se deja a NULL (session.goal_id de
+    una meta borrada); si no, la fila sale de su tabla y queda solo en orphan_row.
+    Postgres siempre ha comprobado las claves ajenas, no hay nada que hacer.
+        SELECT * FROM orphan_row      lo que se movio, para revisarlo o restaurarlo
+    """
+    if engine.dialect.name != "sqlite":
+        return
+    with engine.begin() as connection:
+        orphan_row.create(connection, checkfirst=True)
+        orphans = {}  # (tabla, columna) -> rowids
+        for table, rowid, parent, fkid in connection.exec_driver_sql("PRAGMA foreign_key_check").all():
+            keys = connection.exec_driver_sql(f'PRAGMA foreign_key_list("{table}")').all()
+            column = next(key[3] for key in keys if key[0] == fkid)
+            orphans.setdefault((table, column), []).append(rowid)
+
+        found_at = datetime.utcnow()
+        for (table, column), rowids in orphans.items():
+            nullable = any(
+                info[1] == column and not info[3]
+                for info in connection.exec_driver_sql(f'PRAGMA table_info("{table}")').all()
+            )
+            placeholders = ", ".join("?" * len(rowids))
+            rows = connection.exec_driver_sql(
+                f'SELECT * FROM "{table}" WHERE rowid IN ({placeholders})', tuple(rowids)
+            ).mappings().all()
+            connection.execute(insert(orphan_row), [
+                {
+                    "table_name": table,
+                    "column_name": column,
+                    "data": json.dumps(dict(row), default=str),
+                    "found_at": found_at,
+                }
+                for row in rows
+            ])
+            if nullable:
+                connection.exec_driver_sql(
+                    f'UPDATE "{table}" SET "{column}" = NULL WHERE rowid IN ({placeholders})', tuple(rowids)
+                )
+            else:
+                connection.exec_driver_sql(f'DELETE FROM "{table}" WHERE rowid IN ({placeholders})', tuple(rowids))
+            logger.warning(
+                "%s.%s: %d filas huerfanas copiadas a orphan_row y %s", table, column, len(rowids),
+                "puestas a NULL" if nullable else "sacadas de la tabla",
+            )
+
+
+MIGRATIONS: List[Migration] = [
+    Migration(1, "tablas nuevas y resumen diario", _create_missing_tables),
+    Migration(2, "session.client_key", _add_session_client_key),
+    Migration(3, "indices de session", _create_session_indexes),
+    Migration(4, "useritem: una fila por usuario e item", _merge_duplicate_user_items),
+    Migration(5, "indices user_id de profile y goal", _create_user_id_indexes),
+    Migration(6, "progreso semanal de metas", _add_goal_progress),
+    Migration(7, "resumenes mensuales de sesiones antiguas", _add_retention_tables),
+    Migration(8, "claves ajenas huerfanas a cuarentena (SQLite)", _fix_orphan_foreign_keys),
+]
+LATEST_VERSION = MIGRATIONS[-1].version
+
+# Clave del pg_advisory_lock de las migraciones (cualquier bigint fijo)
+MIGRATION_LOCK_KEY = 7_203_114_501
+
+
+# VERSION
+
+def current_version(engine) -> Optional[int]:
+    """Version aplicada, 0 si la tabla esta vacia y None si no existe (base sin migraciones)"""
+    try:
+        with engine.connect() as connection:
+            return connection.execute(select(func.max(schema_version.c.version))).scalar() or 0
+    except (OperationalError, ProgrammingError):
+        return None
+
+
+def _stamp(engine, migration: Migration):
+    with engine.begin() as connection:
+        already = connection.execute(
+            select(schema_version.c.version).where(schema_version.c.version == migration.version)
+        ).first()
+        if not already:
+            connection.execute(insert(schema_version).values(
+                version=migration.version,
+                description=migration.description,
+                applied_at=datetime.utcnow(),
+            ))
+
+
+def migrate(engine, target: Optional[int] = None, log=logger.info) -> int:
+    """Aplica las migraciones pendientes hasta target (o la ultima). Devuelve la version final"""
+    with migration_lock(engine):
+        return _apply_pending(engine, target, log)
+
+
+def _apply_pending(engine, target: Optional[int], log) -> int:
+    """migrate sin el bloqueo (quien llama ya lo tiene)"""
+    target = LATEST_VERSION if target is None else target
+    schema_version.create(engine, checkfirst=True)
+    version = current_version(engine) or 0
+
+    for migration in MIGRATIONS:
+        if version < migration.version <= target:
+            log(f"migracion {migration.version}: {migration.description}")
+            migration.apply(engine)
+            _stamp(engine, migration)
+            version = migration.version
+    return version
+
+
+def ensure_schema(engine, log=logger.info) -> int:
+    """
+    Comprobacion del arranque. En el caso normal es un solo SELECT de la version.
+    - Base vacia: create_all con los modelos actuales y se marcan todas las migraciones
+    - Base detras: se migra si AUTO_MIGRATE=true, si no la app no arranca
+    Devuelve la version con la que queda el esquema.
+    """
+    import models
+
+    version = current_version(engine)
+    if version is not None and version >= LATEST_VERSION:
+        return version
+
+    with migration_lock(engine):
+        # otro worker puede haber creado o migrado la base mientras se esperaba
+        version = current_version(engine)
+        if version is not None and version >= LATEST_VERSION:
+            return version
+
+        if version is None and not inspect(engine).has_table("user"):
+            SQLModel.metadata.create_all(engine)
+            schema_version.create(engine, checkfirst=True)
+            for migration in MIGRATIONS:
+                _stamp(engine, migration)
+            return LATEST_VERSION
+
+        if not settings.AUTO_MIGRATE:
+            raise RuntimeError(
+                f"Esquema en version {version or 0}, se necesita la {LATEST_VERSION}. Ejecuta: python cli.py migrate"
+            )
+        return _apply_pending(engine, None, log)
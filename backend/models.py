@@ -1,5 +1,6 @@
 from typing import Optional, List
-from datetime import datetime
+from datetime import datetime, date
+from sqlalchemy import Index
 from sqlmodel import Field, SQLModel, Relationship
 
 
@@ -43,7 +44,8 @@ class Profile(SQLModel, table=True):
     Equivalente a la tabla 'profiles'.
     """
     id: Optional[int] = Field(default=None, primary_key=True)
-    user_id: int = Field(foreign_key="user.id")
+    # /my-profile y el JOIN de /bootstrap buscan por user_id
+    user_id: int = Field(foreign_key="user.id", index=True)
     
     #el resultado del quiz de onboarding
     archetype: str 
@@ -60,7 +62,7 @@ class Goal(SQLModel, table=True):
     equivalente a la tabla 'goals' pero hardcodeada para validar el MVP
     """
     id: Optional[int] = Field(default=None, primary_key=True)
-    user_id: int = Field(foreign_key="user.id")
+    user_id: int = Field(foreign_key="user.id", index=True)
     
     title: str 
     description: Optional[str] = None
@@ -72,11 +74,34 @@ class Goal(SQLModel, table=True):
     user: Optional[User] = Relationship(back_populates="goals")
 
 
+class GoalWeeklyProgress(SQLModel, table=True):
+    """
+    Acumulado semanal de cada meta (una fila por meta y semana, la semana empieza el lunes)
+    Se suma en la misma transaccion que /sessions/complete, nunca se recalcula desde las sesiones
+    """
+    __tablename__ = "goal_weekly_progress"
+
+    goal_id: int = Field(foreign_key="goal.id", primary_key=True)
+    week_start: date = Field(primary_key=True)
+
+    minutes: int = Field(default=0)
+    session_count: int = Field(default=0)
+
+
 class Session(SQLModel, table=True):
     """
     El corazón de la sesión de estudio
     Equivalente a la tabla 'sessions'
     """
+    __table_args__ = (
+        # rangos por usuario y fecha (estadisticas, backfill) sin recorrer toda la tabla
+        Index("ix_session_user_completed_started", "user_id", "completed", "started_at"),
+        # historial paginado por (started_at, id) de cada usuario
+        Index("ix_session_user_started", "user_id", "started_at", "id"),
+        # una clave de idempotencia solo se puede usar una vez por usuario
+        Index("ux_session_user_client_key", "user_id", "client_key", unique=True),
+    )
+
     id: Optional[int] = Field(default=None, primary_key=True)
     user_id: int = Field(foreign_key="user.id")
     
@@ -90,14 +115,78 @@ class Session(SQLModel, table=True):
     # Estado final
     completed: bool = Field(default=False) # ¿Termina o abandona?
     abandon_reason: Optional[str] = None   # Si abandona, ¿por qué?
+
+    # Clave generada por el cliente para las sesiones enviadas en lote (offline)
+    client_key: Optional[str] = Field(default=None, max_length=64)
+
+    # Meta a la que se dedico la sesion (None = cuenta para todas las metas activas)
+    goal_id: Optional[int] = Field(default=None, foreign_key="goal.id")
     
     user: Optional[User] = Relationship(back_populates="sessions")
-    
+
+
+class UserDailyActivity(SQLModel, table=True):
+    """
+    Resumen diario de estudio por usuario (una fila por usuario y dia)
+    Se actualiza en la misma transaccion que /sessions/complete
+    """
+    __tablename__ = "user_daily_activity"
+
+    user_id: int = Field(foreign_key="user.id", primary_key=True)
+    day: date = Field(primary_key=True)
+
+    session_count: int = Field(default=0)
+    minutes: int = Field(default=0)
+    points: int = Field(default=0)
+
+class SessionMonthlySummary(SQLModel, table=True):
+    """
+    Sesiones antiguas ya compactadas (retention.py): una fila por usuario y mes
+    Las sesiones de mas de RETENTION_DAYS se suman aqui y se borran de session
+    """
+    __tablename__ = "session_monthly_summary"
+
+    user_id: int = Field(foreign_key="user.id", primary_key=True)
+    month: date = Field(primary_key=True)  # dia 1 del mes
+
+    session_count: int = Field(default=0)
+    completed_count: int = Field(default=0)
+    abandoned_count: int = Field(default=0)
+    minutes: int = Field(default=0)  # de las completadas, como en user_daily_activity
+
+
+class SessionMonthlyAbandon(SQLModel, table=True):
+    """Motivos de abandono de las sesiones compactadas, por usuario y mes"""
+    __tablename__ = "session_monthly_abandon"
+
+    user_id: int = Field(foreign_key="user.id", primary_key=True)
+    month: date = Field(primary_key=True)
+    reason: str = Field(primary_key=True)  # "" = sin motivo
+
+    count: int = Field(default=0)
+
+
+class JobState(SQLModel, table=True):
+    """Por donde va cada trabajo de mantenimiento por tandas, para retomarlo si se corta"""
+    __tablename__ = "job_state"
+
+    name: str = Field(primary_key=True)
+    cutoff: Optional[datetime] = None  # limite con el que se lanzo la pasada en curso
+    cursor: int = Field(default=0)  # siguiente user_id por procesar
+    started_at: Optional[datetime] = None
+    finished_at: Optional[datetime] = None
+
+
 # INVENTARIO DE ITEMS 
 class UserItem(SQLModel, table=True):
     """
     Registra qué items ha comprado el usuario en la tienda.
     """
+    __table_args__ = (
+        # una fila por usuario e item, las compras repetidas suman quantity
+        Index("ux_useritem_user_item", "user_id", "item_id", unique=True),
+    )
+
     id: Optional[int] = Field(default=None, primary_key=True)
     user_id: int = Field(foreign_key="user.id")
     
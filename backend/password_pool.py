@@ -0,0 +1,154 @@
+import asyncio
+import os
+import threading
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+from config import settings
+import metrics
+
+password_hash_latency = metrics.Histogram(
+    "focus_password_hash_duration_seconds",
+    "Tiempo de bcrypt por operacion, incluida la espera en la cola del pool",
+    ("operation",),
+)
+
+
+class PasswordPoolBusy(Exception):
+    """La cola de hashing está llena, la petición se rechaza en vez de esperar"""
+
+
+class LatencyStats:
+    """
+    Guarda las ultimas muestras de latencia de una operación
+    para poder calcular p50/p99 sin crecer en memoria.
+    """
+
+    def __init__(self, maxlen: int = 1024):
+        self._samples = deque(maxlen=maxlen)
+        self._lock = threading.Lock()
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    def record(self, seconds: float):
+        with self._lock:
+            self._samples.append(seconds)
+            self.count += 1
+            self.total += seconds
+            self.max = max(self.max, seconds)
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            samples = sorted(self._samples)
+            count, total, max_ = self.count, self.total, self.max
+
+        def pct(p):
+            if not samples:
+                return 0.0
+            return samples[min(len(samples) - 1, int(p * len(samples)))]
+
+        return {
+            "count": count,
+            "avg_ms": round(total / count * 1000, 2) if count else 0.0,
+            "p50_ms": round(pct(0.50) * 1000, 2),
+            "p99_ms": round(pct(0.99) * 1000, 2),
+            "max_ms": round(max_ * 1000, 2),
+        }
+
+
+class PasswordPool:
+    """
+    Ejecutor dedicado para bcrypt con cola acotada.
+    Como mucho hay workers + queue_size operaciones en vuelo,
+    el resto recibe PasswordPoolBusy al instante.
+    """
+
+    def __init__(self, workers: int, queue_size: int, backend: str = "thread"):
+        self.workers = workers
+        self.queue_size = queue_size
+        self.backend = backend
+        self._slots = threading.BoundedSemaphore(workers + queue_size)
+        self._executor = None
+        self._executor_lock = threading.Lock()
+        self._count_lock = threading.Lock()
+        self._latency = {}
+        self.in_flight = 0
+        self.rejected = 0
+
+    def _get_executor(self):
+        # se crea en el primer uso para no lanzar procesos al importar
+        if self._executor is None:
+            with self._executor_lock:
+                if self._executor is None:
+                    if self.backend == "process":
+                        self._executor = ProcessPoolExecutor(max_workers=self.workers)
+                    else:
+                        self._executor = ThreadPoolExecutor(
+                            max_workers=self.workers, thread_name_prefix="bcrypt"
+                        )
+        return self._executor
+
+    def _acquire(self):
+        if not self._slots.acquire(blocking=False):
+            self.rejected += 1
+            raise PasswordPoolBusy()
+        with self._count_lock:
+            self.in_flight += 1
+        return time.perf_counter()
+
+    def _release(self, operation: str, start: float):
+        # puede llegar desde el hilo del worker (add_done_callback)
+        with self._count_lock:
+            self.in_flight -= 1
+        self._slots.release()
+        elapsed = time.perf_counter() - start
+        self._latency.setdefault(operation, LatencyStats()).record(elapsed)
+        password_hash_latency.observe(operation, value=elapsed)
+
+    def _submit(self, operation: str, fn, *args):
+        """
+        Ocupa un hueco y manda fn al pool. El hueco se libera cuando termina el future del
+        executor, no quien espera: si la peticion se cancela, bcrypt sigue en el worker y el
+        hueco sigue ocupado hasta que acabe.
+        """
+        start = self._acquire()
+        try:
+            future = self._get_executor().submit(fn, *args)
+        except BaseException:
+            self._release(operation, start)
+            raise
+        future.add_done_callback(lambda _: self._release(operation, start))
+        return future
+
+    def run(self, operation: str, fn, *args):
+        """Ejecuta fn en el pool y espera el resultado, o falla rapido si esta lleno"""
+        return self._submit(operation, fn, *args).result()
+
+    async def run_async(self, operation: str, fn, *args):
+        """Igual que run pero sin bloquear el event loop mientras bcrypt trabaja"""
+        return await asyncio.wrap_future(self._submit(operation, fn, *args))
+
+    def shutdown(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+
+    def stats(self) -> dict:
+        return {
+            "backend": self.backend,
+            "workers": self.workers,
+            "queue_size": self.queue_size,
+            "in_flight": self.in_flight,
+            "rejected": self.rejected,
+            "operations": {op: s.snapshot() for op, s in self._latency.items()},
+        }
+
+
+# Instancia unica compartida por security.py
+pool = PasswordPool(
+    workers=settings.PASSWORD_HASH_WORKERS or os.cpu_count() or 2,
+    queue_size=settings.PASSWORD_HASH_QUEUE_SIZE,
+    backend=settings.PASSWORD_HASH_BACKEND,
+)
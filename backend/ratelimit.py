@@ -0,0 +1,172 @@
+import math
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import NamedTuple, Tuple
+
+from fastapi import HTTPException, status
+from starlette.concurrency import run_in_threadpool
+
+from config import settings
+import metrics
+
+# Limite de peticiones con token buckets (por IP y por cuenta) para /auth.
+# Cada clave tiene un cubo de `burst` fichas que se rellena a `per_minute` por minuto;
+# cada peticion gasta una y sin fichas se responde 429 antes de tocar bcrypt.
+
+rate_limited = metrics.Counter(
+    "focus_rate_limited_total", "Peticiones rechazadas por el limitador", ("limit",)
+)
+
+
+class Limit(NamedTuple):
+    name: str
+    per_minute: float
+    burst: int
+
+    @property
+    def rate(self) -> float:
+        """Fichas por segundo"""
+        return self.per_minute / 60
+
+
+def _refill(tokens: float, updated_at: float, now: float, limit: Limit) -> float:
+    return min(limit.burst, tokens + (now - updated_at) * limit.rate)
+
+
+def _retry_after(tokens: float, limit: Limit) -> float:
+    """Segundos hasta que vuelva a haber una ficha"""
+    return max(0.0, (1 - tokens) / limit.rate)
+
+
+class MemoryBackend:
+    """
+    Cubos en memoria de este proceso. Acotado como TTLCache: si hay demasiadas claves
+    se descartan las menos usadas (un cubo olvidado equivale a uno lleno).
+    """
+
+    def __init__(self, maxsize: int):
+        self.maxsize = maxsize
+        self._buckets: "OrderedDict[str, Tuple[float, float]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def take(self, key: str, limit: Limit, now: float) -> Tuple[bool, float]:
+        with self._lock:
+            tokens, updated_at = self._buckets.get(key, (limit.burst, now))
+            tokens = _refill(tokens, updated_at, now, limit)
+            allowed = tokens >= 1
+            if allowed:
+                tokens -= 1
+            self._buckets[key] = (tokens, now)
+            self._buckets.move_to_end(key)
+            if len(self._buckets) > self.maxsize:
+                self._buckets.popitem(last=False)
+        return allowed, 0.0 if allowed else _retry_after(tokens, limit)
+
+
+class SQLiteBackend:
+    """
+    Cubos en un archivo SQLite aparte, compartido por todos los workers de la maquina.
+    Cada intento es un solo UPSERT atomico: rellena, gasta una ficha si hay y devuelve lo que queda.
+    """
+
+    # Solo se actualiza si queda al menos una ficha; si no, RETURNING no devuelve nada
+    TAKE = """
+        INSERT INTO bucket (key, tokens, updated_at) VALUES (:key, :burst - 1, :now)
+        ON CONFLICT (key) DO UPDATE SET
+            tokens = min(:burst, tokens + (:now - updated_at) * :rate) - 1,
+            updated_at = :now
+        WHERE min(:burst, tokens + (:now - updated_at) * :rate) >= 1
+        RETURNING tokens
+    """
+
+    def __init__(self, path: str, prune_every: int = 1000, prune_after_seconds: float = 3600):
+        self.path = path
+        self.prune_every = prune_every
+        self.prune_after_seconds = prune_after_seconds
+        self._local = threading.local()
+        self._calls = 0
+        with self._connect() as connection:
+            connection.execute(
+                "CREATE TABLE IF NOT EXISTS bucket (key TEXT PRIMARY KEY, tokens REAL NOT NULL, updated_at REAL NOT NULL)"
+            )
+
+    def _connect(self) -> sqlite3.Connection:
+        # una conexion por hilo; autocommit, cada UPSERT es su propia transaccion
+        connection = getattr(self._local, "connection", None)
+        if connection is None:
+            connection = sqlite3.connect(self.path, isolation_level=None, check_same_thread=False)
+            connection.execute("PRAGMA journal_mode=WAL")
+            # si se pierde el ultimo instante de los cubos no pasa nada
+            connection.execute("PRAGMA synchronous=OFF")
+            connection.execute(f"PRAGMA busy_timeout={settings.SQLITE_BUSY_TIMEOUT_MS}")
+            self._local.connection = connection
+        return connection
+
+    def take(self, key: str, limit: Limit, now: float) -> Tuple[bool, float]:
+        connection = self._connect()
+        params = {"key": key, "burst": limit.burst, "rate": limit.rate, "now": now}
+        row = connection.execute(self.TAKE, params).fetchone()
+
+        self._calls += 1
+        if self._calls % self.prune_every == 0:
+            # cubos que llevan tiempo sin usarse ya estan llenos, se pueden borrar
+            connection.execute("DELETE FROM bucket WHERE updated_at < ?", (now - self.prune_after_seconds,))
+
+        if row is not None:
+            return True, 0.0
+        tokens, updated_at = connection.execute(
+            "SELECT tokens, updated_at FROM bucket WHERE key = ?", (key,)
+        ).fetchone()
+        return False, _retry_after(_refill(tokens, updated_at, now, limit), limit)
+
+
+def create_backend(name: str):
+    if name == "sqlite":
+        return SQLiteBackend(settings.RATE_LIMIT_SQLITE_PATH)
+    if name == "memory":
+        return MemoryBackend(settings.RATE_LIMIT_MAX_KEYS)
+    raise ValueError(f"RATE_LIMIT_BACKEND desconocido: {name}")
+
+
+class RateLimiter:
+    def __init__(self, backend, enabled: bool = True):
+        self.backend = backend
+        self.enabled = enabled
+        # el de SQLite escribe en disco, no se llama desde el event loop
+        self._blocking = isinstance(backend, SQLiteBackend)
+
+    async def check(self, limit: Limit, identity: str):
+        """Gasta una ficha de limit para identity o lanza 429 con Retry-After"""
+        if not self.enabled or limit.per_minute <= 0:
+            return
+        key = f"{limit.name}:{identity}"
+        now = time.time()
+        if self._blocking:
+            allowed, retry_after = await run_in_threadpool(self.backend.take, key, limit, now)
+        else:
+            allowed, retry_after = self.backend.take(key, limit, now)
+        if not allowed:
+            rate_limited.inc(limit.name)
+            raise HTTPException(
+                status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+                detail="Demasiados intentos, espera un momento",
+                headers={"Retry-After": str(max(1, math.ceil(retry_after)))},
+            )
+
+
+# Limites de /auth (por minuto y rafaga maxima)
+LOGIN_PER_IP = Limit("login_ip", settings.LOGIN_RATE_PER_IP_PER_MINUTE, settings.LOGIN_RATE_PER_IP_BURST)
+LOGIN_PER_ACCOUNT = Limit(
+    "login_account", settings.LOGIN_RATE_PER_ACCOUNT_PER_MINUTE, settings.LOGIN_RATE_PER_ACCOUNT_BURST
+)
+REGISTER_PER_IP = Limit("register_ip", settings.REGISTER_RATE_PER_IP_PER_MINUTE, settings.REGISTER_RATE_PER_IP_BURST)
+
+# Instancia unica
+limiter = RateLimiter(create_backend(settings.RATE_LIMIT_BACKEND), enabled=settings.RATE_LIMIT_ENABLED)
+
+
+def client_ip(request) -> str:
+    """IP del cliente; detras de un proxy hay que arrancar uvicorn con --proxy-headers"""
+    return request.client.host if request.client else "desconocida"
@@ -0,0 +1,239 @@
+import logging
+import time
+from collections import defaultdict
+from datetime import date, datetime, timedelta
+from typing import Optional
+
+from sqlalchemy import delete, func, inspect
+from sqlalchemy.exc import OperationalError
+from sqlmodel import Session, select
+
+from analytics import RANGES
+from config import settings
+from database import dialect_insert
+from models import JobState, SessionMonthlyAbandon, SessionMonthlySummary, User, Session as SessionModel
+import metrics
+
+logger = logging.getLogger("focus.retention")
+
+# Retencion del historial: solo la semana en curso se consulta al detalle y /analytics llega
+# como mucho a un año, lo anterior se guarda sumado por usuario y mes y se borra de session.
+# Asi la tabla y sus indices no crecen con la antiguedad de la app y caben en la cache de paginas.
+# Cada tanda borra con DELETE ... RETURNING y suma lo borrado en la misma transaccion:
+# si se corta o dos workers la lanzan a la vez ninguna sesion se cuenta dos veces.
+
+JOB_NAME = "retention"
+
+sessions_compacted = metrics.Counter(
+    "focus_retention_sessions_compacted_total", "Sesiones antiguas sumadas a los resumenes mensuales y borradas"
+)
+
+
+def retention_cutoff(today: date) -> datetime:
+    """Primer instante que se conserva: el dia 1 del mes de hace RETENTION_DAYS (solo meses enteros)"""
+    days = max(settings.RETENTION_DAYS, max(RANGES.values()) + 1)
+    first_day = (today - timedelta(days=days)).replace(day=1)
+    return datetime.combine(first_day, datetime.min.time())
+
+
+def compacted_before(session: Session) -> Optional[datetime]:
+    """Las sesiones anteriores pueden estar ya compactadas (None si nunca se ha compactado)"""
+    # con la conexion de la sesion: el pool de escritura de SQLite solo tiene una
+    if not inspect(session.connection()).has_table(JobState.__tablename__):
+        # base anterior a la migracion 7 (el backfill de la migracion 1 pasa por aqui)
+        return None
+    state = session.get(JobState, JOB_NAME)
+    return state.cutoff if state else None
+
+
+def _start(session: Session, cutoff: datetime) -> JobState:
+    """Estado de la pasada: la que se corto a medias, o una nueva desde el primer usuario"""
+    session.exec(
+        dialect_insert(session, JobState).values(name=JOB_NAME).on_conflict_do_nothing(index_elements=["name"])
+    )
+    state = session.get(JobState, JOB_NAME)
+    if state.cutoff is not None and state.finished_at is None:
+        # se sigue con su limite y desde su cursor
+        return state
+    if state.cutoff is not None:
+        # nunca hacia atras: lo anterior al limite previo ya no esta en session
+        cutoff = max(cutoff, state.cutoff)
+    state.cutoff, state.cursor = cutoff, 0
+    state.started_at, state.finished_at = datetime.utcnow(), None
+    session.add(state)
+    return state
+
+
+def _compact_batch(session: Session, low: int, high: int, cutoff: datetime, batch_size: int) -> int:
+    """
+    Borra hasta batch_size sesiones anteriores a cutoff de los usuarios [low, high)
+    y las suma a los resumenes mensuales. No hace commit. Devuelve cuantas borro.
+    """
+    batch = (
+        select(SessionModel.id)
+        .where(SessionModel.user_id >= low)
+        .where(SessionModel.user_id < high)
+        .where(SessionModel.started_at < cutoff)
+        .limit(batch_size)
+    )
+    rows = session.exec(
+        delete(SessionModel)
+        .where(SessionModel.id.in_(batch.scalar_subquery()))
+        .returning(
+            SessionModel.user_id,
+            SessionModel.started_at,
+            SessionModel.intended_minutes,
+            SessionModel.completed,
+            SessionModel.abandon_reason,
+        )
+        .execution_options(synchronize_session=False)
+    ).all()
+
+    # (usuario, mes) -> [sesiones, completadas, abandonadas, minutos]
+    months = defaultdict(lambda: [0, 0, 0, 0])
+    reasons = defaultdict(int)
+    for user_id, started_at, intended_minutes, completed, abandon_reason in rows:
+        key = (user_id, started_at.date().replace(day=1))
+        totals = months[key]
+        totals[0] += 1
+        if completed:
+            totals[1] += 1
+            totals[3] += intended_minutes
+        else:
+            totals[2] += 1
+            reasons[key + (abandon_reason or "",)] += 1
+
+    if months:
+        stmt = dialect_insert(session, SessionMonthlySummary).values([
+            {
+                "user_id": user_id,
+                "month": month,
+                "session_count": count,
+                "completed_count": completed,
+                "abandoned_count": abandoned,
+                "minutes": minutes,
+            }
+            for (user_id, month), (count, completed, abandoned, minutes) in months.items()
+        ])
+        session.exec(stmt.on_conflict_do_update(
+            index_elements=["user_id", "month"],
+            set_={
+                "session_count": SessionMonthlySummary.session_count + stmt.excluded.session_count,
+                "completed_count": SessionMonthlySummary.completed_count + stmt.excluded.completed_count,
+                "abandoned_count": SessionMonthlySummary.abandoned_count + stmt.excluded.abandoned_count,
+                "minutes": SessionMonthlySummary.minutes + stmt.excluded.minutes,
+            },
+        ))
+    if reasons:
+        stmt = dialect_insert(session, SessionMonthlyAbandon).values([
+            {"user_id": user_id, "month": month, "reason": reason, "count": count}
+            for (user_id, month, reason), count in reasons.items()
+        ])
+        session.exec(stmt.on_conflict_do_update(
+            index_elements=["user_id", "month", "reason"],
+            set_={"count": SessionMonthlyAbandon.count + stmt.excluded.count},
+        ))
+    return len(rows)
+
+
+def incremental_vacuum(engine, pages: int) -> int:
+    """
+    SQLite: devuelve al disco hasta `pages` paginas libres y dice cuantas fueron.
+    Solo con auto_vacuum=INCREMENTAL (bases creadas ya asi o convertidas con
+    cli.py compact-sessions --full-vacuum); con NONE las paginas libres se quedan en el archivo
+    y las reutilizan las sesiones nuevas, asi que tampoco crece.
+    Postgres no lo necesita: las filas muertas las limpia autovacuum y el VACUUM del final.
+    """
+    if engine.dialect.name != "sqlite" or pages <= 0:
+        return 0
+    with engine.connect().execution_options(isolation_level="AUTOCOMMIT") as connection:
+        if connection.exec_driver_sql("PRAGMA auto_vacuum").scalar() != 2:
+            return 0
+        before = connection.exec_driver_sql("PRAGMA freelist_count").scalar()
+        # libera una pagina por paso y execute() de sqlite3 solo da el primero;
+        # executescript lo ejecuta hasta el final
+        connection.connection.driver_connection.executescript(f"PRAGMA incremental_vacuum({int(pages)})")
+        return before - connection.exec_driver_sql("PRAGMA freelist_count").scalar()
+
+
+def analyze(engine):
+    """Estadisticas del planificador al dia despues de borrar muchas filas"""
+    tables = (SessionModel.__tablename__, SessionMonthlySummary.__tablename__, SessionMonthlyAbandon.__tablename__)
+    with engine.connect().execution_options(isolation_level="AUTOCOMMIT") as connection:
+        if engine.dialect.name == "postgresql":
+            # VACUUM normal (no FULL): no bloquea la tabla, deja el espacio para reutilizarlo
+            for table in tables:
+                connection.exec_driver_sql(f'VACUUM (ANALYZE) "{table}"')
+            return
+        # analysis_limit: ANALYZE por muestreo, no recorre los indices enteros
+        connection.exec_driver_sql("PRAGMA analysis_limit=1000")
+        for table in tables:
+            connection.exec_driver_sql(f'ANALYZE "{table}"')
+
+
+def session_table_bytes(engine) -> Optional[int]:
+    """Lo que ocupan session y sus indices, None si la DB no lo sabe decir (SQLite sin dbstat)"""
+    with engine.connect() as connection:
+        if engine.dialect.name == "postgresql":
+            return connection.exec_driver_sql("SELECT pg_total_relation_size('session')").scalar()
+        try:
+            return connection.exec_driver_sql(
+                "SELECT sum(pgsize) FROM dbstat WHERE name IN (SELECT name FROM sqlite_master WHERE tbl_name = 'session')"
+            ).scalar()
+        except OperationalError:
+            return None
+
+
+def compact_sessions(engine, today: date = None, batch_size: int = None, batch_users: int = 5000,
+                     log=logger.info) -> dict:
+    """
+    Una pasada de retencion: compacta las sesiones anteriores a retention_cutoff, luego ANALYZE.
+    - va por rangos de user_id y dentro de cada rango por tandas de batch_size sesiones,
+      cada tanda es una transaccion corta (con SQLite hay un solo escritor)
+    - entre tandas devuelve paginas libres al disco y espera RETENTION_PAUSE_MS
+    - el rango por el que va se guarda en job_state: si se corta, la siguiente llamada sigue ahi
+    Devuelve el resumen de la pasada.
+    """
+    today = today or datetime.utcnow().date()
+    batch_size = batch_size or settings.RETENTION_BATCH_SIZE
+    compacted = freed_pages = 0
+
+    with Session(engine, expire_on_commit=False) as session:
+        state = _start(session, retention_cutoff(today))
+        max_user_id = session.exec(select(func.max(User.id))).one() or 0
+        session.commit()
+        if state.cursor:
+            log(f"retomando la pasada anterior desde user_id {state.cursor}")
+
+        while state.cursor <= max_user_id:
+            low, high = state.cursor, state.cursor + batch_users
+            while True:
+                moved = _compact_batch(session, low, high, state.cutoff, batch_size)
+                session.commit()
+                if moved:
+                    compacted += moved
+                    sessions_compacted.inc(amount=moved)
+                    freed_pages += incremental_vacuum(engine, settings.RETENTION_VACUUM_PAGES)
+                if moved < batch_size:
+                    break
+                time.sleep(settings.RETENTION_PAUSE_MS / 1000)
+            state.cursor = high
+            session.add(state)
+            session.commit()
+
+        state.finished_at = datetime.utcnow()
+        session.add(state)
+        session.commit()
+
+    analyze(engine)
+    result = {
+        "cutoff": state.cutoff,
+        "compacted": compacted,
+        "freed_pages": freed_pages,
+        "session_bytes": session_table_bytes(engine),
+    }
+    log(
+        f"sesiones anteriores a {state.cutoff:%Y-%m-%d} compactadas: {compacted}, paginas liberadas: {freed_pages}"
+        + (f", session ocupa {result['session_bytes'] / 2**20:.1f} MiB" if result["session_bytes"] else "")
+    )
+    return result
@@ -1,18 +1,23 @@
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, Request, status
 from fastapi.security import OAuth2PasswordRequestForm
 from sqlmodel import Session, select
+from sqlalchemy.exc import IntegrityError
 from pydantic import BaseModel
 from typing import Annotated
 
 
 
-from database import get_session
+from database import get_read_db, get_fresh_read_db, get_write_db, run_db, AnySession
 from models import User
-from security import get_password_hash, verify_password, create_access_token
+from schemas import UserOut
+import auth_cache
+from leaderboard import leaderboards
+from security import get_password_hash_async, verify_and_update_password_async, dummy_verify_async, create_access_token
+from password_pool import PasswordPoolBusy
+from ratelimit import limiter, client_ip, LOGIN_PER_IP, LOGIN_PER_ACCOUNT, REGISTER_PER_IP
 
 
 from fastapi.security import OAuth2PasswordBearer
-from jose import JWTError, jwt 
 from config import settings #  lee SECRET_KEY
 from models import User
 
@@ -30,93 +35,175 @@ class Token(BaseModel):
     access_token: str
     token_type: str
     
+# Respuesta rapida cuando el pool de bcrypt esta saturado
+hashing_busy_exception = HTTPException(
+    status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+    detail="Servidor ocupado, intenta de nuevo en unos segundos",
+    headers={"Retry-After": "1"},
+)
+
 # token viene en la cabecera Authorization: Bearer
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="auth/login")
 
-def get_current_user(token: str = Depends(oauth2_scheme), session: Session = Depends(get_session)):
+def _get_user_by_email(session: Session, email: str):
+    statement = select(User).where(User.email == email)
+    return session.exec(statement).first()
+
+credentials_exception = HTTPException(
+    status_code=status.HTTP_401_UNAUTHORIZED,
+    detail="No se pudieron validar las credenciales",
+    headers={"WWW-Authenticate": "Bearer"},
+)
+
+async def get_token_email(token: str = Depends(oauth2_scheme)) -> str:
     """
-    Valida el token y devuelve el usuario actual
+    Valida el token y devuelve el email del usuario sin tocar la DB
     en casi de qye ek token fuese falso o expira entoncs lanza error
     """
-    credentials_exception = HTTPException(
-        status_code=status.HTTP_401_UNAUTHORIZED,
-        detail="No se pudieron validar las credenciales",
-        headers={"WWW-Authenticate": "Bearer"},
-    )
-    try:
-        # se decodifica el token usando la SECRET_KEY
-        payload = jwt.decode(token, settings.SECRET_KEY, algorithms=[settings.ALGORITHM])
-        email: str = payload.get("sub")
-        if email is None:
+    return decode_token_email(token)
+
+def decode_token_email(token: str) -> str:
+    """Lo mismo sin Depends, para tokens que llegan por query (EventSource y WebSocket no envian cabeceras)"""
+    # Si el token ya se verificó antes no se vuelve a decodificar
+    email = auth_cache.get_token_subject(token)
+    if email is None:
+        # jose se importa en el primer token y no al arrancar
+        from jose import JWTError, jwt
+
+        try:
+            # se decodifica el token usando la SECRET_KEY
+            payload = jwt.decode(token, settings.SECRET_KEY, algorithms=[settings.ALGORITHM])
+            email: str = payload.get("sub")
+            if email is None:
+                raise credentials_exception
+        except JWTError:
             raise credentials_exception
-    except JWTError:
-        raise credentials_exception
-    
-    # Buscar al usuario en la DB
-    statement = select(User).where(User.email == email)
-    user = session.exec(statement).first()
-    
+        auth_cache.remember_token(token, email, payload.get("exp"))
+    return email
+
+async def get_current_user(email: str = Depends(get_token_email), session: AnySession = Depends(get_fresh_read_db)):
+    """
+    Devuelve el usuario actual del token.
+    La fila se guarda en la cache de usuarios, por eso no se lee de una replica (get_fresh_read_db)
+    """
+    # Primero la cache de usuarios, si no esta se busca en la DB
+    user = auth_cache.get_cached_user(email, session)
+    if user is not None:
+        return user
+
+    user = await run_db(session, _get_user_by_email, email)
+
     if user is None:
         raise credentials_exception
-        
+
+    auth_cache.remember_user(user)
     return user
 
+# LIMITES: se comprueban como dependencias, antes de la DB y de bcrypt
+async def limit_login(
+    request: Request,
+    form_data: Annotated[OAuth2PasswordRequestForm, Depends()],
+):
+    """Primero por IP (rafagas contra muchas cuentas) y luego por cuenta (contra una sola)"""
+    await limiter.check(LOGIN_PER_IP, client_ip(request))
+    await limiter.check(LOGIN_PER_ACCOUNT, form_data.username.strip().lower())
+
+async def limit_register(request: Request):
+    await limiter.check(REGISTER_PER_IP, client_ip(request))
+
 # ENDPOINT: REGISTRO  
-@router.post("/register", status_code=status.HTTP_201_CREATED)
-def register_user(user_data: UserRegister, session: Session = Depends(get_session)):
-    # Verificar si existe
-    statement = select(User).where(User.email == user_data.email)
-    user = session.exec(statement).first()
+@router.post("/register", status_code=status.HTTP_201_CREATED, dependencies=[Depends(limit_register)])
+async def register_user(
+    user_data: UserRegister,
+    read_session: AnySession = Depends(get_read_db),
+    session: AnySession = Depends(get_write_db),
+):
+    # Verificar si existe (por el motor de lectura, no se ocupa el de escritura mientras se hashea)
+    user = await run_db(read_session, _get_user_by_email, user_data.email)
     if user:
         raise HTTPException(status_code=400, detail="Email ya registrado")
     
-    # Hashea y guarda
+    # Hashea fuera del event loop y guarda
+    try:
+        password_hash = await get_password_hash_async(user_data.password)
+    except PasswordPoolBusy:
+        raise hashing_busy_exception
+
+    try:
+        return await run_db(session, _create_user, user_data, password_hash)
+    except IntegrityError:
+        # otro registro con el mismo email gano la carrera (o la replica aun no lo tenia)
+        raise HTTPException(status_code=400, detail="Email ya registrado")
+
+def _create_user(session: Session, user_data: UserRegister, password_hash: str):
     career_capitalized = user_data.career.strip().capitalize() if user_data.career else "Mi carrera"
     new_user = User(
         email=user_data.email,
-        password_hash=get_password_hash(user_data.password),
+        password_hash=password_hash,
         full_name=user_data.full_name,
         career=career_capitalized[:30] 
     )
     session.add(new_user)
     session.commit()
     session.refresh(new_user)
+    leaderboards.update_user(new_user)
     return {"message": "Usuario creado", "user_id": new_user.id}
 
 # ENDPOINT: LOGIN
-@router.post("/login", response_model=Token)
-def login_for_access_token(
+@router.post("/login", response_model=Token, dependencies=[Depends(limit_login)])
+async def login_for_access_token(
     form_data: Annotated[OAuth2PasswordRequestForm, Depends()],
-    session: Session = Depends(get_session)
+    read_session: AnySession = Depends(get_read_db),
+    session: AnySession = Depends(get_write_db),
 ):
     """
     Recibe user email y password.
     Si son correctos devuelve el TOKEN JWT.
     """
     # Busca usuario por email 
-    statement = select(User).where(User.email == form_data.username)
-    user = session.exec(statement).first()
+    user = await run_db(read_session, _get_user_by_email, form_data.username)
 
     # Verifica usuario y contraseña si existen de antes
-    if not user or not verify_password(form_data.password, user.password_hash):
+    valid, new_hash = False, None
+    try:
+        if user:
+            valid, new_hash = await verify_and_update_password_async(form_data.password, user.password_hash)
+        else:
+            # mismo coste que un email existente, la respuesta no revela si la cuenta existe
+            await dummy_verify_async(form_data.password)
+    except PasswordPoolBusy:
+        raise hashing_busy_exception
+
+    if not valid:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Email o contraseña incorrectos",
             headers={"WWW-Authenticate": "Bearer"},
         )
 
+    # Si cambió BCRYPT_ROUNDS se guarda el hash con el coste nuevo de forma transparente
+    email = user.email
+    if new_hash:
+        await run_db(session, _store_password_hash, user.id, new_hash)
+        auth_cache.invalidate_user(email)
+
     # crea el token de acceso
-    access_token = create_access_token(data={"sub": user.email})
+    access_token = create_access_token(data={"sub": email})
     
     # Entrega el token al usuario
     return {"access_token": access_token, "token_type": "bearer"}
 
 
+def _store_password_hash(session: Session, user_id: int, new_hash: str):
+    session.exec(User.__table__.update().where(User.id == user_id).values(password_hash=new_hash))
+    session.commit()
+
+
 #ENDPOINT: PERFIL DEL USUARIO
-@router.get("/me", response_model=User)
-def read_users_me(current_user: User = Depends(get_current_user)):
+@router.get("/me", response_model=UserOut)
+async def read_users_me(current_user: User = Depends(get_current_user)):
     """
-    Devuelve los datos del usuario logueado.
+    Devuelve los datos del usuario logueado (sin el hash de la contraseña).
     Requiere enviar el Token en el header.
     """
     return current_user
\ No newline at end of file
@@ -0,0 +1,116 @@
+import asyncio
+from typing import Optional
+import orjson
+from fastapi import APIRouter, Depends, HTTPException, Query, WebSocket, WebSocketDisconnect, status
+from fastapi.responses import StreamingResponse
+from fastapi.security import OAuth2PasswordBearer
+from starlette.websockets import WebSocketState
+from routers.auth import decode_token_email, credentials_exception
+from config import settings
+from events import bus, HEARTBEAT, TooManyStreams
+
+router = APIRouter(prefix="/events", tags=["events"])
+
+# igual que oauth2_scheme pero sin error, el token tambien puede venir en ?token=
+optional_bearer = OAuth2PasswordBearer(tokenUrl="auth/login", auto_error=False)
+
+too_many_streams_exception = HTTPException(
+    status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+    detail=f"Maximo {settings.EVENTS_MAX_STREAMS_PER_USER} conexiones de eventos por usuario",
+)
+
+
+async def get_stream_email(
+    header_token: Optional[str] = Depends(optional_bearer),
+    token: Optional[str] = Query(None),
+) -> str:
+    """Email del token (cabecera o query), sin tocar la DB: el stream no retiene ninguna conexion"""
+    if not (header_token or token):
+        raise credentials_exception
+    return decode_token_email(header_token or token)
+
+
+async def _sse(email: str):
+    # la suscripcion se hace ya dentro del stream: si el cliente se va antes de que empiece
+    # no queda ninguna abierta ocupando su hueco
+    try:
+        sub = bus.subscribe(email)
+    except TooManyStreams:
+        # otra conexion del mismo usuario gano el hueco entre has_room y aqui
+        return
+    try:
+        # el navegador reintenta a los 5s si se corta
+        yield "retry: 5000\n\n"
+        while True:
+            event = await sub.get(settings.EVENTS_HEARTBEAT_SECONDS)
+            if event is None:
+                return
+            if event is HEARTBEAT:
+                # comentario SSE: mantiene viva la conexion a traves de proxies
+                yield ": ping\n\n"
+                continue
+            yield b"event: " + event["type"].encode() + b"\ndata: " + orjson.dumps(event, default=str) + b"\n\n"
+    finally:
+        bus.unsubscribe(sub)
+
+
+#ENDPOINT: EVENTOS POR SSE
+@router.get("/stream")
+async def event_stream(email: str = Depends(get_stream_email)):
+    """
+    Server-Sent Events con los cambios del usuario justo despues de cada commit:
+    - session: saldo, racha y el dia de la semana que se completo (/sessions/complete)
+    - spin / purchase: saldo nuevo y, al comprar, la cantidad de cada item
+    - plan: arquetipo y fecha de la revisión semanal (/users/update-plan)
+    Con EventSource el token va en ?token= porque no se pueden poner cabeceras.
+    """
+    if not bus.has_room(email):
+        raise too_many_streams_exception
+    return StreamingResponse(
+        _sse(email),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+#ENDPOINT: EVENTOS POR WEBSOCKET
+@router.websocket("/ws")
+async def event_socket(websocket: WebSocket, token: str = Query(...)):
+    """Los mismos eventos que /events/stream en mensajes JSON, el token va en ?token="""
+    try:
+        email = decode_token_email(token)
+    except HTTPException:
+        await websocket.close(code=status.WS_1008_POLICY_VIOLATION)
+        return
+    try:
+        sub = bus.subscribe(email)
+    except TooManyStreams:
+        await websocket.close(code=status.WS_1008_POLICY_VIOLATION, reason="demasiadas conexiones")
+        return
+
+    await websocket.accept()
+
+    async def _wait_close():
+        # el cliente no manda nada, solo se lee para enterarse de que cerro
+        try:
+            while True:
+                await websocket.receive_text()
+        except WebSocketDisconnect:
+            pass
+        finally:
+            sub.close()
+
+    reader = asyncio.create_task(_wait_close())
+    try:
+        while True:
+            event = await sub.get(settings.EVENTS_HEARTBEAT_SECONDS)
+            if event is None:
+                break
+            await websocket.send_text(orjson.dumps({"type": "ping"} if event is HEARTBEAT else event, default=str).decode())
+    except WebSocketDisconnect:
+        pass
+    finally:
+        reader.cancel()
+        bus.unsubscribe(sub)
+        if websocket.client_state == WebSocketState.CONNECTED:
+            await websocket.close()
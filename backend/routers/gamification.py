@@ -1,10 +1,20 @@
-import random
-from fastapi import APIRouter, Depends, HTTPException, status
+from datetime import datetime
+from typing import Dict, List, Optional
+from fastapi import APIRouter, Depends, HTTPException, Query, Response, status
 from sqlmodel import Session, select
-from pydantic import BaseModel
-from database import get_session
+from pydantic import BaseModel, Field
+from database import get_read_db, get_write_db, run_db, AnySession, dialect_insert
 from models import User, UserItem
+from schemas import CatalogOut, CartPurchaseOut, InventoryItemOut, PurchaseOut, SpinOut
 from routers.auth import get_current_user
+import auth_cache
+import events
+from config import settings
+from sampling import AliasSampler
+from wallet import debit_points, credit_points
+from catalog import catalog
+from leaderboard import leaderboards
+from writer import run_write, after_commit
 
 router = APIRouter(prefix="/gamification", tags=["gamification"])
 
@@ -17,102 +27,195 @@ REWARDS = [
     {"label": "+5 Minutos", "value": 0, "weight": 10},  # 10% Esto no se implementa en este MVP aun, pero se deja listo
 ]
 
-@router.post("/spin")
-def spin_wheel(
-    session: Session = Depends(get_session),
+# Se precalcula una sola vez al cargar el modulo, cada tirada es O(1)
+REWARD_SAMPLER = AliasSampler([r["weight"] for r in REWARDS])
+
+COST_TO_SPIN = 10
+
+@router.post("/spin", response_model=SpinOut)
+async def spin_wheel(
+    count: int = Query(1, ge=1, le=settings.SPIN_MAX_COUNT),
+    session: AnySession = Depends(get_write_db),
     current_user: User = Depends(get_current_user)
 ):
     """
     Gira la ruleta. Cuesta 50 puntos girarla (por el mvp dejare 10 para hacer la demo).
+    Con count se hacen varias tiradas en una sola transaccion y se devuelven todas en spins.
     """
-    COST_TO_SPIN = 10 
-
-    if current_user.current_points < COST_TO_SPIN:
-        raise HTTPException(status_code=400, detail="No tienes suficientes granos para girar (10 requeridos)")
-
-    # Se resta el valor de la entrada para girar
-    current_user.current_points -= COST_TO_SPIN
-    
-    # Se elige un premio basado en las probabilidades antes definidas
-    choices = [r for r in REWARDS]
-    weights = [r["weight"] for r in REWARDS]
-    reward = random.choices(choices, weights=weights, k=1)[0]
-
-    # Se da el premio
-    current_user.current_points += reward["value"]
-    
-    session.add(current_user)
-    session.commit()
-    session.refresh(current_user)
+    return await run_write(session, _spin_wheel, current_user.id, count)
+
+def _spin_wheel(session: Session, user_id: int, count: int):
+    """Funcion de escritura (writer.py): sin commit, si falla se deshace solo esta tirada"""
+    current_user = session.get(User, user_id)
+    cost = COST_TO_SPIN * count
+
+    # Se resta el valor de la entrada de forma atomica, solo si le alcanza
+    balance = debit_points(session, user_id, cost)
+    if balance is None:
+        raise HTTPException(status_code=400, detail=f"No tienes suficientes granos para girar ({cost} requeridos)")
+
+    # Se eligen los premios basado en las probabilidades antes definidas
+    rewards = [REWARDS[REWARD_SAMPLER.sample()] for _ in range(count)]
+    total_won = sum(r["value"] for r in rewards)
 
+    # Se dan los premios
+    if total_won:
+        balance = credit_points(session, user_id, total_won)
+
+    after_commit(session, auth_cache.invalidate_user, current_user.email)
+    after_commit(
+        session, leaderboards.update, user_id, current_user.full_name, current_user.career,
+        balance, current_user.current_streak_days,
+    )
+    after_commit(session, events.publish, current_user.email, "spin", {
+        "balance": balance,
+        "total_value": total_won,
+    })
+
+    # el primer premio se devuelve tambien arriba como con una sola tirada
+    reward = rewards[0]
     return {
         "prize": reward["label"],
         "value": reward["value"],
-        "new_balance": current_user.current_points,
-        "message": f"¡Ganaste {reward['label']}!"
+        "spins": [{"prize": r["label"], "value": r["value"]} for r in rewards],
+        "total_value": total_won,
+        "new_balance": balance,
+        "message": f"¡Ganaste {reward['label']}!" if count == 1 else f"¡Ganaste {total_won} granos en {count} tiradas!"
     }
 
 # TIENDA:
 class PurchaseRequest(BaseModel):
     item_id: str
-    price: int
-    name: str
+    # price y name se siguen aceptando por compatibilidad pero se ignoran, mandan los del catalogo
+    price: Optional[int] = None
+    name: Optional[str] = None
+
+class CartLine(BaseModel):
+    item_id: str
+    quantity: int = Field(default=1, ge=1, le=99)
+
+class CartPurchase(BaseModel):
+    items: List[CartLine] = Field(min_length=1, max_length=50)
+
+#ENDPOINT: CATALOGO
+@router.get("/catalog", response_model=CatalogOut)
+async def get_catalog():
+    """
+    Items de la tienda con su precio. version cambia cada vez que cambia el catalogo.
+    El JSON se genera una vez al cargar el catalogo, aqui solo se envia.
+    """
+    return Response(catalog.json, media_type="application/json")
 
-@router.post("/buy")
-def buy_item(
+@router.post("/buy", response_model=PurchaseOut)
+async def buy_item(
     item: PurchaseRequest,
-    session: Session = Depends(get_session),
+    session: AnySession = Depends(get_write_db),
     current_user: User = Depends(get_current_user)
 ):
     """
     Cuando se compra un item se resta puntos y lo guarda en el inventario
     """
-    #Verificando el saldo
-    if current_user.current_points < item.price:
-        raise HTTPException(status_code=400, detail="Te faltan granos de café 💸")
+    catalog_item = catalog.get(item.item_id)
+    if catalog_item is None:
+        raise HTTPException(status_code=404, detail="Ese item no existe en la tienda")
 
-    # Verificar si ya tiene el item (para sumar cantidad en vez de duplicar fila)
-    statement = select(UserItem).where(
-        UserItem.user_id == current_user.id, 
-        UserItem.item_id == item.item_id
-    )
-    existing_item = session.exec(statement).first()
-
-    if existing_item:
-        existing_item.quantity += 1
-        session.add(existing_item)
-    else:
-        # Registor en el inventario
-        new_item = UserItem(
-            user_id=current_user.id,
-            item_id=item.item_id,
-            item_name=item.name,
-            quantity=1
-        )
-        session.add(new_item)
-
-    # 3. Cobrar el precio del item
-    current_user.current_points -= item.price
-    session.add(current_user)
-    
-    session.commit()
-    
+    result = await run_write(session, _purchase, current_user.id, {item.item_id: 1})
     return {
         "success": True, 
-        "new_balance": current_user.current_points,
-        "message": f"¡Compraste {item.name}!",
-        "inventory_updated": True
+        "new_balance": result["new_balance"],
+        "message": f"¡Compraste {catalog_item['name']}!",
+        "inventory_updated": True,
+        "catalog_version": catalog.version,
     }
 
+#ENDPOINT: COMPRAR VARIOS ITEMS (CARRITO)
+@router.post("/buy-cart", response_model=CartPurchaseOut)
+async def buy_cart(
+    cart: CartPurchase,
+    session: AnySession = Depends(get_write_db),
+    current_user: User = Depends(get_current_user)
+):
+    """
+    Compra varios items de una vez: un solo cobro y un solo commit.
+    Si no alcanza para todo no se compra nada.
+    """
+    quantities = {}
+    for line in cart.items:
+        if catalog.get(line.item_id) is None:
+            raise HTTPException(status_code=404, detail=f"El item {line.item_id} no existe en la tienda")
+        # el mismo item repetido en el carrito se junta en una linea
+        quantities[line.item_id] = quantities.get(line.item_id, 0) + line.quantity
+
+    result = await run_write(session, _purchase, current_user.id, quantities)
+    return {
+        "success": True,
+        "total_price": result["total_price"],
+        "new_balance": result["new_balance"],
+        "items": [{"item_id": item_id, "quantity": qty} for item_id, qty in quantities.items()],
+        "message": "¡Compra realizada!",
+        "inventory_updated": True,
+        "catalog_version": catalog.version,
+    }
+
+def _purchase(session: Session, user_id: int, quantities: Dict[str, int]):
+    """
+    Cobro atomico + upsert del inventario en la misma transaccion.
+    quantities: item_id -> cantidad, los precios se leen del catalogo.
+    Funcion de escritura (writer.py): no hace commit.
+    """
+    current_user = session.get(User, user_id)
+    total_price = sum(catalog.get(item_id)["price"] * qty for item_id, qty in quantities.items())
+
+    #Cobrar el precio de forma atomica (solo si hay saldo)
+    balance = debit_points(session, user_id, total_price)
+    if balance is None:
+        raise HTTPException(status_code=400, detail="Te faltan granos de café 💸")
+
+    # Registro en el inventario: INSERT ... ON CONFLICT (user_id, item_id) DO UPDATE quantity + n
+    stmt = dialect_insert(session, UserItem).values([
+        {
+            "user_id": user_id,
+            "item_id": item_id,
+            "item_name": catalog.get(item_id)["name"],
+            "quantity": qty,
+            "acquired_at": datetime.utcnow(),
+        }
+        for item_id, qty in quantities.items()
+    ])
+    stmt = stmt.on_conflict_do_update(
+        index_elements=["user_id", "item_id"],
+        set_={"quantity": UserItem.quantity + stmt.excluded.quantity},
+    ).returning(UserItem.item_id, UserItem.quantity)
+    # cantidades finales de cada item, para el evento de inventario
+    inventory = [{"item_id": item_id, "quantity": qty} for item_id, qty in session.exec(stmt)]
+
+    after_commit(session, auth_cache.invalidate_user, current_user.email)
+    after_commit(
+        session, leaderboards.update, user_id, current_user.full_name, current_user.career,
+        balance, current_user.current_streak_days,
+    )
+    after_commit(session, events.publish, current_user.email, "purchase", {
+        "balance": balance,
+        "items": inventory,
+    })
+
+    return {"total_price": total_price, "new_balance": balance}
+
 #ENDPOINT: CONSULTAR INVENTARIO:
-@router.get("/inventory")
-def get_my_inventory(
-    session: Session = Depends(get_session),
+@router.get("/inventory", response_model=List[InventoryItemOut])
+async def get_my_inventory(
+    session: AnySession = Depends(get_read_db),
     current_user: User = Depends(get_current_user)
 ):
     """
     Devuelve la lista de cosas que el usuario ha comprado.
     """
-    statement = select(UserItem).where(UserItem.user_id == current_user.id)
-    items = session.exec(statement).all()
-    return items
\ No newline at end of file
+    return await run_db(session, inventory_items, current_user.id)
+
+# Solo las columnas que se devuelven (InventoryItemOut), sin construir objetos UserItem
+INVENTORY_COLUMNS = (UserItem.id, UserItem.item_id, UserItem.item_name, UserItem.quantity, UserItem.acquired_at)
+
+def inventory_items(session: Session, user_id: int):
+    """Inventario del usuario como filas; tambien lo usa /users/bootstrap"""
+    statement = select(*INVENTORY_COLUMNS).where(UserItem.user_id == user_id)
+    return session.exec(statement).all()
\ No newline at end of file
@@ -0,0 +1,169 @@
+from datetime import datetime
+from typing import List, Optional
+from fastapi import APIRouter, Depends, HTTPException, Query, Response, status
+from sqlmodel import Session, select
+from sqlalchemy import func
+from pydantic import BaseModel, Field, field_validator
+from database import get_read_db, get_write_db, run_db, AnySession
+from models import User, Goal, GoalWeeklyProgress, Session as SessionModel
+from schemas import GoalOut, GoalsProgressOut
+from routers.auth import get_current_user
+from config import settings
+from goals import goals_progress
+
+router = APIRouter(prefix="/goals", tags=["goals"])
+
+# Esquemas Pydantic
+class GoalCreate(BaseModel):
+    title: str = Field(min_length=1, max_length=120)
+    description: Optional[str] = None
+    target_minutes_week: int = Field(120, gt=0, le=7 * 24 * 60)
+
+class GoalUpdate(BaseModel):
+    title: Optional[str] = Field(None, min_length=1, max_length=120)
+    description: Optional[str] = None
+    target_minutes_week: Optional[int] = Field(None, gt=0, le=7 * 24 * 60)
+    is_active: Optional[bool] = None
+
+    # se pueden omitir pero no mandar a null: son columnas NOT NULL (solo description admite null)
+    @field_validator("title", "target_minutes_week", "is_active")
+    @classmethod
+    def _not_null(cls, value):
+        if value is None:
+            raise ValueError("no puede ser null")
+        return value
+
+
+def _get_goal(session: Session, user_id: int, goal_id: int) -> Goal:
+    """La meta si es del usuario, si no 404 (no se distingue de una que no existe)"""
+    goal = session.get(Goal, goal_id)
+    if goal is None or goal.user_id != user_id:
+        raise HTTPException(status_code=404, detail="Meta no encontrada")
+    return goal
+
+
+def _check_active_limit(session: Session, user_id: int):
+    active = session.exec(
+        select(func.count()).select_from(Goal).where(Goal.user_id == user_id).where(Goal.is_active == True)
+    ).one()
+    if active >= settings.GOALS_MAX_ACTIVE:
+        raise HTTPException(
+            status_code=400, detail=f"Solo puedes tener {settings.GOALS_MAX_ACTIVE} metas activas a la vez"
+        )
+
+
+#ENDPOINT: CREAR META
+@router.post("/", status_code=status.HTTP_201_CREATED, response_model=GoalOut)
+async def create_goal(
+    data: GoalCreate,
+    session: AnySession = Depends(get_write_db),
+    current_user: User = Depends(get_current_user)
+):
+    """Crea una meta semanal, su progreso empieza a contar con la siguiente sesión"""
+    return await run_db(session, _create_goal, current_user.id, data)
+
+def _create_goal(session: Session, user_id: int, data: GoalCreate):
+    _check_active_limit(session, user_id)
+    goal = Goal(user_id=user_id, **data.model_dump())
+    session.add(goal)
+    session.commit()
+    session.refresh(goal)
+    return goal
+
+
+#ENDPOINT: LISTAR METAS
+@router.get("/", response_model=List[GoalOut])
+async def list_goals(
+    include_inactive: bool = False,
+    session: AnySession = Depends(get_read_db),
+    current_user: User = Depends(get_current_user)
+):
+    return await run_db(session, _list_goals, current_user.id, include_inactive)
+
+def _list_goals(session: Session, user_id: int, include_inactive: bool):
+    # columnas de GoalOut, sin construir objetos Goal
+    statement = (
+        select(Goal.id, Goal.title, Goal.description, Goal.target_minutes_week, Goal.is_active, Goal.created_at)
+        .where(Goal.user_id == user_id)
+        .order_by(Goal.created_at, Goal.id)
+    )
+    if not include_inactive:
+        statement = statement.where(Goal.is_active == True)
+    return session.exec(statement).all()
+
+
+#ENDPOINT: PROGRESO DE TODAS LAS METAS
+# va antes de /{goal_id} para que "progress" no se lea como un id
+@router.get("/progress", response_model=GoalsProgressOut)
+async def get_goals_progress(
+    include_inactive: bool = False,
+    session: AnySession = Depends(get_read_db),
+    current_user: User = Depends(get_current_user)
+):
+    """
+    Minutos de esta semana contra el objetivo de cada meta, en una sola consulta.
+    - sale de los acumulados semanales, no de las sesiones, asi que no crece con el historial
+    - percent va de 0 a 100 y completed indica si ya se llego al objetivo
+    """
+    today = datetime.utcnow().date()
+    return {
+        "goals": await run_db(session, goals_progress, current_user.id, today, include_inactive),
+    }
+
+
+#ENDPOINT: UNA META
+@router.get("/{goal_id}", response_model=GoalOut)
+async def get_goal(
+    goal_id: int,
+    session: AnySession = Depends(get_read_db),
+    current_user: User = Depends(get_current_user)
+):
+    return await run_db(session, _get_goal, current_user.id, goal_id)
+
+
+#ENDPOINT: EDITAR META
+@router.patch("/{goal_id}", response_model=GoalOut)
+async def update_goal(
+    goal_id: int,
+    data: GoalUpdate,
+    session: AnySession = Depends(get_write_db),
+    current_user: User = Depends(get_current_user)
+):
+    """Cambia solo los campos enviados; con is_active=false deja de sumar minutos"""
+    return await run_db(session, _update_goal, current_user.id, goal_id, data)
+
+def _update_goal(session: Session, user_id: int, goal_id: int, data: GoalUpdate):
+    goal = _get_goal(session, user_id, goal_id)
+    changes = data.model_dump(exclude_unset=True)
+    if changes.get("is_active") and not goal.is_active:
+        _check_active_limit(session, user_id)
+    for field, value in changes.items():
+        setattr(goal, field, value)
+    session.add(goal)
+    session.commit()
+    session.refresh(goal)
+    return goal
+
+
+#ENDPOINT: BORRAR META
+@router.delete("/{goal_id}", status_code=status.HTTP_204_NO_CONTENT)
+async def delete_goal(
+    goal_id: int,
+    session: AnySession = Depends(get_write_db),
+    current_user: User = Depends(get_current_user)
+):
+    """Borra la meta y su progreso; las sesiones se quedan, solo pierden el enlace a la meta"""
+    await run_db(session, _delete_goal, current_user.id, goal_id)
+    return Response(status_code=status.HTTP_204_NO_CONTENT)
+
+def _delete_goal(session: Session, user_id: int, goal_id: int):
+    goal = _get_goal(session, user_id, goal_id)
+    session.exec(
+        SessionModel.__table__.update()
+        .where(SessionModel.user_id == user_id)
+        .where(SessionModel.goal_id == goal_id)
+        .values(goal_id=None)
+    )
+    session.exec(GoalWeeklyProgress.__table__.delete().where(GoalWeeklyProgress.goal_id == goal_id))
+    session.delete(goal)
+    session.commit()
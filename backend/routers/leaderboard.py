@@ -0,0 +1,47 @@
+from typing import Literal
+from fastapi import APIRouter, Depends, Query
+from models import User
+from schemas import LeaderboardMeOut, LeaderboardTopOut
+from routers.auth import get_current_user
+from leaderboard import leaderboards
+
+router = APIRouter(prefix="/leaderboard", tags=["leaderboard"])
+
+# board: points (granos actuales), streak (dias de racha), weekly (granos ganados esta semana)
+# scope: global o solo la carrera del usuario
+
+
+#ENDPOINT: TOP N
+@router.get("/top", response_model=LeaderboardTopOut)
+async def get_top(
+    board: Literal["points", "streak", "weekly"] = "points",
+    scope: Literal["global", "career"] = "global",
+    limit: int = Query(10, ge=1, le=100),
+    current_user: User = Depends(get_current_user)
+):
+    """
+    Los primeros de la clasificacion, se lee de memoria sin tocar la DB.
+    """
+    career = current_user.career if scope == "career" else None
+    return {
+        "board": board,
+        "scope": scope,
+        "entries": leaderboards.top(board, career, limit),
+    }
+
+
+#ENDPOINT: MI POSICION
+@router.get("/me", response_model=LeaderboardMeOut)
+async def get_my_rank(
+    board: Literal["points", "streak", "weekly"] = "points",
+    scope: Literal["global", "career"] = "global",
+    radius: int = Query(2, ge=0, le=10),
+    current_user: User = Depends(get_current_user)
+):
+    """
+    Posicion del usuario en la clasificacion y los que tiene justo arriba y abajo.
+    """
+    career = current_user.career if scope == "career" else None
+    result = leaderboards.around(board, current_user.id, career, radius)
+    result.update({"board": board, "scope": scope})
+    return result
@@ -0,0 +1,107 @@
+import hmac
+
+from fastapi import APIRouter, Depends, HTTPException, Request, status
+from fastapi.responses import PlainTextResponse
+
+import analytics
+import auth_cache
+import metrics
+from config import settings
+from database import engine, read_engine, async_engine, async_read_engine
+from password_pool import pool as password_pool
+from writer import writer
+from events import bus as event_bus
+
+router = APIRouter(tags=["metrics"])
+
+# Caches en memoria que se exponen con sus aciertos y fallos
+CACHES = {
+    "auth_tokens": auth_cache.token_cache,
+    "auth_users": auth_cache.user_cache,
+    "analytics": analytics.analytics_cache,
+}
+
+
+def _cache_stats():
+    return [(name, cache.stats()) for name, cache in CACHES.items()]
+
+
+@metrics.collector("focus_cache_hits_total", "counter", "Aciertos de cada cache en memoria", ("cache",))
+def _cache_hits():
+    return [((name,), stats["hits"]) for name, stats in _cache_stats()]
+
+
+@metrics.collector("focus_cache_misses_total", "counter", "Fallos de cada cache en memoria", ("cache",))
+def _cache_misses():
+    return [((name,), stats["misses"]) for name, stats in _cache_stats()]
+
+
+@metrics.collector("focus_cache_hit_ratio", "gauge", "Proporcion de aciertos desde el arranque", ("cache",))
+def _cache_hit_ratio():
+    return [((name,), stats["hit_ratio"]) for name, stats in _cache_stats()]
+
+
+@metrics.collector("focus_cache_entries", "gauge", "Entradas guardadas en cada cache", ("cache",))
+def _cache_entries():
+    return [((name,), stats["size"]) for name, stats in _cache_stats()]
+
+
+@metrics.collector("focus_password_hash_in_flight", "gauge", "Operaciones de bcrypt en el pool o en su cola")
+def _password_in_flight():
+    return [((), password_pool.in_flight)]
+
+
+@metrics.collector("focus_password_hash_rejected_total", "counter", "Operaciones de bcrypt rechazadas por cola llena")
+def _password_rejected():
+    return [((), password_pool.rejected)]
+
+
+@metrics.collector("focus_db_pool_checked_out", "gauge", "Conexiones del pool en uso", ("engine",))
+def _pool_checked_out():
+    engines = {
+        "write": engine,
+        "read": read_engine if read_engine is not engine else None,
+        "async_write": async_engine.sync_engine if async_engine is not None else None,
+        "async_read": async_read_engine.sync_engine
+        if async_read_engine is not None and async_read_engine is not async_engine else None,
+    }
+    return [
+        ((name,), current.pool.checkedout())
+        for name, current in engines.items()
+        if current is not None and hasattr(current.pool, "checkedout")
+    ]
+
+
+@metrics.collector("focus_group_commit_queued", "gauge", "Escrituras esperando al escritor agrupado")
+def _group_commit_queued():
+    return [((), writer.stats()["queued"])]
+
+
+@metrics.collector("focus_event_streams", "gauge", "Conexiones abiertas a /events (SSE y WebSocket)")
+def _event_streams():
+    return [((), event_bus.connections)]
+
+
+@metrics.collector("focus_events_published_total", "counter", "Eventos publicados despues de un commit")
+def _events_published():
+    return [((), event_bus.published)]
+
+
+def _check_token(request: Request):
+    if not settings.METRICS_TOKEN:
+        return
+    header = request.headers.get("authorization", "")
+    if not hmac.compare_digest(header.encode(), f"Bearer {settings.METRICS_TOKEN}".encode()):
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Token de metricas invalido",
+            headers={"WWW-Authenticate": "Bearer"},
+        )
+
+
+#ENDPOINT: METRICAS EN FORMATO PROMETHEUS
+@router.get(
+    "/metrics", response_class=PlainTextResponse, include_in_schema=False, dependencies=[Depends(_check_token)]
+)
+async def get_metrics():
+    return PlainTextResponse(metrics.registry.render(), media_type="text/plain; version=0.0.4")
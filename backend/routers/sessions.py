@@ -1,10 +1,24 @@
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, Query, status
 from sqlmodel import Session, select
-from datetime import datetime, timedelta
-from pydantic import BaseModel
-from database import get_session
-from models import User, Session as SessionModel 
+from datetime import datetime, timedelta, timezone
+from typing import List, Literal, Optional
+from fastapi.responses import StreamingResponse
+from pydantic import BaseModel, Field
+from sqlalchemy.exc import IntegrityError
+from database import get_read_db, get_write_db, run_db, AnySession
+from models import User, Goal, Session as SessionModel 
+from schemas import AnalyticsOut, HistoryPageOut, SessionBatchOut, SessionCompleteOut, WeeklyStatsOut
 from routers.auth import get_current_user
+import auth_cache
+import analytics
+import events
+import history
+from leaderboard import leaderboards
+from wallet import credit_points
+from config import settings
+from writer import run_write, after_commit
+from goals import record_goal_minutes, week_start
+from activity import record_activity, apply_streak, apply_streak_days, weekly_stats, POINTS_PER_MINUTE, FIRST_SESSION_OF_DAY_BONUS
 
 router = APIRouter(prefix="/sessions", tags=["sessions"])
 
@@ -12,12 +26,24 @@ router = APIRouter(prefix="/sessions", tags=["sessions"])
 class SessionCompleted(BaseModel):
     duration_minutes: int
     label: str = "Estudio"
+    goal_id: Optional[int] = None  # sin meta cuenta para todas las metas activas
+
+# una sesión hecha sin conexion, con su hora real y una clave unica del cliente
+class OfflineSession(BaseModel):
+    idempotency_key: str = Field(min_length=1, max_length=64)
+    duration_minutes: int = Field(gt=0)
+    started_at: datetime
+    label: str = "Estudio"
+    goal_id: Optional[int] = None
+
+class SessionBatch(BaseModel):
+    sessions: List[OfflineSession] = Field(min_length=1, max_length=settings.BATCH_MAX_SESSIONS)
 
 
 #ENDPOINT: ESTADÍSTICAS SEMANALES
-@router.get("/weekly-stats")
-def get_weekly_stats(
-    session: Session = Depends(get_session),
+@router.get("/weekly-stats", response_model=WeeklyStatsOut)
+async def get_weekly_stats(
+    session: AnySession = Depends(get_read_db),
     current_user: User = Depends(get_current_user)
 ):
     """
@@ -27,57 +53,97 @@ def get_weekly_stats(
     - current_day_index es el índice del día actual (0=Lunes, 6=Domingo)
     - se usa para mostrar la barra de progreso de manera real consultando la bd
     """
-    today = datetime.utcnow().date()
-    
-    #se calcula el lunes de la semana en curso
-    days_since_monday = today.weekday()
-    monday = today - timedelta(days=days_since_monday)
-    
-    #aca se obtienen todas las sesiones completadas de la semana
-    week_sessions = session.exec(
-        select(SessionModel)
-        .where(SessionModel.user_id == current_user.id)
-        .where(SessionModel.completed == True)
-        .where(SessionModel.started_at >= datetime.combine(monday, datetime.min.time()))
-    ).all()
-    
-    #set de dias con sesiones 
-    days_with_sessions_set = set()
-    for s in week_sessions:
-        session_date = s.started_at.date()
-        # se convierte a 0-6 (Lunes=0, Domingo=6)
-        day_index = (session_date - monday).days
-        if 0 <= day_index <= 6:
-            days_with_sessions_set.add(day_index)
-    
-    # diariamente se crea un breakdown
-    daily_breakdown = []
-    for i in range(7):
-        daily_breakdown.append({
-            "day_index": i,
-            "completed": i in days_with_sessions_set
-        })
-    
-    return {
-        "days_with_sessions": len(days_with_sessions_set),
-        "daily_breakdown": daily_breakdown,
-        "current_day_index": today.weekday() 
-    }
+    return await run_db(session, weekly_stats, current_user.id)
+
+
+#ENDPOINT: ESTADÍSTICAS DE LARGO PLAZO
+@router.get("/analytics", response_model=AnalyticsOut)
+async def get_analytics(
+    range_name: Literal["week", "month", "year"] = Query("month", alias="range"),
+    session: AnySession = Depends(get_read_db),
+    current_user: User = Depends(get_current_user)
+):
+    """
+    Estadísticas de los ultimos 7, 30 o 365 dias para los heatmaps.
+    - heatmap trae solo los dias con actividad: {day, sessions, minutes}
+    - completion_ratio y abandon_reasons salen de las sesiones abandonadas
+    - se guarda en cache por usuario y rango hasta que complete otra sesión
+    """
+    result = analytics.get_cached(current_user.id, range_name)
+    if result is None:
+        result = await run_db(session, analytics.compute, current_user.id, range_name)
+    return result
+
+
+#ENDPOINT: HISTORIAL DE SESIONES
+@router.get("/history", response_model=HistoryPageOut)
+async def get_history(
+    limit: int = Query(20, ge=1, le=settings.HISTORY_MAX_PAGE_SIZE),
+    cursor: Optional[str] = None,
+    session: AnySession = Depends(get_read_db),
+    current_user: User = Depends(get_current_user)
+):
+    """
+    Historial de sesiones, de la mas reciente a la mas antigua.
+    Para la siguiente pagina se envia el next_cursor recibido (null = no hay mas).
+    """
+    try:
+        return await run_db(session, history.get_history_page, current_user.id, limit, cursor)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Cursor no valido")
+
+
+#ENDPOINT: EXPORTAR HISTORIAL
+@router.get("/export")
+async def export_history(
+    format: Literal["ndjson", "csv"] = "ndjson",
+    current_user: User = Depends(get_current_user)
+):
+    """
+    Descarga todo el historial en NDJSON o CSV.
+    Se envia en streaming por lotes, la memoria no crece con el numero de sesiones.
+    """
+    if settings.DB_ASYNC:
+        rows = history.export_rows_async(current_user.id, format)
+    else:
+        rows = history.export_rows(current_user.id, format)
+
+    media_type = "text/csv" if format == "csv" else "application/x-ndjson"
+    return StreamingResponse(
+        rows,
+        media_type=media_type,
+        headers={"Content-Disposition": f'attachment; filename="sesiones.{format}"'},
+    )
 
 
 #ENDPOINT: COMPLETAR SESION
-@router.post("/complete")
-def complete_session(
+@router.post("/complete", response_model=SessionCompleteOut)
+async def complete_session(
     data: SessionCompleted, 
-    session: Session = Depends(get_session),
+    session: AnySession = Depends(get_write_db),
     current_user: User = Depends(get_current_user)
 ):
     """
     Marca una sesión como completada y da puntos.
     Regla: 10 puntos por cada minuto estudiado (por ahora para el mvp).
     """
+    return await run_write(session, _complete_session, current_user.id, data)
+
+def _complete_session(session: Session, user_id: int, data: SessionCompleted):
+    """Funcion de escritura (writer.py): no hace commit, puede ir agrupada con otras"""
+    # get_current_user leyo por el motor de lectura, aqui se lee la fila en la transaccion de escritura
+    current_user = session.get(User, user_id)
+
+    today = datetime.utcnow().date()
+
+    # acumulado semanal de las metas (un upsert, no depende de cuantas sesiones haya)
+    # va antes de guardar la sesión: si la meta no es valida no se escribe nada
+    goals_updated = record_goal_minutes(session, user_id, today, data.duration_minutes, goal_id=data.goal_id)
+    if data.goal_id is not None and not goals_updated:
+        raise HTTPException(status_code=404, detail="Meta no encontrada o inactiva")
+
     #Calcular puntos
-    points_earned = data.duration_minutes * 10
+    points_earned = data.duration_minutes * POINTS_PER_MINUTE
     
     #Guardar el registro de la sesión
     new_session = SessionModel(
@@ -86,46 +152,183 @@ def complete_session(
         started_at=datetime.utcnow(), # Simplificado ya que se asume que empezó ahora
         ended_at=datetime.utcnow(),
         completed=True,
-        abandon_reason=None
+        abandon_reason=None,
+        goal_id=data.goal_id,
     )
     session.add(new_session)
     
     #LÓGICA DE RACHA
-    today = datetime.utcnow().date()
-    last_date = current_user.last_streak_date.date() if current_user.last_streak_date else None
     # Esta es una bandera para el Frontend
-    first_session_of_day = False 
-
-    if last_date != today:
-        # en caso de que no haya hecho ya una sesion hoy
-        first_session_of_day = True
-        
-        if last_date == today - timedelta(days=1):
-            # En caso de que haya estudiado ayer se continua racha
-            current_user.current_streak_days += 1
-        elif last_date is None:
-            # Nunca había estudiado entonces empieza racha
-            current_user.current_streak_days = 1
-        else:
-            # Si se saltó días entonces reinicio 
-            current_user.current_streak_days = 1
-            
-        # Se actualiza la fecha de última racha al dia en curso
-        current_user.last_streak_date = datetime.utcnow()
-        
+    first_session_of_day = apply_streak(current_user, today, datetime.utcnow())
+
+    if first_session_of_day:
         # Bonus, se da puntos extra por mantener racha
-        points_earned += 50 
+        points_earned += FIRST_SESSION_OF_DAY_BONUS
+    
+    # resumen diario en la misma transaccion
+    record_activity(session, current_user.id, today, data.duration_minutes, points_earned)
     
-    # actualiza puntos del usuario
-    current_user.current_points += points_earned
+    # actualiza puntos del usuario (UPDATE atomico, la racha va por el ORM)
     session.add(current_user)
-    session.commit()
-    session.refresh(current_user)
+    balance = credit_points(session, current_user.id, points_earned)
+
+    # el saldo sale del RETURNING, no hace falta refresh despues del commit
+    after_commit(session, auth_cache.invalidate_user, current_user.email)
+    after_commit(session, analytics.invalidate, user_id)
+    after_commit(
+        session, leaderboards.update, user_id, current_user.full_name, current_user.career,
+        balance, current_user.current_streak_days, points_earned,
+    )
+    # al frontend por /events: lo que cambio en el dashboard, sin volver a consultar
+    after_commit(session, events.publish, current_user.email, "session", {
+        "balance": balance,
+        "points_earned": points_earned,
+        "streak": current_user.current_streak_days,
+        "first_session_of_day": first_session_of_day,
+        "day_index": today.weekday(),  # este dia pasa a completed en weekly-stats
+        "minutes": data.duration_minutes,
+        "goal_id": data.goal_id,
+    })
     
     return {
         "message": "Sesión guardada",
         "points_earned": points_earned,
-        "new_total_points": current_user.current_points,
+        "new_total_points": balance,
         "streak": current_user.current_streak_days,
         "first_session_of_day": first_session_of_day
-    }
\ No newline at end of file
+    }
+
+
+#ENDPOINT: COMPLETAR VARIAS SESIONES (CLIENTES QUE ESTUVIERON SIN CONEXION)
+@router.post("/complete-batch", response_model=SessionBatchOut)
+async def complete_session_batch(
+    batch: SessionBatch,
+    session: AnySession = Depends(get_write_db),
+    current_user: User = Depends(get_current_user)
+):
+    """
+    Guarda varias sesiones de una vez, en una sola transaccion.
+    - cada sesión trae una idempotency_key, si ya se recibio antes se ignora
+    - la racha y los puntos se calculan en orden de started_at con las mismas reglas que /complete
+    """
+    now = datetime.utcnow()
+    for item in batch.sessions:
+        # se guarda todo en UTC sin zona, igual que el resto de fechas
+        if item.started_at.tzinfo is not None:
+            item.started_at = item.started_at.astimezone(timezone.utc).replace(tzinfo=None)
+        if item.started_at > now + timedelta(minutes=5):
+            raise HTTPException(status_code=400, detail="Hay sesiones con fecha en el futuro")
+
+    try:
+        return await run_write(session, _complete_batch, current_user.id, batch.sessions)
+    except IntegrityError:
+        # otra peticion con las mismas claves gano la carrera, se reintenta y saldran como repetidas
+        return await run_write(session, _complete_batch, current_user.id, batch.sessions)
+
+def _complete_batch(session: Session, user_id: int, items: List[OfflineSession]):
+    current_user = session.get(User, user_id)
+
+    # claves que ya se habian guardado antes (o repetidas dentro del lote)
+    keys = {item.idempotency_key for item in items}
+    seen = set(session.exec(
+        select(SessionModel.client_key)
+        .where(SessionModel.user_id == user_id)
+        .where(SessionModel.client_key.in_(keys))
+    ).all())
+
+    new_items = []
+    earned = {}  # id(item) -> puntos, solo para las sesiones nuevas
+    for item in sorted(items, key=lambda i: i.started_at):
+        if item.idempotency_key in seen:
+            continue
+        seen.add(item.idempotency_key)
+        new_items.append(item)
+
+    # metas del lote que son del usuario y siguen activas, las demas se guardan sin meta
+    goal_ids = {item.goal_id for item in new_items if item.goal_id is not None}
+    valid_goals = set(session.exec(
+        select(Goal.id)
+        .where(Goal.user_id == user_id)
+        .where(Goal.is_active == True)
+        .where(Goal.id.in_(goal_ids))
+    ).all()) if goal_ids else set()
+
+    # dia -> hora de su ultima sesión (van ordenadas); la racha sale de estos dias y los que ya tenia.
+    # Devuelve los dias del lote que ya tenian actividad (para no dar dos veces el bonus del dia)
+    batch_days = {item.started_at.date(): item.started_at for item in new_items}
+    days_done = apply_streak_days(session, current_user, batch_days, datetime.utcnow().date())
+
+    total_points = 0
+    per_day = {}  # dia -> [sesiones, minutos, puntos]
+    per_goal_week = {}  # (meta, lunes) -> [sesiones, minutos]
+    for item in new_items:
+        day = item.started_at.date()
+        points_earned = item.duration_minutes * POINTS_PER_MINUTE
+
+        if day not in days_done:
+            days_done.add(day)
+            points_earned += FIRST_SESSION_OF_DAY_BONUS
+
+        session.add(SessionModel(
+            user_id=user_id,
+            intended_minutes=item.duration_minutes,
+            started_at=item.started_at,
+            ended_at=item.started_at + timedelta(minutes=item.duration_minutes),
+            completed=True,
+            client_key=item.idempotency_key,
+            goal_id=item.goal_id if item.goal_id in valid_goals else None,
+        ))
+
+        totals = per_day.setdefault(day, [0, 0, 0])
+        totals[0] += 1
+        totals[1] += item.duration_minutes
+        totals[2] += points_earned
+        total_points += points_earned
+        earned[id(item)] = points_earned
+
+        goal_totals = per_goal_week.setdefault(
+            (item.goal_id if item.goal_id in valid_goals else None, week_start(day)), [0, 0]
+        )
+        goal_totals[0] += 1
+        goal_totals[1] += item.duration_minutes
+
+    # un upsert del resumen por dia, no por sesion
+    for day, (count, minutes, points) in per_day.items():
+        record_activity(session, user_id, day, minutes, points, sessions=count)
+    # y uno por meta y semana
+    for (goal_id, week), (count, minutes) in per_goal_week.items():
+        record_goal_minutes(session, user_id, week, minutes, sessions=count, goal_id=goal_id)
+
+    # el commit lo hace run_write (o el lote del escritor agrupado); el saldo sale del RETURNING
+    session.add(current_user)
+    if total_points:
+        credit_points(session, user_id, total_points)
+
+    if new_items:
+        after_commit(session, auth_cache.invalidate_user, current_user.email)
+        after_commit(session, analytics.invalidate, user_id)
+        # a la tabla semanal solo suman las sesiones de esta semana
+        this_week = week_start(datetime.utcnow().date())
+        after_commit(
+            session, leaderboards.update, user_id, current_user.full_name, current_user.career,
+            current_user.current_points, current_user.current_streak_days,
+            sum(points for day, (_, _, points) in per_day.items() if day >= this_week),
+        )
+
+    return {
+        "message": "Sesiones sincronizadas",
+        "created": len(new_items),
+        "duplicates": len(items) - len(new_items),
+        "points_earned": total_points,
+        "new_total_points": current_user.current_points,
+        "streak": current_user.current_streak_days,
+        # en el mismo orden en que las envio el cliente
+        "results": [
+            {
+                "idempotency_key": item.idempotency_key,
+                "status": "created" if id(item) in earned else "duplicate",
+                "points_earned": earned.get(id(item), 0),
+            }
+            for item in items
+        ],
+    }
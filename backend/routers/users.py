@@ -1,10 +1,18 @@
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, Header, HTTPException, Response, status
 from sqlmodel import Session, select
 from pydantic import BaseModel
-from database import get_session
+from typing import Optional
+from database import get_read_db, get_fresh_read_db, get_write_db, run_db, AnySession
 from models import User, Profile
-from routers.auth import get_current_user 
-from datetime import datetime, timedelta
+from routers.auth import get_current_user, get_token_email, credentials_exception
+from routers.gamification import inventory_items
+from schemas import BootstrapOut, ProfileOut, WeeklyReviewOut
+from activity import weekly_stats
+import auth_cache
+import events
+from writer import run_write, after_commit
+from datetime import datetime, timedelta, timezone
+import time
 
 router = APIRouter(prefix="/users", tags=["users"])
 
@@ -21,41 +29,43 @@ class PlanUpdate(BaseModel):
 
 #ENDPOINT: GUARDAR DIAGNÓSTICO
 @router.post("/onboarding")
-def save_onboarding(
+async def save_onboarding(
     data: OnboardingData, 
-    session: Session = Depends(get_session),
+    session: AnySession = Depends(get_write_db),
     current_user: User = Depends(get_current_user)
 ):
     """
     Guarda o actualiza el perfil motivacional del usuario tras completar el quiz de onboarding
     """
+    return await run_write(session, _save_onboarding, current_user.id, current_user.email, data)
+
+def _save_onboarding(session: Session, user_id: int, email: str, data: OnboardingData):
+    """Funcion de escritura (writer.py): sin commit, la cache se invalida despues del commit"""
     #verifica si ya existe un perfil para este usuario
-    statement = select(Profile).where(Profile.user_id == current_user.id)
+    statement = select(Profile).where(Profile.user_id == user_id)
     existing_profile = session.exec(statement).first()
     
     #Si existe se actualiza con el fin de evitar errores
     if existing_profile:
         existing_profile.archetype = data.archetype
         session.add(existing_profile)
-        session.commit()
-        session.refresh(existing_profile)
+        after_commit(session, auth_cache.invalidate_user, email)
         return {"message": "Perfil actualizado correctamente", "archetype": data.archetype}
 
     #Si no existe entonces se crea uno nuevo
     new_profile = Profile(
-        user_id=current_user.id,
+        user_id=user_id,
         archetype=data.archetype,
     )
     session.add(new_profile)
-    session.commit()
-    session.refresh(new_profile)
-    
+    after_commit(session, auth_cache.invalidate_user, email)
+
     return {"message": "Perfil creado exitosamente", "archetype": data.archetype}
 
 #ENDPOINT: CONSULTAR MI PERFIL
-@router.get("/my-profile")
-def get_my_profile(
-    session: Session = Depends(get_session),
+@router.get("/my-profile", response_model=ProfileOut)
+async def get_my_profile(
+    session: AnySession = Depends(get_read_db),
     current_user: User = Depends(get_current_user)
 ):
     """
@@ -63,8 +73,7 @@ def get_my_profile(
     Si devuelve 404 -> Usuario Nuevo -> Ir al Quiz.
     Si devuelve 200 -> Usuario Viejo -> Ir al Dashboard.
     """
-    statement = select(Profile).where(Profile.user_id == current_user.id)
-    profile = session.exec(statement).first()
+    profile = await run_db(session, _get_profile_view, current_user.id)
     
     if not profile:
         #lanza un error 404 a propósito. 
@@ -73,43 +82,50 @@ def get_my_profile(
         
     return profile
 
+def _get_profile(session: Session, user_id: int):
+    statement = select(Profile).where(Profile.user_id == user_id)
+    return session.exec(statement).first()
+
+def _get_profile_view(session: Session, user_id: int):
+    # solo lectura: las columnas de ProfileOut, sin cargar la entidad
+    statement = select(Profile.archetype, Profile.bio).where(Profile.user_id == user_id)
+    return session.exec(statement).first()
+
 #ENDPOINT: REVISION SEMANAL, REVISAR SI TOCA
-@router.get("/check-weekly-review")
-def check_weekly_review(
-    session: Session = Depends(get_session),
+@router.get("/check-weekly-review", response_model=WeeklyReviewOut)
+async def check_weekly_review(
     current_user: User = Depends(get_current_user)
 ):
     """
     Este enpoint devuelve true si ha pasado más de una semana desde la última revisión
     o si nunca se ha hecho.
     """
-    # Si nunca ha hecho revisión, hay que hacerla
-    if not current_user.last_weekly_review:
-        # damos un margen de 3 dias desde la creación de la cuenta
-        days_since_creation = (datetime.utcnow() - current_user.created_at).days
-        if days_since_creation < 3:
-            return {"due": False}
-        return {"due": True}
-
-    # Si ya la hizo se comprueba si ha pasado una semana
-    days_since_review = (datetime.utcnow() - current_user.last_weekly_review).days
-    
-    # Si han pasado 7 días o más es necesario hacer una revisión
-    if days_since_review >= 7:
-        return {"due": True}
-        
-    return {"due": False}
+    return {"due": datetime.utcnow() >= _weekly_review_due_at(current_user)}
+
+def _weekly_review_due_at(user: User) -> datetime:
+    """Momento a partir del cual toca la revisión semanal"""
+    # Si nunca ha hecho revisión, damos un margen de 3 dias desde la creación de la cuenta
+    if not user.last_weekly_review:
+        return user.created_at + timedelta(days=3)
+
+    # Si ya la hizo, toca cuando pasen 7 días
+    return user.last_weekly_review + timedelta(days=7)
 
 #ENDPOINT: GUARDAR RESULTADO DE REVISIÓN
 @router.post("/update-plan")
-def update_plan(
+async def update_plan(
     update_data: PlanUpdate,
-    session: Session = Depends(get_session),
+    session: AnySession = Depends(get_write_db),
     current_user: User = Depends(get_current_user)
 ):
+    return await run_write(session, _update_plan, current_user.id, update_data)
+
+def _update_plan(session: Session, user_id: int, update_data: PlanUpdate):
+    """Funcion de escritura (writer.py): sin commit, cache y evento van despues del commit"""
+    current_user = session.get(User, user_id)
+
     #Actualiza el perfil
-    statement = select(Profile).where(Profile.user_id == current_user.id)
-    profile = session.exec(statement).first()
+    profile = _get_profile(session, user_id)
     
     if profile:
         profile.archetype = update_data.new_archetype
@@ -119,6 +135,89 @@ def update_plan(
     #Marcar que el estudiante ha hecho la revisión semanal
     current_user.last_weekly_review = datetime.utcnow()
     session.add(current_user)
-    
-    session.commit()
-    return {"message": "Plan actualizado correctamente"}
\ No newline at end of file
+
+    after_commit(session, auth_cache.invalidate_user, current_user.email)
+    after_commit(session, events.publish, current_user.email, "plan", {
+        "archetype": update_data.new_archetype,
+        "last_weekly_review": current_user.last_weekly_review.isoformat(),
+        "weekly_review_due_at": _weekly_review_due_at(current_user).isoformat(),
+    })
+    return {"message": "Plan actualizado correctamente"}
+
+
+#ENDPOINT: ARRANQUE DEL DASHBOARD
+@router.get("/bootstrap", response_model=BootstrapOut)
+async def bootstrap(
+    response: Response,
+    if_none_match: Optional[str] = Header(default=None),
+    session: AnySession = Depends(get_fresh_read_db),
+    email: str = Depends(get_token_email)
+):
+    """
+    Todo lo que pinta el dashboard en una sola llamada: usuario, perfil, si toca revisión,
+    estadísticas semanales e inventario.
+    El ETag lleva la version del usuario (sube en cada invalidate_user) y hasta cuando son
+    validos los datos (medianoche o cuando toca la revisión). Si el If-None-Match coincide
+    se responde 304 sin abrir conexion a la DB.
+    Con varios workers solo si las invalidaciones se reparten entre ellos (auth_cache.ETAGS_SHARED).
+    """
+    if if_none_match and auth_cache.ETAGS_SHARED and _etag_is_fresh(if_none_match, email):
+        return Response(
+            status_code=status.HTTP_304_NOT_MODIFIED,
+            headers={"ETag": if_none_match, "Cache-Control": "private, no-cache"},
+        )
+
+    # la version se lee antes de cargar, si cambia mientras tanto el ETag queda viejo y no al reves
+    version = auth_cache.user_version(email)
+    data = await run_db(session, _load_bootstrap, email)
+    if data is None:
+        raise credentials_exception
+
+    response.headers["ETag"] = _make_etag(version, data.pop("valid_until"))
+    response.headers["Cache-Control"] = "private, no-cache"
+    return data
+
+def _make_etag(version: int, valid_until: datetime) -> str:
+    return f'W/"{auth_cache.BOOT_ID}-{version}-{int(valid_until.replace(tzinfo=timezone.utc).timestamp())}"'
+
+def _etag_is_fresh(etag: str, email: str) -> bool:
+    try:
+        boot_id, version, valid_until = etag.removeprefix("W/").strip('"').split("-")
+        version, valid_until = int(version), int(valid_until)
+    except ValueError:
+        return False
+    return (
+        boot_id == auth_cache.BOOT_ID
+        and version == auth_cache.user_version(email)
+        and time.time() < valid_until
+    )
+
+def _load_bootstrap(session: Session, email: str):
+    # 3 consultas: usuario + columnas del perfil (JOIN), inventario y los 7 dias de la semana.
+    # El usuario se carga entero porque tambien llena la cache de get_current_user
+    statement = (
+        select(User, Profile.archetype, Profile.bio)
+        .outerjoin(Profile, Profile.user_id == User.id)
+        .where(User.email == email)
+    )
+    row = session.exec(statement).first()
+    if row is None:
+        return None
+    user, archetype, bio = row
+    auth_cache.remember_user(user)
+
+    now = datetime.utcnow()
+    review_due_at = _weekly_review_due_at(user)
+    # las estadisticas semanales cambian a medianoche, la revisión cuando llega su fecha
+    valid_until = datetime.combine(now.date() + timedelta(days=1), datetime.min.time())
+    if review_due_at > now:
+        valid_until = min(valid_until, review_due_at)
+
+    return {
+        "user": user,
+        "profile": {"archetype": archetype, "bio": bio} if archetype is not None else None,
+        "weekly_review_due": now >= review_due_at,
+        "weekly_stats": weekly_stats(session, user.id),
+        "inventory": inventory_items(session, user.id),
+        "valid_until": valid_until,
+    }
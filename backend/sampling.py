@@ -0,0 +1,36 @@
+import random
+from typing import List
+
+
+class AliasSampler:
+    """
+    Muestreo de una distribucion discreta en O(1) por tirada (metodo alias de Vose).
+    Las tablas se calculan una sola vez a partir de los pesos.
+    """
+
+    def __init__(self, weights: List[float]):
+        n = len(weights)
+        total = float(sum(weights))
+        scaled = [w * n / total for w in weights]
+
+        self.n = n
+        self.prob = [0.0] * n
+        self.alias = [0] * n
+
+        small = [i for i, p in enumerate(scaled) if p < 1.0]
+        large = [i for i, p in enumerate(scaled) if p >= 1.0]
+        while small and large:
+            s, l = small.pop(), large.pop()
+            self.prob[s] = scaled[s]
+            self.alias[s] = l
+            scaled[l] = scaled[l] + scaled[s] - 1.0
+            (small if scaled[l] < 1.0 else large).append(l)
+
+        # lo que queda vale 1 (salvo errores de redondeo)
+        for i in small + large:
+            self.prob[i] = 1.0
+
+    def sample(self, rng: random.Random = random) -> int:
+        """Devuelve el indice elegido"""
+        column = int(rng.random() * self.n)
+        return column if rng.random() < self.prob[column] else self.alias[column]
@@ -0,0 +1,101 @@
+import asyncio
+import logging
+from datetime import datetime, timedelta
+
+from sqlmodel import Session
+from starlette.concurrency import run_in_threadpool
+
+import auth_cache
+from activity import mark_streaks_changed, reset_broken_streaks, streaks_changed_at
+from config import settings
+from database import engine, read_engine
+from leaderboard import leaderboards
+from retention import compact_sessions
+
+logger = logging.getLogger("focus.jobs")
+
+# Trabajos periodicos dentro del proceso de la app (se lanzan desde el lifespan).
+# Con varios workers cada uno lanza el suyo; los trabajos son idempotentes,
+# el segundo no encuentra nada que cambiar.
+
+
+def _seconds_until(hour: int, minute: int) -> float:
+    now = datetime.utcnow()
+    target = now.replace(hour=hour, minute=minute, second=0, microsecond=0)
+    if target <= now:
+        target += timedelta(days=1)
+    return (target - now).total_seconds()
+
+
+async def run_daily(name: str, at: str, job):
+    """Ejecuta job() en el threadpool todos los dias a la hora at ("HH:MM", UTC)"""
+    hour, minute = (int(part) for part in at.split(":"))
+    while True:
+        await asyncio.sleep(_seconds_until(hour, minute))
+        try:
+            await run_in_threadpool(job)
+        except Exception:
+            logger.exception("fallo el trabajo %s", name)
+
+
+# Ultimo cambio de rachas en bloque que ya tiene en memoria este worker
+_streaks_seen = None
+
+
+def refresh_streaks(bind=read_engine, force: bool = False) -> bool:
+    """
+    Si las rachas cambiaron en bloque desde la ultima vez (mark_streaks_changed),
+    reconstruye las clasificaciones y vacia las caches de usuarios de este worker.
+    La marca se escribe despues de los datos: si una replica ya la ve, tambien ve las rachas.
+    """
+    global _streaks_seen
+    with Session(bind) as session:
+        changed_at = streaks_changed_at(session)
+        if not force and changed_at == _streaks_seen:
+            return False
+        leaderboards.rebuild(session)
+    auth_cache.forget_all()
+    _streaks_seen = changed_at
+    return True
+
+
+def _remember_streaks():
+    # las clasificaciones del arranque ya incluyen lo anterior
+    global _streaks_seen
+    with Session(read_engine) as session:
+        _streaks_seen = streaks_changed_at(session)
+
+
+async def watch_streaks():
+    """
+    Cada STREAK_REFRESH_POLL_SECONDS: con varios workers el trabajo de rachas solo le devuelve
+    las filas a uno, y cli.py cambia las rachas desde otro proceso
+    """
+    await run_in_threadpool(_remember_streaks)
+    while True:
+        await asyncio.sleep(settings.STREAK_REFRESH_POLL_SECONDS)
+        try:
+            if await run_in_threadpool(refresh_streaks):
+                logger.info("rachas cambiadas fuera de este worker, clasificaciones reconstruidas")
+        except Exception:
+            logger.exception("no se pudo comprobar el cambio de rachas")
+
+
+def streak_reset_job():
+    """Rachas rotas a 0 y despues caches y clasificaciones al dia (en este worker y, con la marca, en el resto)"""
+    with Session(engine) as session:
+        touched = reset_broken_streaks(session)
+        if touched:
+            mark_streaks_changed(session)
+    for _, email in touched:
+        auth_cache.invalidate_user(email)
+    # todos los workers lanzan el trabajo, aunque solo uno reciba las filas: cada uno rehace lo suyo
+    # (el UPDATE del resto espera al commit del primero y ya ve las rachas a 0). Con replica,
+    # desde el primario, que la replica puede no tener aun el commit
+    refresh_streaks(engine if settings.DATABASE_REPLICA_URL else read_engine, force=True)
+    logger.info("rachas rotas reiniciadas: %d", len(touched))
+
+
+def retention_job():
+    """Sesiones antiguas a los resumenes mensuales; si la pasada anterior se corto, sigue por donde iba"""
+    compact_sessions(engine, log=logger.info)
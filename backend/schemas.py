@@ -0,0 +1,225 @@
+from datetime import date, datetime
+from typing import Dict, List, Literal, Optional
+
+from pydantic import BaseModel, ConfigDict
+
+# Esquemas de respuesta: solo los campos que usa el frontend, nunca el modelo de tabla entero.
+# Con response_model FastAPI valida y serializa con pydantic-core en vez de pasar por
+# jsonable_encoder, y ORJSONResponse (main.py) escribe el JSON.
+# from_attributes deja devolver entidades o filas de select(columnas) sin copiarlas antes a dicts.
+
+
+class ResponseSchema(BaseModel):
+    model_config = ConfigDict(from_attributes=True)
+
+
+# USUARIO
+
+class UserOut(ResponseSchema):
+    """El usuario sin password_hash"""
+    id: int
+    email: str
+    full_name: str
+    career: str
+    created_at: datetime
+    current_points: int
+    current_streak_days: int
+    last_streak_date: Optional[datetime] = None
+    last_weekly_review: Optional[datetime] = None
+
+
+class ProfileOut(ResponseSchema):
+    archetype: str
+    bio: Optional[str] = None
+
+
+class WeeklyReviewOut(ResponseSchema):
+    due: bool
+
+
+class DayOut(ResponseSchema):
+    day_index: int
+    completed: bool
+
+
+class WeeklyStatsOut(ResponseSchema):
+    days_with_sessions: int
+    daily_breakdown: List[DayOut]
+    current_day_index: int
+
+
+class InventoryItemOut(ResponseSchema):
+    id: int
+    item_id: str
+    item_name: str
+    quantity: int
+    acquired_at: datetime
+
+
+class BootstrapOut(ResponseSchema):
+    user: UserOut
+    profile: Optional[ProfileOut] = None
+    weekly_review_due: bool
+    weekly_stats: WeeklyStatsOut
+    inventory: List[InventoryItemOut]
+
+
+# SESIONES
+
+class HeatmapDayOut(ResponseSchema):
+    day: date
+    sessions: int
+    minutes: int
+
+
+class AnalyticsOut(ResponseSchema):
+    range: Literal["week", "month", "year"]
+    start: date
+    end: date
+    heatmap: List[HeatmapDayOut]
+    active_days: int
+    total_minutes: int
+    completed_sessions: int
+    abandoned_sessions: int
+    completion_ratio: float
+    abandon_reasons: Dict[str, int]
+    average_session_minutes: float
+
+
+class HistoryItemOut(ResponseSchema):
+    id: int
+    started_at: datetime
+    ended_at: Optional[datetime] = None
+    intended_minutes: int
+    completed: bool
+    abandon_reason: Optional[str] = None
+
+
+class HistoryPageOut(ResponseSchema):
+    items: List[HistoryItemOut]
+    next_cursor: Optional[str] = None
+
+
+class SessionCompleteOut(ResponseSchema):
+    message: str
+    points_earned: int
+    new_total_points: int
+    streak: int
+    first_session_of_day: bool
+
+
+class BatchItemOut(ResponseSchema):
+    idempotency_key: str
+    status: Literal["created", "duplicate"]
+    points_earned: int
+
+
+class SessionBatchOut(ResponseSchema):
+    message: str
+    created: int
+    duplicates: int
+    points_earned: int
+    new_total_points: int
+    streak: int
+    results: List[BatchItemOut]
+
+
+# TIENDA Y RULETA
+
+class CatalogItemOut(ResponseSchema):
+    id: str
+    name: str
+    price: int
+
+
+class CatalogOut(ResponseSchema):
+    version: int
+    items: List[CatalogItemOut]
+
+
+class SpinResultOut(ResponseSchema):
+    prize: str
+    value: int
+
+
+class SpinOut(ResponseSchema):
+    prize: str
+    value: int
+    spins: List[SpinResultOut]
+    total_value: int
+    new_balance: int
+    message: str
+
+
+class PurchaseOut(ResponseSchema):
+    success: bool
+    new_balance: int
+    message: str
+    inventory_updated: bool
+    catalog_version: int
+
+
+class CartLineOut(ResponseSchema):
+    item_id: str
+    quantity: int
+
+
+class CartPurchaseOut(ResponseSchema):
+    success: bool
+    total_price: int
+    new_balance: int
+    items: List[CartLineOut]
+    message: str
+    inventory_updated: bool
+    catalog_version: int
+
+
+# METAS
+
+class GoalOut(ResponseSchema):
+    id: int
+    title: str
+    description: Optional[str] = None
+    target_minutes_week: int
+    is_active: bool
+    created_at: datetime
+
+
+class GoalProgressOut(ResponseSchema):
+    goal_id: int
+    title: str
+    is_active: bool
+    week_start: date
+    target_minutes: int
+    minutes: int
+    sessions: int
+    percent: float
+    completed: bool
+
+
+class GoalsProgressOut(ResponseSchema):
+    goals: List[GoalProgressOut]
+
+
+# CLASIFICACION
+
+class LeaderboardEntryOut(ResponseSchema):
+    rank: int
+    user_id: int
+    full_name: str
+    score: int
+
+
+class LeaderboardTopOut(ResponseSchema):
+    board: str
+    scope: str
+    entries: List[LeaderboardEntryOut]
+
+
+class LeaderboardMeOut(ResponseSchema):
+    board: str
+    scope: str
+    rank: Optional[int] = None
+    score: int
+    total: int
+    neighbours: List[LeaderboardEntryOut]
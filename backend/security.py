@@ -1,21 +1,76 @@
-from passlib.context import CryptContext
+from typing import Optional, Tuple
 from datetime import datetime, timedelta
-from jose import jwt
-from config import settings 
+from config import settings
+from password_pool import pool
 
-#para hashear contraseñas
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+# passlib y jose no se importan al arrancar (arranque en frio): el contexto
+# se crea en el primer uso, en el hilo o proceso del pool que lo necesite
+_pwd_context = None
+
+def get_pwd_context():
+    """Para hashear contraseñas, el coste se configura con BCRYPT_ROUNDS"""
+    global _pwd_context
+    if _pwd_context is None:
+        from passlib.context import CryptContext
+
+        _pwd_context = CryptContext(
+            schemes=["bcrypt"],
+            deprecated="auto",
+            bcrypt__rounds=settings.BCRYPT_ROUNDS,
+        )
+    return _pwd_context
+
+# Estas dos funciones son las que corren dentro del pool (deben ser de nivel de modulo
+# para poder enviarse a un proceso hijo)
+def _hash(password: str) -> str:
+    return get_pwd_context().hash(password)
+
+def _verify_and_update(plain_password: str, hashed_password: str) -> Tuple[bool, Optional[str]]:
+    return get_pwd_context().verify_and_update(plain_password, hashed_password)
 
 def get_password_hash(password: str) -> str:
-    return pwd_context.hash(password)
+    return pool.run("hash", _hash, password)
 
 def verify_password(plain_password: str, hashed_password: str) -> bool:
-    return pwd_context.verify(plain_password, hashed_password)
+    valid, _ = verify_and_update_password(plain_password, hashed_password)
+    return valid
+
+def verify_and_update_password(plain_password: str, hashed_password: str) -> Tuple[bool, Optional[str]]:
+    """
+    Verifica la contraseña y, si el hash guardado usa un coste distinto al configurado,
+    devuelve tambien el hash nuevo para guardarlo (si no, None).
+    """
+    return pool.run("verify", _verify_and_update, plain_password, hashed_password)
+
+async def get_password_hash_async(password: str) -> str:
+    return await pool.run_async("hash", _hash, password)
+
+async def verify_and_update_password_async(plain_password: str, hashed_password: str) -> Tuple[bool, Optional[str]]:
+    return await pool.run_async("verify", _verify_and_update, plain_password, hashed_password)
+
+# Hash de relleno con el mismo coste que los reales (se calcula la primera vez que hace falta)
+_dummy_hash: Optional[str] = None
+
+async def prepare_dummy_hash() -> None:
+    """Calcula el hash de relleno si aun no esta (el calentamiento del arranque lo llama antes)"""
+    global _dummy_hash
+    if _dummy_hash is None:
+        _dummy_hash = await get_password_hash_async("focus-dummy-password")
+
+async def dummy_verify_async(plain_password: str) -> None:
+    """
+    Un verify que siempre falla pero cuesta lo mismo que uno real.
+    Para emails que no existen: el login tarda igual y no revela que cuentas hay.
+    """
+    await prepare_dummy_hash()
+    await verify_and_update_password_async(plain_password, _dummy_hash)
 
 def create_access_token(data: dict) -> str:
+    from jose import jwt
+
     to_encode = data.copy()
     expire = datetime.utcnow() + timedelta(minutes=settings.ACCESS_TOKEN_EXPIRE_MINUTES)
     to_encode.update({"exp": expire})
-    
+
     encoded_jwt = jwt.encode(to_encode, settings.SECRET_KEY, algorithm=settings.ALGORITHM)
     return encoded_jwt
\ No newline at end of file
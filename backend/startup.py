@@ -0,0 +1,121 @@
+import asyncio
+import time
+from contextlib import AsyncExitStack, ExitStack, contextmanager
+from typing import List, Optional, Tuple
+
+from starlette.concurrency import run_in_threadpool
+
+from config import settings
+
+# Arranque en frio (hosting que escala a cero): cuanto tarda cada parte hasta aceptar peticiones.
+# main.py importa este modulo lo primero, asi STARTED es el inicio de las importaciones de la app
+# (el arranque del interprete y de uvicorn va aparte, ver bench/startup.py).
+STARTED = time.perf_counter()
+
+
+class StartupProfile:
+    """
+    Marcas de tiempo del arranque: grupos de importaciones y pasos del lifespan.
+    Con STARTUP_PROFILE=true se imprimen al terminar; el resumen sale siempre en /health.
+    """
+
+    def __init__(self, started: float):
+        self.started = started
+        self._last = started
+        self.steps: List[Tuple[str, float]] = []
+        self.ready_at: Optional[float] = None
+        self.schema_version: Optional[int] = None
+        self.warm = False
+
+    def mark(self, name: str):
+        """Cierra un tramo: lo que ha pasado desde la marca anterior"""
+        now = time.perf_counter()
+        self.steps.append((name, now - self._last))
+        self._last = now
+
+    @contextmanager
+    def step(self, name: str):
+        """Un paso del lifespan; lo que hubiera antes sin marcar queda en su propio tramo"""
+        self.mark("(otros)")
+        try:
+            yield
+        finally:
+            self.mark(name)
+
+    def ready(self, schema_version: Optional[int]):
+        self.schema_version = schema_version
+        self.ready_at = time.perf_counter()
+        if settings.STARTUP_PROFILE:
+            self.report()
+
+    def report(self):
+        total = (self.ready_at or time.perf_counter()) - self.started
+        print(f"⏱️ Arranque en {total * 1000:.0f} ms")
+        for name, seconds in self.steps:
+            # los tramos vacios (de step sin nada antes) no aportan nada
+            if seconds >= 0.0005:
+                print(f"   {name:<28}{seconds * 1000:>8.1f} ms")
+
+    def status(self) -> dict:
+        """Respuesta de /health: precalculada, no toca la DB ni vuelve a mirar el esquema"""
+        return {
+            "status": "ok" if self.ready_at is not None else "starting",
+            "schema_version": self.schema_version,
+            "warm": self.warm,
+            "startup_ms": round((self.ready_at - self.started) * 1000, 1) if self.ready_at else None,
+        }
+
+
+# Instancia unica
+profile = StartupProfile(STARTED)
+
+
+# CALENTAMIENTO (WARMUP_ON_STARTUP=true)
+
+def _open_connections(engine, count: int):
+    """Abre count conexiones a la vez y las devuelve al pool, que se queda con ellas"""
+    # el pool de SQLite en memoria no tiene tamaño, con una basta
+    size = getattr(engine.pool, "size", lambda: 1)()
+    with ExitStack() as stack:
+        for _ in range(max(1, min(count, size))):
+            connection = stack.enter_context(engine.connect())
+            connection.exec_driver_sql("SELECT 1")
+
+
+async def _open_async_connections(engine, count: int):
+    size = getattr(engine.pool, "size", lambda: 1)()
+    async with AsyncExitStack() as stack:
+        for _ in range(max(1, min(count, size))):
+            connection = await stack.enter_async_context(engine.connect())
+            await connection.exec_driver_sql("SELECT 1")
+
+
+def _prepare_tokens():
+    # importa jose y hace el primer encode/decode, lo que pagaria el primer login
+    from jose import jwt
+    from security import create_access_token
+
+    jwt.decode(create_access_token({"sub": "calentamiento"}), settings.SECRET_KEY, algorithms=[settings.ALGORITHM])
+
+
+async def warm_up() -> Optional[asyncio.Task]:
+    """
+    Deja listo lo que si no pagaria la primera peticion:
+    - WARMUP_DB_CONNECTIONS conexiones abiertas por motor (con sus pragmas ya aplicados)
+    - jose importado y un token firmado y verificado
+    El hash de relleno de bcrypt (y el pool de bcrypt) se calcula en segundo plano porque
+    tarda lo mismo que un login; se devuelve la tarea para cancelarla al apagar.
+    """
+    from database import engine, read_engine, async_engine, async_read_engine
+    from security import prepare_dummy_hash
+
+    count = settings.WARMUP_DB_CONNECTIONS
+    for current in {engine, read_engine}:
+        await run_in_threadpool(_open_connections, current, count)
+    for current in {async_engine, async_read_engine} - {None}:
+        await _open_async_connections(current, count)
+    # sin SECRET_KEY no se puede firmar; el login ya fallara por su cuenta, el arranque no
+    if settings.SECRET_KEY:
+        await run_in_threadpool(_prepare_tokens)
+    profile.warm = True
+    return asyncio.create_task(prepare_dummy_hash())
@@ -0,0 +1,12 @@
+import os
+import sys
+import tempfile
+
+# Los modulos del backend son planos (import config, import models...), como al lanzar uvicorn desde backend/
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# Los tests de la app usan una base nueva en un directorio temporal, nunca backend/database.db
+# (en memoria no vale: los motores de lectura y escritura verian bases distintas)
+os.environ.setdefault("DATABASE_URL", f"sqlite:///{tempfile.mkdtemp()}/test.db")
+os.environ.setdefault("BCRYPT_ROUNDS", "4")
+os.environ.setdefault("SECRET_KEY", "x" * 32)
@@ -0,0 +1,84 @@
+from datetime import date, datetime, timedelta
+
+import pytest
+from sqlmodel import Session, SQLModel, create_engine
+
+from activity import apply_streak_days, record_activity
+from models import User
+
+TODAY = date(2026, 3, 20)
+
+
+def _at(day: date) -> datetime:
+    return datetime.combine(day, datetime.min.time()) + timedelta(hours=9)
+
+
+@pytest.fixture
+def session():
+    engine = create_engine("sqlite://")
+    SQLModel.metadata.create_all(engine)
+    with Session(engine) as session:
+        yield session
+
+
+def _user(session, days_ago, streak, last_days_ago):
+    """Usuario con actividad los dias `days_ago` (contados desde TODAY) y esa racha guardada"""
+    user = User(email="a@b.c", password_hash="x", full_name="A", current_streak_days=streak,
+                last_streak_date=_at(TODAY - timedelta(days=last_days_ago)) if last_days_ago is not None else None)
+    session.add(user)
+    session.flush()
+    for ago in days_ago:
+        record_activity(session, user.id, TODAY - timedelta(days=ago), minutes=25, points=300)
+    return user
+
+
+def _batch(*days_ago):
+    return {TODAY - timedelta(days=ago): _at(TODAY - timedelta(days=ago)) for ago in days_ago}
+
+
+def test_batch_day_fills_gap_before_last_streak(session):
+    # estudio hoy y hace 2 dias; llega sin conexion la sesion de ayer: 3 dias seguidos
+    user = _user(session, [0, 2], streak=1, last_days_ago=0)
+    apply_streak_days(session, user, _batch(1), TODAY)
+    assert user.current_streak_days == 3
+    assert user.last_streak_date == _at(TODAY)
+
+
+def test_batch_day_extends_streak_backwards(session):
+    user = _user(session, [0, 1], streak=2, last_days_ago=0)
+    apply_streak_days(session, user, _batch(2, 3), TODAY)
+    assert user.current_streak_days == 4
+
+
+def test_batch_continues_from_existing_days(session):
+    user = _user(session, [3, 4, 5], streak=0, last_days_ago=3)
+    apply_streak_days(session, user, _batch(0, 1, 2), TODAY)
+    assert user.current_streak_days == 6
+    assert user.last_streak_date == _at(TODAY)
+
+
+def test_streak_stops_at_first_gap(session):
+    user = _user(session, [3, 4], streak=0, last_days_ago=3)
+    apply_streak_days(session, user, _batch(0, 1), TODAY)
+    assert user.current_streak_days == 2
+
+
+def test_old_batch_does_not_revive_broken_streak(session):
+    # todo es de antes de ayer: la racha ya estaba rota
+    user = _user(session, [5], streak=0, last_days_ago=5)
+    apply_streak_days(session, user, _batch(6, 7), TODAY)
+    assert user.current_streak_days == 0
+    assert user.last_streak_date == _at(TODAY - timedelta(days=5))
+
+
+def test_first_sessions_ever(session):
+    user = _user(session, [], streak=0, last_days_ago=None)
+    apply_streak_days(session, user, _batch(1, 0), TODAY)
+    assert user.current_streak_days == 2
+
+
+def test_returns_days_that_already_had_activity(session):
+    # el bonus del dia no se repite en los dias del lote que ya tenian sesiones
+    user = _user(session, [0, 2, 9], streak=1, last_days_ago=0)
+    assert apply_streak_days(session, user, _batch(1, 2, 3), TODAY) == {TODAY, TODAY - timedelta(days=2)}
+    assert user.current_streak_days == 4
@@ -0,0 +1,28 @@
+import analytics
+import events
+
+
+def _from_other_worker(kind: str, key: str):
+    events.bus._deliver(key, {"internal": kind, "origin": "otro"})
+
+
+def test_analytics_invalidation_from_another_worker():
+    for range_name in analytics.RANGES:
+        analytics.analytics_cache.set((7, range_name), {"range": range_name})
+        analytics.analytics_cache.set((8, range_name), {"range": range_name})
+
+    _from_other_worker("analytics", "7")
+
+    assert all(analytics.get_cached(7, range_name) is None for range_name in analytics.RANGES)
+    assert analytics.get_cached(8, "week") == {"range": "week"}
+
+
+def test_analytics_invalidation_is_broadcast(monkeypatch):
+    sent = []
+    monkeypatch.setattr(events.bus, "broadcast", lambda kind, key, data=None: sent.append((kind, key)))
+    analytics.analytics_cache.set((9, "month"), {})
+
+    analytics.invalidate(9)
+
+    assert analytics.get_cached(9, "month") is None
+    assert sent == [("analytics", "9")]
@@ -0,0 +1,34 @@
+import pytest
+from pydantic import ValidationError
+
+from routers.goals import GoalUpdate
+
+
+@pytest.mark.parametrize("field", ["title", "target_minutes_week", "is_active"])
+def test_update_rejects_null_for_not_null_columns(field):
+    with pytest.raises(ValidationError):
+        GoalUpdate.model_validate({field: None})
+
+
+def test_update_keeps_only_sent_fields():
+    assert GoalUpdate.model_validate({"description": None}).model_dump(exclude_unset=True) == {"description": None}
+    assert GoalUpdate.model_validate({"title": "Fisica"}).model_dump(exclude_unset=True) == {"title": "Fisica"}
+
+
+def test_patch_with_null_title_is_422():
+    # la app entera: 422 del esquema, no 500 del NOT NULL
+    from fastapi.testclient import TestClient
+    import main
+    from security import create_access_token
+
+    with TestClient(main.app) as client:
+        client.post("/auth/register", json={
+            "email": "g@x.com", "password": "pw123456", "full_name": "G", "career": "Cs",
+        })
+        headers = {"Authorization": "Bearer " + create_access_token({"sub": "g@x.com"})}
+        goal = client.post("/goals/", headers=headers, json={"title": "Fisica"}).json()
+
+        assert client.patch(f"/goals/{goal['id']}", headers=headers, json={"title": None}).status_code == 422
+        response = client.patch(f"/goals/{goal['id']}", headers=headers, json={"description": None})
+        assert response.status_code == 200
+        assert response.json()["title"] == "Fisica"
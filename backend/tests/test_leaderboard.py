@@ -0,0 +1,79 @@
+import random
+
+import pytest
+
+import events
+from leaderboard import Board, Leaderboards, RankTree
+
+
+@pytest.fixture(autouse=True)
+def seeded():
+    # las prioridades del treap salen de random: misma semilla, mismos arboles
+    random.seed(1234)
+
+
+def _check(tree: RankTree, expected: list):
+    assert len(tree) == len(expected)
+    for position, key in enumerate(expected):
+        assert tree.kth(position) == key
+        assert tree.rank(key) == position
+
+
+def test_rank_kth_remove_match_sorted_list():
+    tree, expected = RankTree(), []
+    keys = random.sample(range(10_000), 500)
+    for key in keys:
+        tree.insert(key)
+        expected.append(key)
+    expected.sort()
+    _check(tree, expected)
+
+    for key in keys[::3]:
+        tree.remove(key)
+        expected.remove(key)
+    _check(tree, expected)
+
+    # quitar lo que no esta no cambia nada
+    tree.remove(-1)
+    _check(tree, expected)
+    with pytest.raises(IndexError):
+        tree.kth(len(expected))
+
+
+def test_rank_of_missing_key_is_insertion_point():
+    tree = RankTree.from_sorted([10, 20, 30])
+    assert tree.rank(5) == 0
+    assert tree.rank(25) == 2
+    assert tree.rank(99) == 3
+
+
+def test_from_sorted_matches_inserts():
+    keys = sorted(random.sample(range(1_000), 200))
+    _check(RankTree.from_sorted(keys), keys)
+
+
+def test_board_orders_by_score_then_user_id():
+    board = Board.from_scores({1: 50, 2: 80, 3: 50})
+    assert board.slice(0, 10) == [(0, 2, 80), (1, 1, 50), (2, 3, 50)]
+    assert board.rank(3) == 2
+
+    board.set(3, 90)
+    board.discard(2)
+    assert board.slice(0, 10) == [(0, 3, 90), (1, 1, 50)]
+    assert board.rank(2) is None
+
+
+def test_update_from_another_worker_is_applied_once(monkeypatch):
+    monkeypatch.setattr(events.bus, "_internal_handlers", {})
+    boards = Leaderboards()
+    events.bus.on_internal("leaderboard", boards._on_broadcast)
+    message = {
+        "user_id": 7, "full_name": "Ana", "career": "Cs", "points": 120, "streak": 3, "weekly_points": 40,
+    }
+
+    # el eco del propio proceso se ignora, el de otro worker se aplica
+    events.bus._deliver("update", {"internal": "leaderboard", "origin": events.PROCESS_ID, **message})
+    assert boards.top("points") == []
+    events.bus._deliver("update", {"internal": "leaderboard", "origin": "otro", **message})
+    assert boards.around("weekly", 7)["score"] == 40
+    assert boards.top("points", "Cs") == [{"rank": 1, "user_id": 7, "full_name": "Ana", "score": 120}]
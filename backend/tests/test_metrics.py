@@ -0,0 +1,25 @@
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+import main
+from config import settings
+from routers import metrics
+
+
+def test_metrics_off_by_default():
+    assert settings.METRICS_ENABLED is False
+    with TestClient(main.app) as client:
+        assert client.get("/metrics").status_code == 404
+
+
+def test_metrics_token(monkeypatch):
+    monkeypatch.setattr(settings, "METRICS_TOKEN", "secreto")
+    app = FastAPI()
+    app.include_router(metrics.router)
+    client = TestClient(app)
+
+    assert client.get("/metrics").status_code == 401
+    assert client.get("/metrics", headers={"Authorization": "Bearer otro"}).status_code == 401
+    response = client.get("/metrics", headers={"Authorization": "Bearer secreto"})
+    assert response.status_code == 200
+    assert "focus_cache_hits_total" in response.text
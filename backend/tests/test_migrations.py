@@ -0,0 +1,151 @@
+import json
+import threading
+from datetime import datetime, timedelta
+
+import pytest
+from sqlalchemy import create_engine, inspect, select
+
+import migrations
+from models import UserDailyActivity, UserItem
+
+# Esquema de antes de las migraciones (lo que creaba create_all con los modelos originales)
+BASELINE_SCHEMA = """
+CREATE TABLE user (
+    id INTEGER NOT NULL, email VARCHAR NOT NULL, password_hash VARCHAR NOT NULL, full_name VARCHAR NOT NULL,
+    career VARCHAR(30) NOT NULL, created_at DATETIME NOT NULL, current_points INTEGER NOT NULL,
+    current_streak_days INTEGER NOT NULL, last_streak_date DATETIME, last_weekly_review DATETIME,
+    PRIMARY KEY (id)
+);
+CREATE UNIQUE INDEX ix_user_email ON user (email);
+CREATE TABLE profile (
+    id INTEGER NOT NULL, user_id INTEGER NOT NULL, archetype VARCHAR NOT NULL, bio VARCHAR,
+    PRIMARY KEY (id), FOREIGN KEY(user_id) REFERENCES user (id)
+);
+CREATE TABLE goal (
+    id INTEGER NOT NULL, user_id INTEGER NOT NULL, title VARCHAR NOT NULL, description VARCHAR,
+    target_minutes_week INTEGER NOT NULL, is_active BOOLEAN NOT NULL, created_at DATETIME NOT NULL,
+    PRIMARY KEY (id), FOREIGN KEY(user_id) REFERENCES user (id)
+);
+CREATE TABLE session (
+    id INTEGER NOT NULL, user_id INTEGER NOT NULL, intended_minutes INTEGER NOT NULL, started_at DATETIME NOT NULL,
+    ended_at DATETIME, completed BOOLEAN NOT NULL, abandon_reason VARCHAR,
+    PRIMARY KEY (id), FOREIGN KEY(user_id) REFERENCES user (id)
+);
+CREATE TABLE useritem (
+    id INTEGER NOT NULL, user_id INTEGER NOT NULL, item_id VARCHAR NOT NULL, item_name VARCHAR NOT NULL,
+    acquired_at DATETIME NOT NULL, quantity INTEGER NOT NULL,
+    PRIMARY KEY (id), FOREIGN KEY(user_id) REFERENCES user (id)
+);
+"""
+
+
+@pytest.fixture
+def legacy_db(tmp_path):
+    """Base con el esquema original: compras repetidas en useritem y sesiones de dos dias"""
+    path = tmp_path / "legacy.db"
+    engine = create_engine(f"sqlite:///{path}")
+    yesterday = datetime.utcnow() - timedelta(days=1)
+    with engine.begin() as connection:
+        connection.connection.driver_connection.executescript(BASELINE_SCHEMA)
+        connection.exec_driver_sql(
+            "INSERT INTO user VALUES (1, 'old@x.com', 'hash', 'Old', 'Cs', ?, 500, 2, ?, NULL)",
+            (yesterday, yesterday),
+        )
+        connection.exec_driver_sql(
+            "INSERT INTO useritem (user_id, item_id, item_name, acquired_at, quantity) VALUES (?, ?, ?, ?, 1)",
+            [(1, "rest", "+5 min descanso", yesterday)] * 3 + [(1, "streak", "Salvar racha", yesterday)],
+        )
+        connection.exec_driver_sql(
+            "INSERT INTO session (user_id, intended_minutes, started_at, ended_at, completed, abandon_reason) "
+            "VALUES (?, ?, ?, ?, ?, ?)",
+            [
+                (1, 25, yesterday, yesterday + timedelta(minutes=25), True, None),
+                (1, 50, yesterday, yesterday + timedelta(minutes=50), True, None),
+                (1, 15, yesterday, None, False, "distraccion"),
+            ],
+        )
+    yield engine
+    engine.dispose()
+
+
+def _check_latest(engine):
+    assert migrations.current_version(engine) == migrations.LATEST_VERSION
+    with engine.connect() as connection:
+        stamped = connection.execute(select(migrations.schema_version.c.version)).scalars().all()
+        items = connection.execute(
+            select(UserItem.item_id, UserItem.quantity).order_by(UserItem.item_id)
+        ).all()
+        activity = connection.execute(
+            select(UserDailyActivity.session_count, UserDailyActivity.minutes)
+        ).all()
+    # cada migracion una sola vez
+    assert sorted(stamped) == [m.version for m in migrations.MIGRATIONS]
+    # las compras repetidas quedan en una fila con la cantidad sumada
+    assert items == [("rest", 3), ("streak", 1)]
+    # el resumen diario sale de las sesiones completadas
+    assert activity == [(2, 75)]
+
+    columns = {c["name"] for c in inspect(engine).get_columns("session")}
+    assert {"client_key", "goal_id"} <= columns
+    assert any(index["unique"] for index in inspect(engine).get_indexes("useritem"))
+
+
+def test_migrate_baseline_to_latest(legacy_db):
+    assert migrations.current_version(legacy_db) is None
+
+    assert migrations.migrate(legacy_db, log=lambda msg: None) == migrations.LATEST_VERSION
+    _check_latest(legacy_db)
+    # repetir no hace nada
+    assert migrations.migrate(legacy_db, log=lambda msg: None) == migrations.LATEST_VERSION
+    _check_latest(legacy_db)
+
+
+def test_concurrent_startups_migrate_once(legacy_db):
+    applied = []
+    results, errors = [], []
+
+    def start():
+        try:
+            results.append(migrations.ensure_schema(legacy_db, log=applied.append))
+        except Exception as exc:
+            errors.append(exc)
+
+    workers = [threading.Thread(target=start) for _ in range(4)]
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+
+    assert errors == []
+    assert results == [migrations.LATEST_VERSION] * 4
+    # solo el primero migra, el resto encuentra la version al dia al entrar
+    assert len(applied) == len(migrations.MIGRATIONS)
+    _check_latest(legacy_db)
+
+
+def test_orphan_foreign_keys_are_quarantined(legacy_db):
+    migrations.migrate(legacy_db, target=7, log=lambda msg: None)
+    with legacy_db.begin() as connection:
+        # sesion de una meta borrada y perfil y sesion de un usuario que ya no existe
+        connection.exec_driver_sql("UPDATE session SET goal_id = 999 WHERE id = 1")
+        connection.exec_driver_sql("INSERT INTO profile (user_id, archetype) VALUES (99, 'A')")
+        connection.exec_driver_sql(
+            "INSERT INTO session (user_id, intended_minutes, started_at, completed) VALUES (99, 25, ?, 1)",
+            (datetime.utcnow(),),
+        )
+
+    assert migrations.migrate(legacy_db, log=lambda msg: None) == migrations.LATEST_VERSION
+    with legacy_db.connect() as connection:
+        assert connection.exec_driver_sql("PRAGMA foreign_key_check").all() == []
+        assert connection.exec_driver_sql("SELECT goal_id FROM session WHERE id = 1").scalar() is None
+        assert connection.exec_driver_sql("SELECT count(*) FROM session").scalar() == 3
+        assert connection.exec_driver_sql("SELECT count(*) FROM profile").scalar() == 0
+        # nada se pierde: las tres filas quedan en cuarentena tal como estaban
+        quarantined = connection.exec_driver_sql(
+            "SELECT table_name, column_name, data FROM orphan_row ORDER BY id"
+        ).all()
+    by_table = {(table, column): json.loads(data) for table, column, data in quarantined}
+    assert len(quarantined) == 3
+    assert by_table[("session", "goal_id")]["goal_id"] == 999
+    assert by_table[("session", "user_id")]["user_id"] == 99
+    assert by_table[("profile", "user_id")]["archetype"] == "A"
@@ -0,0 +1,42 @@
+import asyncio
+import threading
+
+import pytest
+
+from password_pool import PasswordPool, PasswordPoolBusy
+
+
+def test_cancelled_request_keeps_slot_until_bcrypt_finishes():
+    pool = PasswordPool(workers=1, queue_size=0)
+    started, finish = threading.Event(), threading.Event()
+
+    def slow_hash():
+        started.set()
+        finish.wait(5)
+        return "hash"
+
+    async def scenario():
+        request = asyncio.ensure_future(pool.run_async("hash", slow_hash))
+        await asyncio.to_thread(started.wait, 5)
+        request.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await request
+
+        # el worker sigue ocupado: no se admite otra operacion
+        assert pool.in_flight == 1
+        with pytest.raises(PasswordPoolBusy):
+            await pool.run_async("hash", lambda: "otro")
+
+        # cuando bcrypt termina el hueco vuelve
+        finish.set()
+        for _ in range(500):
+            if pool.in_flight == 0:
+                break
+            await asyncio.sleep(0.01)
+        assert await pool.run_async("hash", lambda: "otro") == "otro"
+
+    try:
+        asyncio.run(scenario())
+    finally:
+        finish.set()
+        pool.shutdown()
@@ -0,0 +1,43 @@
+import random
+
+import pytest
+
+from sampling import AliasSampler
+
+
+def _exact_probabilities(sampler: AliasSampler) -> list:
+    """Probabilidad de cada indice segun las tablas: su columna mas lo que le llega como alias"""
+    result = [0.0] * sampler.n
+    for column in range(sampler.n):
+        result[column] += sampler.prob[column] / sampler.n
+        result[sampler.alias[column]] += (1.0 - sampler.prob[column]) / sampler.n
+    return result
+
+
+@pytest.mark.parametrize("weights", [
+    [1, 1, 1, 1],
+    [50, 30, 15, 4, 1],
+    [0.001, 1000, 3],
+    [7],
+])
+def test_tables_reproduce_weights(weights):
+    sampler = AliasSampler(weights)
+    total = sum(weights)
+    assert _exact_probabilities(sampler) == pytest.approx([w / total for w in weights])
+
+
+def test_zero_weight_is_never_drawn():
+    sampler = AliasSampler([0, 3, 0, 1])
+    assert _exact_probabilities(sampler)[0] == 0
+    rng = random.Random(42)
+    draws = {sampler.sample(rng) for _ in range(5_000)}
+    assert draws == {1, 3}
+
+
+def test_draws_follow_weights():
+    sampler = AliasSampler([50, 30, 15, 4, 1])
+    counts = [0] * 5
+    rng = random.Random(7)
+    for _ in range(20_000):
+        counts[sampler.sample(rng)] += 1
+    assert counts[0] > counts[1] > counts[2] > counts[3] > counts[4]
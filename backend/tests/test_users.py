@@ -0,0 +1,37 @@
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine, text
+
+import events
+import main
+from config import settings
+from security import create_access_token
+
+
+def test_update_plan_publishes_after_commit(monkeypatch):
+    # el evento sale cuando el cambio ya se ve desde otra conexion
+    outside = create_engine(settings.DATABASE_URL)
+    published = []
+
+    def publish(email, kind, data=None):
+        with outside.connect() as connection:
+            archetype = connection.execute(text(
+                'SELECT archetype FROM profile JOIN "user" ON "user".id = profile.user_id WHERE email = :email'
+            ), {"email": email}).scalar()
+        published.append((kind, data["archetype"], archetype))
+
+    monkeypatch.setattr(events, "publish", publish)
+    with TestClient(main.app) as client:
+        client.post("/auth/register", json={
+            "email": "p@x.com", "password": "pw123456", "full_name": "P", "career": "Cs",
+        })
+        headers = {"Authorization": "Bearer " + create_access_token({"sub": "p@x.com"})}
+        onboarding = {"score": 3, "archetype": "A", "preferred_minutes": 25}
+        assert client.post("/users/onboarding", headers=headers, json=onboarding).status_code == 200
+        assert client.get("/users/my-profile", headers=headers).json()["archetype"] == "A"
+
+        plan = {"new_archetype": "B", "new_minutes": 40}
+        assert client.post("/users/update-plan", headers=headers, json=plan).status_code == 200
+        assert client.get("/users/my-profile", headers=headers).json()["archetype"] == "B"
+
+    outside.dispose()
+    assert published == [("plan", "B", "B")]
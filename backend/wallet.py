@@ -0,0 +1,50 @@
+from typing import Optional
+
+from sqlalchemy import update
+from sqlalchemy.orm.attributes import set_committed_value
+from sqlmodel import Session
+
+from models import User
+
+# Cambios de saldo hechos en la DB con un solo UPDATE atomico.
+# Nunca se lee el saldo en Python para luego escribirlo, asi dos peticiones
+# a la vez del mismo usuario no pueden gastar dos veces los mismos granos.
+
+
+def _sync_balance(session: Session, user_id: int, balance: int):
+    # deja el objeto del identity map con el saldo real sin marcarlo como modificado
+    user = session.identity_map.get(session.identity_key(User, user_id))
+    if user is not None:
+        set_committed_value(user, "current_points", balance)
+
+
+def debit_points(session: Session, user_id: int, amount: int) -> Optional[int]:
+    """
+    UPDATE user SET current_points = current_points - amount WHERE id = ? AND current_points >= amount
+    Devuelve el saldo nuevo, o None si no le alcanzaba (no se cambia nada).
+    """
+    balance = session.exec(
+        update(User)
+        .where(User.id == user_id, User.current_points >= amount)
+        .values(current_points=User.current_points - amount)
+        .returning(User.current_points)
+        .execution_options(synchronize_session=False)
+    ).scalar_one_or_none()
+
+    if balance is not None:
+        _sync_balance(session, user_id, balance)
+    return balance
+
+
+def credit_points(session: Session, user_id: int, amount: int) -> int:
+    """UPDATE user SET current_points = current_points + amount, devuelve el saldo nuevo"""
+    balance = session.exec(
+        update(User)
+        .where(User.id == user_id)
+        .values(current_points=User.current_points + amount)
+        .returning(User.current_points)
+        .execution_options(synchronize_session=False)
+    ).scalar_one()
+
+    _sync_balance(session, user_id, balance)
+    return balance
@@ -0,0 +1,285 @@
+import asyncio
+import logging
+import queue
+import threading
+import time
+from concurrent.futures import Future
+from typing import Callable, List, Optional
+
+from fastapi import HTTPException, status
+from sqlmodel import Session
+
+from config import settings
+from database import engine, run_db, AnySession
+import metrics
+
+logger = logging.getLogger("focus.writer")
+
+# Escrituras con commit agrupado (group commit).
+# Las funciones de escritura reciben (session, *args), NO hacen commit y registran con
+# after_commit lo que tiene que pasar solo si el commit sale bien (caches, clasificaciones).
+# Asi la misma funcion sirve para un commit por peticion o para varias en una transaccion.
+
+group_commit_batch = metrics.Histogram(
+    "focus_group_commit_batch_size", "Escrituras agrupadas en cada commit",
+    buckets=(1, 2, 4, 8, 16, 32, 64, 128),
+)
+group_commit_wait = metrics.Histogram(
+    "focus_group_commit_wait_seconds", "Tiempo desde que se encola una escritura hasta su commit",
+)
+
+
+class WriterBusy(Exception):
+    """La cola del escritor esta llena (o no llego a aplicarla a tiempo), la peticion se rechaza"""
+
+
+# Respuesta rapida cuando la cola del escritor esta llena
+writer_busy_exception = HTTPException(
+    status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+    detail="Servidor ocupado, intenta de nuevo en unos segundos",
+    headers={"Retry-After": "1"},
+)
+
+
+def after_commit(session: Session, fn: Callable, *args):
+    """Registra fn(*args) para despues del commit; si hay rollback se descarta"""
+    session.info.setdefault("after_commit", []).append((fn, args))
+
+
+def _pop_after_commit(session: Session) -> list:
+    return session.info.pop("after_commit", [])
+
+
+def _run_callbacks(callbacks: list):
+    """
+    Despues de un commit que ya esta hecho: si una falla (cache, clasificacion, evento) se loguea
+    y se sigue. Devolver error haria que el cliente repitiera una escritura ya guardada.
+    """
+    for fn, args in callbacks:
+        try:
+            fn(*args)
+        except Exception:
+            logger.exception("fallo un after_commit de %s", getattr(fn, "__qualname__", fn))
+
+
+def commit_one(session: Session, fn: Callable, *args):
+    """Modo normal: la escritura va en su propia transaccion"""
+    try:
+        result = fn(session, *args)
+        session.commit()
+    except Exception:
+        session.rollback()
+        _pop_after_commit(session)
+        raise
+    _run_callbacks(_pop_after_commit(session))
+    return result
+
+
+class _Job:
+    __slots__ = ("fn", "args", "future", "enqueued_at", "result", "callbacks")
+
+    def __init__(self, fn, args):
+        self.fn = fn
+        self.args = args
+        self.future = Future()
+        self.enqueued_at = time.perf_counter()
+        self.result = None
+        self.callbacks = []
+
+
+class GroupCommitWriter:
+    """
+    Un unico hilo escritor. Junta las escrituras que llegan
+    durante max_delay_ms (o hasta max_batch) y las aplica en una sola transaccion:
+    cada una dentro de un SAVEPOINT, asi si una falla (sin saldo, etc.) solo se deshace esa.
+    Un commit (y un fsync) para todo el lote; luego cada peticion recibe su propio resultado.
+    """
+
+    def __init__(self, max_delay_ms: float, max_batch: int, queue_size: int, durability: str = "",
+                 timeout_seconds: float = 30):
+        self.max_delay = max_delay_ms / 1000
+        self.timeout = timeout_seconds
+        self.max_batch = max_batch
+        self.durability = durability
+        self._queue: "queue.Queue[Optional[_Job]]" = queue.Queue(maxsize=queue_size)
+        self._thread: Optional[threading.Thread] = None
+        self.batches = 0
+        self.jobs = 0
+        self.rejected = 0
+
+    @property
+    def running(self) -> bool:
+        # si el hilo muriera, run_write vuelve al commit por peticion en vez de encolar para nadie
+        return self._thread is not None and self._thread.is_alive()
+
+    def start(self):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._loop, name="group-commit", daemon=True)
+            self._thread.start()
+
+    def shutdown(self):
+        """Procesa lo que queda en cola y para el hilo"""
+        if self._thread is not None:
+            self._queue.put(None)
+            self._thread.join()
+            self._thread = None
+
+    def submit(self, fn: Callable, *args) -> Future:
+        job = _Job(fn, args)
+        try:
+            self._queue.put_nowait(job)
+        except queue.Full:
+            self.rejected += 1
+            raise WriterBusy()
+        return job.future
+
+    async def run(self, fn: Callable, *args):
+        """
+        Espera el resultado como mucho `timeout` segundos si la escritura sigue en cola:
+        se cancela y nunca se aplica (WriterBusy, el cliente puede repetir).
+        Si ya se esta aplicando se espera a que termine, repetirla podria duplicarla.
+        """
+        future = self.submit(fn, *args)
+        try:
+            return await asyncio.wait_for(asyncio.shield(asyncio.wrap_future(future)), self.timeout)
+        except asyncio.TimeoutError:
+            if future.cancel():
+                raise WriterBusy()
+            return await asyncio.wrap_future(future)
+
+    def _sqlite_synchronous(self, connection, level: str):
+        # va directo al driver: SQLite no deja cambiarlo dentro de una transaccion
+        cursor = connection.connection.dbapi_connection.cursor()
+        cursor.execute(f"PRAGMA synchronous={level}")
+        cursor.close()
+
+    def _restore_synchronous(self, connection):
+        # el commit ya esta hecho: si falla no se puede dar el lote por perdido
+        try:
+            self._sqlite_synchronous(connection, settings.SQLITE_SYNCHRONOUS)
+        except Exception:
+            logger.exception("no se pudo restaurar synchronous, se descarta la conexion")
+            connection.invalidate()
+
+    def _collect(self) -> List[_Job]:
+        first = self._queue.get()
+        if first is None:
+            return []
+        batch = [first]
+        deadline = time.perf_counter() + self.max_delay
+        while len(batch) < self.max_batch:
+            remaining = deadline - time.perf_counter()
+            if remaining <= 0:
+                break
+            try:
+                job = self._queue.get(timeout=remaining)
+            except queue.Empty:
+                break
+            if job is None:
+                # shutdown: se procesa este lote y se sale
+                self._queue.put(None)
+                break
+            batch.append(job)
+        return batch
+
+    def _loop(self):
+        while True:
+            batch = self._collect()
+            if not batch:
+                return
+            try:
+                self._apply(batch)
+            except Exception as exc:
+                # sin conexion (pool agotado, Postgres caido...): falla este lote y el hilo sigue
+                logger.exception("fallo un lote de %d escrituras", len(batch))
+                for job in batch:
+                    if not job.future.done():
+                        job.future.set_exception(exc)
+
+    def _apply(self, batch: List[_Job]):
+        """
+        Cada lote usa una conexion del pool de escritura y la devuelve al terminar,
+        asi el escritor hace cola con el resto de escrituras (database.py) en vez de acapararla.
+        La durabilidad elegida solo se aplica durante el lote.
+        """
+        # las que se cancelaron por timeout mientras esperaban en cola no se aplican
+        batch = [job for job in batch if job.future.set_running_or_notify_cancel()]
+        if not batch:
+            return
+        done = []
+        sqlite = engine.dialect.name == "sqlite"
+        with engine.connect() as connection:
+            # BEGIN IMMEDIATE: el lote pide el bloqueo de escritura al empezar
+            connection.execution_options(sqlite_begin="IMMEDIATE")
+            if self.durability and sqlite:
+                # relaxed = OFF: con WAL un corte de luz puede perder los ultimos commits
+                # pero no corrompe la base (NORMAL ya es lo de siempre, no relajaria nada)
+                self._sqlite_synchronous(connection, "FULL" if self.durability == "full" else "OFF")
+            session = Session(bind=connection)
+            try:
+                if self.durability and engine.dialect.name == "postgresql":
+                    level = "on" if self.durability == "full" else "off"
+                    session.connection().exec_driver_sql(f"SET LOCAL synchronous_commit TO {level}")
+                for job in batch:
+                    try:
+                        with session.begin_nested():
+                            job.result = job.fn(session, *job.args)
+                        job.callbacks = _pop_after_commit(session)
+                        done.append(job)
+                    except Exception as exc:
+                        _pop_after_commit(session)
+                        job.future.set_exception(exc)
+                session.commit()
+            except Exception as exc:
+                # fallo el lote entero (BEGIN o commit): ninguna escritura se guardo
+                session.rollback()
+                for job in batch:
+                    if not job.future.done():
+                        job.future.set_exception(exc)
+                return
+            finally:
+                session.close()
+                if self.durability and sqlite:
+                    self._restore_synchronous(connection)
+
+        now = time.perf_counter()
+        self.batches += 1
+        self.jobs += len(batch)
+        group_commit_batch.observe(value=len(batch))
+        for job in done:
+            group_commit_wait.observe(value=now - job.enqueued_at)
+            _run_callbacks(job.callbacks)
+            job.future.set_result(job.result)
+
+    def stats(self) -> dict:
+        return {
+            "running": self.running,
+            "queued": self._queue.qsize(),
+            "batches": self.batches,
+            "jobs": self.jobs,
+            "avg_batch": round(self.jobs / self.batches, 2) if self.batches else 0.0,
+            "rejected": self.rejected,
+        }
+
+
+# Instancia unica, se arranca en el lifespan si GROUP_COMMIT_ENABLED=true
+writer = GroupCommitWriter(
+    max_delay_ms=settings.GROUP_COMMIT_MAX_DELAY_MS,
+    max_batch=settings.GROUP_COMMIT_MAX_BATCH,
+    queue_size=settings.GROUP_COMMIT_QUEUE_SIZE,
+    durability=settings.GROUP_COMMIT_DURABILITY,
+    timeout_seconds=settings.GROUP_COMMIT_TIMEOUT_SECONDS,
+)
+
+
+async def run_write(session: AnySession, fn: Callable, *args):
+    """
+    Ejecuta una funcion de escritura: por el escritor agrupado si esta activo,
+    si no con su propio commit en la sesion de la peticion (como run_db).
+    """
+    if writer.running:
+        try:
+            return await writer.run(fn, *args)
+        except WriterBusy:
+            raise writer_busy_exception
+    return await run_db(session, commit_one, fn, *args)